@@ -25,7 +25,12 @@ import types
 import locale
 import sys
 import os.path
+import shutil
+import tempfile
+import traceback
+import time
 
+from sqlalchemy.sql import text
 from sqlalchemy.exc import OperationalError
 
 from cjklib import dbconnector
@@ -62,6 +67,8 @@ class DatabaseBuilder:
         :keyword prefer: list of :class:`~cjklib.build.builder.TableBuilder`
             names to prefer in conflicting cases
         :keyword additionalBuilders: list of externally provided TableBuilders
+        :keyword jobs: number of tables built in parallel, only supported for
+            SQLite database files
         :raise ValueError: if two different options from two different builder
             collide.
         """
@@ -85,6 +92,8 @@ class DatabaseBuilder:
         """Controls if existing tables will be rebuilt."""
         self.noFail = options.pop('noFail', False)
         """Controls if build process terminate on failed tables."""
+        self.jobs = options.pop('jobs', None) or 1
+        """Number of tables built in parallel."""
         # get connector to database
         databaseUrl = options.pop('databaseUrl', None)
         if 'dbConnectInst' in options:
@@ -260,41 +269,24 @@ class DatabaseBuilder:
         # build tables
         if not self.quiet and self.rebuildExisting:
             warn("Rebuilding tables and overwriting old ones...")
-        builderClasses.reverse()
         self._instancesUnrequestedTable = set()
+        if self.jobs > 1 and self._supportsParallelBuild():
+            self._buildParallel(builderClasses, buildDependentTables)
+            self.clearTemporary()
+            return
+
+        builderClasses.reverse()
         while builderClasses:
             builder = builderClasses.pop()
 
             transaction = self.db.connection.begin()
 
             try:
-                # get specific options given to the DatabaseBuilder
-                options = self.getBuilderOptions(builder, ignoreUnknown=True)
-                options['dbConnectInst'] = self.db
-                instance = builder(**options)
-                # mark tables as deletable if its only provided because of
-                #   dependencies and the table doesn't exists yet
-                if builder.PROVIDES in buildDependentTables \
-                    and not self.db.mainHasTable(builder.PROVIDES):
-                    self._instancesUnrequestedTable.add(instance)
-
-                if self.db.mainHasTable(builder.PROVIDES):
-                    # will only remove the table if found in the main database
-                    if not self.quiet:
-                        warn("Removing previously built table '%s'"
-                            % builder.PROVIDES)
-                    instance.remove()
-
-                if not self.quiet:
-                    warn("Building table '%s' with builder '%s'..."
-                        % (builder.PROVIDES, builder.__name__))
-
-                # remove old metadata
-                if builder.PROVIDES in self.db.tables:
-                    del self.db.tables[builder.PROVIDES]
-
+                instance = self._getBuilderInstance(builder,
+                    buildDependentTables)
                 instance.build()
                 transaction.commit()
+                self.db.invalidateQueryCache([builder.PROVIDES])
             except IOError, e:
                 transaction.rollback()
                 # data not available, can't build table
@@ -326,6 +318,233 @@ class DatabaseBuilder:
 
         self.clearTemporary()
 
+    def _getBuilderInstance(self, builder, buildDependentTables):
+        """
+        Creates an instance of the given builder and removes a previously built
+        table from the main database.
+
+        :type builder: classobj
+        :param builder: :class:`~cjklib.build.builder.TableBuilder` class
+        :type buildDependentTables: set of str
+        :param buildDependentTables: tables only built to resolve dependencies
+        :rtype: instance
+        :return: :class:`~cjklib.build.builder.TableBuilder` instance
+        """
+        # get specific options given to the DatabaseBuilder
+        options = self.getBuilderOptions(builder, ignoreUnknown=True)
+        options['dbConnectInst'] = self.db
+        instance = builder(**options)
+        # mark tables as deletable if its only provided because of
+        #   dependencies and the table doesn't exists yet
+        if builder.PROVIDES in buildDependentTables \
+            and not self.db.mainHasTable(builder.PROVIDES):
+            self._instancesUnrequestedTable.add(instance)
+
+        if self.db.mainHasTable(builder.PROVIDES):
+            # will only remove the table if found in the main database
+            if not self.quiet:
+                warn("Removing previously built table '%s'"
+                    % builder.PROVIDES)
+            instance.remove()
+
+        if not self.quiet:
+            warn("Building table '%s' with builder '%s'..."
+                % (builder.PROVIDES, builder.__name__))
+
+        # remove old metadata and cached results
+        if builder.PROVIDES in self.db.tables:
+            del self.db.tables[builder.PROVIDES]
+        self.db.invalidateQueryCache([builder.PROVIDES])
+
+        return instance
+
+    def _supportsParallelBuild(self):
+        """
+        Checks if tables can be built in parallel. This is only supported for
+        a SQLite database file, which other processes can attach to.
+
+        :rtype: bool
+        :return: ``True`` if tables can be built in parallel
+        """
+        if (self.db.engine.name == 'sqlite'
+            and self.db.engine.url.database
+            and self.db.engine.url.database != ':memory:'):
+            return True
+
+        if not self.quiet:
+            warn("Parallel build only supported for SQLite database files,"
+                " building tables one at a time")
+        return False
+
+    def _buildParallel(self, builderClasses, buildDependentTables):
+        """
+        Builds the given tables in parallel on a pool of
+        :attr:`~cjklib.build.DatabaseBuilder.jobs` processes.
+
+        A builder is started as soon as all tables it depends on are built.
+        Each process builds its table into a temporary SQLite database which
+        then is merged into the main database.
+
+        :type builderClasses: list of classobj
+        :param builderClasses: :class:`~cjklib.build.builder.TableBuilder`
+            classes in build order
+        :type buildDependentTables: set of str
+        :param buildDependentTables: tables only built to resolve dependencies
+        """
+        import multiprocessing
+
+        pendingClasses = builderClasses[:]
+        providedTables = set([clss.PROVIDES for clss in builderClasses])
+        builtTables = set()
+        running = {}
+
+        # workers read from the main database while tables are merged
+        self.db.execute(text("PRAGMA busy_timeout = %d"
+            % _PARALLEL_BUILD_BUSY_TIMEOUT))
+        attach = [self.db.databaseUrl] + self.db.attached.keys()
+
+        tempPath = tempfile.mkdtemp(prefix='cjklib_build_')
+        pool = multiprocessing.Pool(self.jobs)
+        workers = set()
+        try:
+            while pendingClasses or running:
+                # start all builders whose dependencies are satisfied
+                for builder in pendingClasses[:]:
+                    if len(running) >= self.jobs:
+                        break
+                    if set(builder.DEPENDS) & providedTables <= builtTables:
+                        pendingClasses.remove(builder)
+
+                        # removes an old table, marks temporary tables
+                        self._getBuilderInstance(builder, buildDependentTables)
+                        options = self.getBuilderOptions(builder,
+                            ignoreUnknown=True)
+                        databaseFile = os.path.join(tempPath,
+                            '%s.db' % builder.PROVIDES)
+                        result = pool.apply_async(_buildTableInDatabase,
+                            (builder, options, databaseFile, attach,
+                                self.db.registerUnicode))
+                        running[builder.PROVIDES] = (builder, databaseFile,
+                            result)
+
+                if not running:
+                    raise Exception("Unfulfillable depend request for: '%s'"
+                        % "', '".join([clss.PROVIDES
+                            for clss in pendingClasses]))
+
+                # wait for next builder to finish, polling allows interrupts
+                finishedTable = None
+                while finishedTable is None:
+                    for tableName, (_, _, result) in running.items():
+                        if result.ready():
+                            finishedTable = tableName
+                            break
+                    else:
+                        # the pool replaces a killed worker, but its task is
+                        #   lost and its result never gets ready
+                        workers.update(pool._pool)
+                        for process in workers:
+                            if process.exitcode not in (None, 0):
+                                raise Exception(
+                                    "Build process died with exit code %d"
+                                        % process.exitcode)
+                        time.sleep(_PARALLEL_BUILD_POLL_INTERVAL)
+                builder, databaseFile, result = running.pop(finishedTable)
+                tableName, error = result.get()
+
+                if error is None:
+                    self._mergeDatabase(databaseFile)
+                    self.db.invalidateQueryCache([tableName])
+                    builtTables.add(tableName)
+                elif error[0] == 'IOError' and self.noFail:
+                    # data not available, can't build table
+                    if not self.quiet:
+                        warn("Building table '%s' failed: '%s', skipping" \
+                            % (tableName, error[1]))
+                    dependingTables = [tableName]
+                    for clss in pendingClasses[:]:
+                        if set(clss.DEPENDS) & set(dependingTables):
+                            # this class depends on one being removed
+                            dependingTables.append(clss.PROVIDES)
+                            pendingClasses.remove(clss)
+                    if not self.quiet and len(dependingTables) > 1:
+                        warn("Ignoring depending table(s) '%s'" \
+                            % "', '".join(dependingTables[1:]))
+                else:
+                    if error[0] == 'IOError':
+                        raise IOError(error[1])
+                    raise Exception("Building table '%s' failed:\n%s"
+                        % (tableName, error[1]))
+
+            pool.close()
+        except:
+            pool.terminate()
+            pool.join()
+            shutil.rmtree(tempPath, ignore_errors=True)
+            if not self.quiet: warn("Error")
+            self.clearTemporary()
+            raise
+
+        pool.join()
+        shutil.rmtree(tempPath, ignore_errors=True)
+
+    def _mergeDatabase(self, databaseFile):
+        """
+        Copies all tables, indices and views of the given SQLite database
+        into the main database. Row ids are kept, as views on FTS3 tables join
+        on them.
+
+        :type databaseFile: str
+        :param databaseFile: path of SQLite database file
+        """
+        schema = 'cjklib_build_merge'
+        preparer = self.db.engine.dialect.identifier_preparer
+        qschema = preparer.quote_identifier(schema)
+
+        self.db.execute(text("ATTACH DATABASE :database AS :schema"),
+            database=databaseFile, schema=schema)
+        try:
+            entries = self.db.selectRows(text(
+                "SELECT type, name, sql FROM %s.sqlite_master"
+                " WHERE sql IS NOT NULL ORDER BY rowid" % qschema))
+
+            # shadow tables of virtual tables are created implicitly
+            virtualTables = [name for entryType, name, sql in entries
+                if entryType == 'table'
+                    and sql.upper().startswith('CREATE VIRTUAL TABLE')]
+            shadowTables = set()
+            for name in virtualTables:
+                shadowTables.update([name + suffix for suffix
+                    in ('_content', '_segments', '_segdir', '_docsize',
+                        '_stat')])
+
+            transaction = self.db.connection.begin()
+            try:
+                for entryType, name, sql in entries:
+                    if entryType != 'table' or name in shadowTables:
+                        continue
+                    self.db.execute(text(sql))
+
+                    qtable = preparer.quote_identifier(name)
+                    columns = ', '.join(['rowid'] + [
+                        preparer.quote_identifier(row[1]) for row
+                        in self.db.selectRows(text("PRAGMA %s.table_info(%s)"
+                            % (qschema, qtable)))])
+                    self.db.execute(text(
+                        "INSERT INTO main.%s (%s) SELECT %s FROM %s.%s"
+                            % (qtable, columns, columns, qschema, qtable)))
+
+                for entryType, name, sql in entries:
+                    if entryType != 'table':
+                        self.db.execute(text(sql))
+
+                transaction.commit()
+            except:
+                transaction.rollback()
+                raise
+        finally:
+            self.db.execute(text("DETACH DATABASE %s" % qschema))
+
     def clearTemporary(self):
         """
         Removes all tables only built temporarily as to satisfy build
@@ -346,9 +565,10 @@ class DatabaseBuilder:
                     instance.remove()
                 except OperationalError:
                     pass
-                # remove old metadata
+                # remove old metadata and cached results
                 if instance.PROVIDES in self.db.tables:
                     del self.db.tables[instance.PROVIDES]
+                self.db.invalidateQueryCache([instance.PROVIDES])
             del self._instancesUnrequestedTable
 
     def remove(self, tables):
@@ -384,9 +604,10 @@ class DatabaseBuilder:
                 instance = builder(**options)
                 instance.remove()
                 removed.append(builder.PROVIDES)
-                # remove old metadata
+                # remove old metadata and cached results
                 if builder.PROVIDES in self.db.tables:
                     del self.db.tables[builder.PROVIDES]
+                self.db.invalidateQueryCache([builder.PROVIDES])
 
         return removed
 
@@ -806,6 +1027,58 @@ class DatabaseBuilder:
 
 #{ Global methods
 
+_PARALLEL_BUILD_BUSY_TIMEOUT = 600000
+"""Milliseconds to wait for a locked database during parallel builds."""
+
+_PARALLEL_BUILD_POLL_INTERVAL = 0.1
+"""Seconds between checks for finished builders during parallel builds."""
+
+def _buildTableInDatabase(builder, options, databaseFile, attach,
+    registerUnicode=False):
+    """
+    Builds a table into the given SQLite database file, attaching the given
+    databases for tables it depends on. Runs inside a worker process of
+    :meth:`~cjklib.build.DatabaseBuilder._buildParallel`.
+
+    :type builder: classobj
+    :param builder: :class:`~cjklib.build.builder.TableBuilder` class
+    :type options: dict
+    :param options: options for the table builder
+    :type databaseFile: str
+    :param databaseFile: path of the SQLite database file to build into
+    :type attach: list of str
+    :param attach: URLs of databases to attach
+    :type registerUnicode: bool
+    :param registerUnicode: if ``True`` own Unicode functions are registered
+    :rtype: tuple
+    :return: table name and ``None`` on success, otherwise a tuple of the
+        error type's name and message
+    """
+    try:
+        db = dbconnector.DatabaseConnector(
+            {'sqlalchemy.url': 'sqlite:///%s' % databaseFile,
+                'attach': attach, 'registerUnicode': registerUnicode})
+        db.execute(text("PRAGMA busy_timeout = %d"
+            % _PARALLEL_BUILD_BUSY_TIMEOUT))
+
+        options = options.copy()
+        options['dbConnectInst'] = db
+        instance = builder(**options)
+
+        transaction = db.connection.begin()
+        try:
+            instance.build()
+            transaction.commit()
+        except:
+            transaction.rollback()
+            raise
+    except IOError, e:
+        return builder.PROVIDES, ('IOError', str(e))
+    except Exception, e:
+        return builder.PROVIDES, (type(e).__name__, traceback.format_exc())
+
+    return builder.PROVIDES, None
+
 def warn(message):
     """
     Prints the given message to stderr with the system's default encoding.
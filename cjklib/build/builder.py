@@ -56,7 +56,8 @@ __all__ = [
     "MandarinBraileInitialBuilder", "MandarinBraileFinalBuilder",
     # Library dependent
     "GlyphBuilder", "StrokeCountBuilder", "CombinedStrokeCountBuilder",
-    "CharacterComponentLookupBuilder", "CharacterRadicalStrokeCountBuilder",
+    "DerivedStrokeOrderBuilder", "CharacterComponentLookupBuilder",
+    "CharacterRadicalStrokeCountBuilder",
     "CharacterResidualStrokeCountBuilder",
     "CombinedCharacterResidualStrokeCountBuilder",
     # Dictionary builder
@@ -71,12 +72,14 @@ __all__ = [
 import types
 import re
 import os.path
+import heapq
 import copy
 import xml.sax
 import itertools
 import logging
 
 from sqlalchemy import Table, Column, Integer, String, DateTime, Text, Index
+from sqlalchemy import MetaData
 from sqlalchemy import select, union
 from sqlalchemy.sql import text, func
 from sqlalchemy.sql import or_
@@ -84,6 +87,7 @@ from sqlalchemy.exc import IntegrityError, OperationalError
 
 from cjklib import characterlookup
 from cjklib import exception
+from cjklib.reading import ReadingFactory
 from cjklib.build import warn
 from cjklib.util import (UnicodeCSVFileIterator, CollationString, CollationText,
     deprecated, fromCodepoint, getCharacterList)
@@ -274,6 +278,39 @@ class EntryGeneratorBuilder(TableBuilder):
     COLUMN_TYPES = {}
     """Column types for created table"""
 
+    def __init__(self, **options):
+        """
+        :param options: extra options
+        :keyword dbConnectInst: instance of a
+            :class:`~cjklib.dbconnector.DatabaseConnector`
+        :keyword dataPath: optional list of paths to the data file(s)
+        :keyword quiet: if ``True`` no status information will be printed to
+            stderr
+        :keyword batchSize: number of entries inserted with one statement
+        """
+        super(EntryGeneratorBuilder, self).__init__(**options)
+
+        if self.batchSize < 1:
+            raise ValueError("Invalid option %s for keyword 'batchSize'"
+                % repr(self.batchSize))
+
+    @classmethod
+    def getDefaultOptions(cls):
+        options = super(EntryGeneratorBuilder, cls).getDefaultOptions()
+        options.update({'batchSize': 1000})
+
+        return options
+
+    @classmethod
+    def getOptionMetaData(cls, option):
+        optionsMetaData = {'batchSize': {'type': 'int',
+                'description': "number of entries inserted at once"}}
+
+        if option in optionsMetaData:
+            return optionsMetaData[option]
+        else:
+            return super(EntryGeneratorBuilder, cls).getOptionMetaData(option)
+
     def getGenerator(self):
         """
         Returns the entry generator.
@@ -312,25 +349,68 @@ class EntryGeneratorBuilder(TableBuilder):
         table.create()
 
         # write table content
-        #try:
-            #entries = self.getEntryDict(self.getGenerator())
-            #self.db.execute(table.insert(), entries)
-        #except IntegrityError, e:
-            #warn(unicode(e))
-            ##warn(unicode(insertStatement))
-            #raise
-
-        for newEntry in generator:
-            try:
-                table.insert(newEntry).execute()
-            except IntegrityError, e:
-                if not(self.quiet):
-                    warn(unicode(e))
-                raise
+        self.insertEntries(table, generator)
 
         for index in self.buildIndexObjects(self.PROVIDES, self.INDEX_KEYS):
             index.create()
 
+    def insertEntries(self, table, generator):
+        """
+        Inserts the entries provided by the given generator into the newly
+        created table.
+
+        Entries are inserted in chunks of ``batchSize`` entries inside one
+        transaction. If a chunk violates an integrity constraint, its
+        remaining entries are inserted one at a time as to report the
+        violating entry.
+
+        :type table: object
+        :param table: SQLAlchemy table object
+        :type generator: iterable
+        :param generator: entries given as dict or as list in order of
+            the table's columns
+        :raise IntegrityError: if an entry violates an integrity constraint
+        """
+        columns = [column.name for column in table.columns]
+
+        def toEntryDict(entry):
+            # generators might reuse dict objects, so always copy
+            if type(entry) == type(dict()):
+                return dict([(column, entry.get(column, None)) \
+                    for column in columns])
+            else:
+                return dict(zip(columns, entry))
+
+        transaction = self.db.connection.begin()
+        try:
+            insertedCount = 0
+            while True:
+                entries = [toEntryDict(entry) for entry \
+                    in itertools.islice(generator, self.batchSize)]
+                if not entries:
+                    break
+
+                try:
+                    self.db.execute(table.insert(), entries)
+                except IntegrityError:
+                    # engines might have inserted a part of the chunk before
+                    #   failing, continue after the last inserted entry
+                    tableCount = self.db.selectScalar(
+                        select([func.count()], from_obj=[table]))
+                    for entry in entries[tableCount - insertedCount:]:
+                        try:
+                            self.db.execute(table.insert(), entry)
+                        except IntegrityError, e:
+                            if not self.quiet:
+                                warn(unicode(e))
+                            raise
+                insertedCount += len(entries)
+
+            transaction.commit()
+        except:
+            transaction.rollback()
+            raise
+
 #}
 #{ Unihan and Kanjidic character information
 
@@ -379,95 +459,114 @@ class UnihanGenerator:
         The character definition is converted to the character's representation,
         all other data is given as is. These are merged into one entry for each
         character.
+
+        The sorted files are read in parallel and merged using a heap, so only
+        one line per file is held in memory.
         """
-        handleDict = self.getHandles()
-        handleReadBuffer = {}
+        # heap of the next entry of each file, the file's position breaks ties
+        heap = []
+        for fileIdx, (fileName, handle) in enumerate(self.getHandles().items()):
+            entries = self._iterEntries(fileName, handle)
+            for redIndex, key, value in entries:
+                heap.append((redIndex, fileIdx, key, value, entries))
+                break
+        heapq.heapify(heap)
+
         # current entry goes here
-        entryIndex = -1
+        entryIndex = None
         entry = {}
+        while heap:
+            redIndex, fileIdx, key, value, entries = heap[0]
+            if redIndex != entryIndex:
+                if entryIndex is not None:
+                    yield(fromCodepoint(entryIndex), entry)
+                entryIndex = redIndex
+                entry = {}
+            entry[key] = value
+
+            # replace with the next entry of the same file
+            try:
+                redIndex, key, value = entries.next()
+                heapq.heapreplace(heap, (redIndex, fileIdx, key, value,
+                    entries))
+            except StopIteration:
+                heapq.heappop(heap)
 
-        while True:
-            # synchronize all handles of sorted code points, break if we read
-            #   past the current entryIndex
-            for fileName, handle in handleDict.items():
-                # check if we already red something from the current handle
-                if fileName in handleReadBuffer:
-                    redIndex, key, value = handleReadBuffer[fileName]
-                    if entryIndex == redIndex:
-                        entry[key] = value
-                        del handleReadBuffer[fileName]
-                    else:
-                        # the red index is greater than our current one, skip
-                        assert entryIndex < redIndex, "File '%s' is not sorted"
-                        continue
+        if entryIndex is not None:
+            yield(fromCodepoint(entryIndex), entry)
 
-                # we can read further into the current handle
-                for line in handle:
-                    if line.startswith('#') or line.strip() == '':
-                        continue
+    def _iterEntries(self, fileName, handle):
+        """
+        Iterates over the entries of one Unihan file in order of their code
+        points. Lines with keys not requested are skipped before being decoded
+        and parsed.
+
+        :type fileName: str
+        :param fileName: name of the Unihan file
+        :type handle: file
+        :param handle: handle giving UTF-8 encoded lines
+        :rtype: iterator of tuple
+        :return: code point, key and value
+        """
+        lastIndex = -1
+        try:
+            for line in handle:
+                if line.startswith('#') or line.strip() == '':
+                    continue
 
-                    resultObj = self.ENTRY_REGEX.match(line)
-                    if not resultObj:
-                        if not self.quiet:
-                            warn("Can't read line from '%s': '%s'"
-                                % (fileName, line))
-                        continue
-                    unicodeHexCodePoint, key, value = resultObj.group(1, 2, 3)
-                    redIndex = int(unicodeHexCodePoint, 16)
-                    # skip characters outside the BMP, i.e. for Chinese
-                    #   characters >= 0x10000 unless wideBuild is specified
-                    if not self.wideBuild and redIndex >= 0x10000:
+                # if we have a limited target key set, check if the current
+                #   one is to be included, before doing any expensive parsing
+                if self.limitKeys:
+                    fields = line.split('\t', 2)
+                    if len(fields) == 3 and fields[1] not in self.keySet:
                         continue
-                    # if we have a limited target key set, check if the current
-                    #   one is to be included
-                    if self.limitKeys and not key in self.keySet:
-                        continue
-                    # check if we found data for the current entryIndex
-                    if redIndex == entryIndex:
-                        entry[key] = value
-                    else:
-                        handleReadBuffer[fileName] = (redIndex, key, value)
-                        # we red past our current entry
-                        break
-                else:
-                    # reached end of file
-                    if fileName not in handleReadBuffer:
-                        # our buffer is empty and file end reached, remove
-                        handleDict[fileName].close()
-                        del handleDict[fileName]
-
-            if entryIndex >= 0:
-                char = fromCodepoint(entryIndex)
-                yield(char, entry)
-
-            # if the read buffer is empty, all files are finished
-            if not handleReadBuffer:
-                break
 
-            # next entry with smallest index
-            entryIndex = min(
-                [redIndex for redIndex, _, _ in handleReadBuffer.values()])
-            entry = {}
+                line = line.decode('utf-8')
+                resultObj = self.ENTRY_REGEX.match(line)
+                if not resultObj:
+                    if not self.quiet:
+                        warn("Can't read line from '%s': '%s'"
+                            % (fileName, line))
+                    continue
+                unicodeHexCodePoint, key, value = resultObj.group(1, 2, 3)
+                redIndex = int(unicodeHexCodePoint, 16)
+                # skip characters outside the BMP, i.e. for Chinese
+                #   characters >= 0x10000 unless wideBuild is specified
+                if not self.wideBuild and redIndex >= 0x10000:
+                    continue
+                if self.limitKeys and not key in self.keySet:
+                    continue
+
+                assert lastIndex <= redIndex, "File '%s' is not sorted" \
+                    % fileName
+                lastIndex = redIndex
+                yield redIndex, key, value
+        finally:
+            handle.close()
 
     def getHandles(self):
-        """ 
-        Returns a list of handles of the Unihan database files.
+        """
+        Returns a list of handles of the Unihan database files. Members of a
+        zip archive are decompressed while being read.
 
         :rtype: dict
-        :return: dictionary of names and handles of the Unihan files
+        :return: dictionary of names and handles of the Unihan files, giving
+            UTF-8 encoded lines
         """
         handles = {}
         import zipfile
         if len(self.fileNames) == 1 and zipfile.is_zipfile(self.fileNames[0]):
-            import StringIO
             z = zipfile.ZipFile(self.fileNames[0], "r")
             for member in z.namelist():
-                handles[member] \
-                    = StringIO.StringIO(z.read(member).decode('utf-8'))
+                if hasattr(z, 'open'):
+                    handles[member] = z.open(member)
+                else:
+                    # Python < 2.6
+                    import StringIO
+                    handles[member] = StringIO.StringIO(z.read(member))
         else:
-            import codecs
             for member in self.fileNames:
-                handles[member] = codecs.open(member, 'r', 'utf-8')
+                handles[member] = open(member, 'rb')
         return handles
 
     def keys(self):
@@ -490,7 +589,7 @@ class UnihanGenerator:
                     # ignore comments
                     if line.startswith('#'):
                         continue
-                    resultObj = self.ENTRY_REGEX.match(line)
+                    resultObj = self.ENTRY_REGEX.match(line.decode('utf-8'))
                     if not resultObj:
                         continue
 
@@ -2127,8 +2226,9 @@ class StrokeCountBuilder(EntryGeneratorBuilder):
             # create instance, locale is not important, we get all glyphs
             self.cjk = characterlookup.CharacterLookup('T',
                 dbConnectInst=dbConnectInst)
-            # make sure a currently existing table is not used
+            # make sure currently existing tables are not used
             self.cjk.hasStrokeCount = False
+            self.cjk.hasDerivedStrokeOrder = False
 
         def generator(self):
             """Provides one entry per character, *glyph* and locale subset."""
@@ -2399,6 +2499,47 @@ class CombinedStrokeCountBuilder(StrokeCountBuilder):
             .generator()
 
 
+class DerivedStrokeOrderBuilder(EntryGeneratorBuilder):
+    """
+    Builds a mapping between characters and their stroke order, including
+    stroke orders derived from the character decomposition.
+
+    .. versionadded:: 0.3.3
+    """
+    class DerivedStrokeOrderGenerator:
+        """Generates the character stroke order mapping."""
+        def __init__(self, dbConnectInst):
+            """
+            :type dbConnectInst: instance
+            :param dbConnectInst: instance of a
+                :class:`~cjklib.dbconnector.DatabaseConnector`.
+            """
+            # create instance, locale is not important, we get all glyphs
+            self.cjk = characterlookup.CharacterLookup('T',
+                dbConnectInst=dbConnectInst)
+            # make sure a currently existing table is not used
+            self.cjk.hasDerivedStrokeOrder = False
+
+        def generator(self):
+            """Provides one entry per character and *glyph*."""
+            strokeOrderDict = self.cjk.getStrokeOrderAbbrevDict()
+            for (char, glyph), strokeOrder in strokeOrderDict.iteritems():
+                yield {'ChineseCharacter': char, 'Glyph': glyph,
+                    'StrokeOrder': strokeOrder}
+
+    PROVIDES = 'DerivedStrokeOrder'
+    DEPENDS = ['CharacterDecomposition', 'StrokeOrder']
+
+    COLUMNS = ['ChineseCharacter', 'Glyph', 'StrokeOrder']
+    PRIMARY_KEYS = ['ChineseCharacter', 'Glyph']
+    COLUMN_TYPES = {'ChineseCharacter': String(1), 'Glyph': Integer(),
+        'StrokeOrder': Text()}
+
+    def getGenerator(self):
+        return DerivedStrokeOrderBuilder.DerivedStrokeOrderGenerator(self.db)\
+            .generator()
+
+
 class CharacterComponentLookupBuilder(EntryGeneratorBuilder):
     """
     Builds a mapping between characters and their components.
@@ -2414,48 +2555,15 @@ class CharacterComponentLookupBuilder(EntryGeneratorBuilder):
             :param characterSet: set of characters to generate the table for
             """
             self.characterSet = characterSet
-            # create instance, locale is not important, we supply own glyph
-            self.cjk = characterlookup.CharacterLookup('T',
-                dbConnectInst=dbConnectInst)
-
-        def getComponents(self, char, glyph, decompositionDict,
-            componentDict):
-            """
-            Gets all character components for the given glyph.
-
-            :type char: str
-            :param char: Chinese character
-            :type glyph: int
-            :param glyph: *glyph* of character
-            :rtype: set
-            :return: all components of the character
-            """
-            if (char, glyph) not in componentDict:
-                componentDict[(char, glyph)] = set()
-
-                if (char, glyph) in decompositionDict:
-                    for decomposition in decompositionDict[(char, glyph)]:
-                        componentDict[(char, glyph)].update(
-                            [entry for entry in decomposition \
-                                if type(entry) == types.TupleType])
-
-            componentSet = set()
-            for component, componentGlyph in componentDict[(char, glyph)]:
-                componentSet.add((component, componentGlyph))
-                # get sub-components
-                componentSet.update(self.getComponents(component,
-                    componentGlyph, decompositionDict, componentDict))
-
-            return componentSet
+            # don't use the graph shared by CharacterLookup instances, the
+            #   decomposition table might have just been rebuilt
+            self.graph = characterlookup.DecompositionGraph(dbConnectInst)
 
         def generator(self):
             """Provides the component entries."""
-            decompositionDict = self.cjk.getDecompositionEntriesDict()
-            componentDict = {}
             for char, glyph in self.characterSet:
                 for component, componentGlyph \
-                    in self.getComponents(char, glyph, decompositionDict,
-                        componentDict):
+                    in self.graph.getComponents(char, glyph):
                     yield {'ChineseCharacter': char, 'Glyph': glyph,
                         'Component': component,
                         'ComponentGlyph': componentGlyph}
@@ -2982,11 +3090,6 @@ class EDICTFormatBuilder(EntryGeneratorBuilder):
 
     One column will be provided for the headword, one for the reading (in EDICT
     that is the Kana) and one for the translation.
-
-    .. todo::
-        * Fix: Optimize insert, use transaction which disables autocommit and
-          cosider passing data all at once, requiring proper handling of row
-          indices.
     """
     class TableGenerator:
         """Generates the dictionary entries."""
@@ -3048,6 +3151,12 @@ class EDICTFormatBuilder(EntryGeneratorBuilder):
 
     FULLTEXT_COLUMNS = ['Translation']
     """Column names which shall be fulltext searchable."""
+    READING = None
+    """
+    Reading of the dictionary. Needed if column ``ReadingPlain`` is provided.
+    """
+    READING_OPTIONS = {}
+    """Options of the dictionary's reading."""
     FILE_NAMES = None
     """Names of file containing the edict formated dictionary."""
     ENCODING = 'utf-8'
@@ -3224,6 +3333,49 @@ class EDICTFormatBuilder(EntryGeneratorBuilder):
             import codecs
             return codecs.open(filePath, 'r', self.ENCODING)
 
+    def getPlainReadingGenerator(self, generator):
+        """
+        Adds a column ``ReadingPlain`` to the given entries holding the reading
+        with tonal information removed. Entities are separated by space and
+        converted to lower case, so that the column can be searched case
+        insensitively with an index.
+
+        Reading entities are only stripped off their tone if the entity is
+        recognised by the reading, which mirrors the handling in
+        :class:`~cjklib.dictionary.search.TonelessWildcardReading`.
+
+        :type generator: iterator
+        :param generator: entries given as list or dict
+        :rtype: iterator of dict
+        :return: entries as dict including the plain reading
+        """
+        readingFactory = ReadingFactory(dbConnectInst=self.db)
+
+        plainEntityLookup = {}
+        def getPlainEntity(entity):
+            if entity not in plainEntityLookup:
+                plainEntity = entity
+                try:
+                    if readingFactory.isReadingEntity(entity, self.READING,
+                        **self.READING_OPTIONS):
+                        plainEntity, _ = readingFactory.splitEntityTone(
+                            entity, self.READING, **self.READING_OPTIONS)
+                except (exception.InvalidEntityError,
+                    exception.UnsupportedError):
+                    pass
+                plainEntityLookup[entity] = plainEntity
+            return plainEntityLookup[entity]
+
+        for entry in generator:
+            if type(entry) != type({}):
+                entry = dict(zip(self.COLUMNS, entry))
+            if entry.get('Reading') is None:
+                entry['ReadingPlain'] = None
+            else:
+                entry['ReadingPlain'] = ' '.join(getPlainEntity(entity)
+                    for entity in entry['Reading'].split(' ')).lower()
+            yield entry
+
     def buildFTS3CreateTableStatement(self, table):
         """
         Returns a SQL statement for creating a virtual table using FTS3 for
@@ -3307,36 +3459,40 @@ class EDICTFormatBuilder(EntryGeneratorBuilder):
             autoload=True)
         fts3Table = Table(tableName + '_Text', self.db.metadata,
             autoload=True)
-        fts3FullRows = ['rowid']
-        fts3FullRows.extend(fullTextColumns)
-
-        for newEntry in generator:
-            try:
-                if type(newEntry) == type([]):
-                    simpleData = [newEntry[i] \
-                        for i, column in enumerate(columns) \
-                            if column not in fullTextColumns]
-                    fts3Data = [newEntry[i] \
-                        for i, column in enumerate(columns) \
-                            if column in fullTextColumns]
-                    fts3Data.insert('rowid', 0)
-                else:
+        # FTS3 table's row id is not reflected, use own table object
+        fts3Table = Table(tableName + '_Text', MetaData(),
+            Column('rowid', Integer),
+            *[fts3Table.c[column].copy() for column in fullTextColumns])
+
+        # FTS3 rows are linked by row id, so insert one entry at a time, but
+        #   inside one transaction
+        transaction = self.db.connection.begin()
+        try:
+            for newEntry in generator:
+                try:
+                    if type(newEntry) != type({}):
+                        newEntry = dict(zip(columns, newEntry))
                     simpleData = dict([(key, value) \
                         for key, value in newEntry.items() \
                         if key in simpleColumns])
                     fts3Data = dict([(key, value) \
                         for key, value in newEntry.items() \
                         if key in fullTextColumns])
-                    fts3Data['rowid'] = func.last_insert_rowid()
 
-                # table with non-FTS3 data
-                simpleTable.insert(simpleData).execute()
-                fts3Table.insert(fts3Data).execute()
-            except IntegrityError, e:
-                if not self.quiet:
-                    warn(unicode(e))
-                    #warn(unicode(insertStatement))
-                raise
+                    # table with non-FTS3 data
+                    result = self.db.execute(simpleTable.insert(), simpleData)
+                    fts3Data['rowid'] = result.lastrowid
+                    self.db.execute(fts3Table.insert(), fts3Data)
+                except IntegrityError, e:
+                    if not self.quiet:
+                        warn(unicode(e))
+                        #warn(unicode(insertStatement))
+                    raise
+
+            transaction.commit()
+        except:
+            transaction.rollback()
+            raise
 
     def testFTS3(self):
         """
@@ -3349,7 +3505,7 @@ class EDICTFormatBuilder(EntryGeneratorBuilder):
         #   do it the bad way
         try:
             dummyTable = Table('cjklib_test_fts3_presence', self.db.metadata,
-                Column('dummy'), useexisting=True)
+                Column('dummy', Text), useexisting=True)
             createStatement = self.buildFTS3CreateTableStatement(dummyTable)
             self.db.execute(createStatement)
             try:
@@ -3368,6 +3524,8 @@ class EDICTFormatBuilder(EntryGeneratorBuilder):
         """
         # get generator, might raise an Exception if source not found
         generator = self.getGenerator()
+        if 'ReadingPlain' in self.COLUMNS:
+            generator = self.getPlainReadingGenerator(generator)
 
         hasFTS3 = self.enableFTS3 and self.db.engine.name == 'sqlite' \
             and self.testFTS3()
@@ -3389,21 +3547,7 @@ class EDICTFormatBuilder(EntryGeneratorBuilder):
 
         if not hasFTS3:
             # write table content
-            #try:
-                #entries = self.getEntryDict(generator)
-                #self.db.execute(table.insert(), entries)
-            #except IntegrityError, e:
-                #warn(unicode(e))
-                ##warn(unicode(insertStatement))
-                #raise
-            for newEntry in generator:
-                try:
-                    table.insert(newEntry).execute()
-                except IntegrityError, e:
-                    if not self.quiet:
-                        warn(unicode(e))
-                        #warn(unicode(insertStatement))
-                    raise
+            self.insertEntries(table, generator)
         else:
             # write table content
             self.insertFTS3Tables(self.PROVIDES, generator, self.COLUMNS,
@@ -3543,15 +3687,21 @@ class CEDICTFormatBuilder(EDICTFormatBuilder):
 
     Two column will be provided for the headword (one for traditional and
     simplified writings each), one for the reading (e.g. in CEDICT Pinyin) and
-    one for the translation.
+    one for the translation. An additional column holds the reading without
+    tonal information to speed up searches for toneless readings.
     """
     COLUMNS = ['HeadwordTraditional', 'HeadwordSimplified', 'Reading',
-        'Translation']
-    INDEX_KEYS = [['HeadwordTraditional'], ['HeadwordSimplified'], ['Reading']]
+        'Translation', 'ReadingPlain']
+    INDEX_KEYS = [['HeadwordTraditional'], ['HeadwordSimplified'], ['Reading'],
+        ['ReadingPlain']]
     COLUMN_TYPES = {'HeadwordTraditional': String(255),
         'HeadwordSimplified': String(255), 'Reading': String(255),
-        'Translation': Text()}
-    COLUMNS_WITH_COLLATION = ['Reading', 'Translation']
+        'Translation': Text(), 'ReadingPlain': String(255)}
+    COLUMNS_WITH_COLLATION = ['Reading', 'Translation', 'ReadingPlain']
+    DEPENDS = ['PinyinSyllables']
+
+    READING = 'Pinyin'
+    READING_OPTIONS = {'toneMarkType': 'numbers', 'yVowel': 'u:'}
 
     ENTRY_REGEX = re.compile(
         r'\s*(\S+)(?:\s+(\S+))?\s*\[([^\]]*)\]\s*(/.*/)\s*$')
@@ -61,7 +61,7 @@ format --BuilderName-option or --TableName-option, e.g.
             'KangxiRadicalIsolatedCharacter', 'RadicalEquivalentCharacter',
             'Strokes', 'StrokeOrder', 'CharacterDecomposition',
             'LocaleCharacterGlyph', 'StrokeCount', 'ComponentLookup',
-            'CharacterRadicalResidualStrokeCount'],
+            'DerivedStrokeOrder', 'CharacterRadicalResidualStrokeCount'],
         'UnihanCharacterSets': ['IICoreSet', 'GB2312Set', 'BIG5Set',
             'HKSCSSet', 'BIG5HKSCSSet', 'JISX0208Set', 'JISX0208_0213Set'],
         'UnihanData': ['UnihanCharacterSets', 'CharacterKangxiRadical',
@@ -89,7 +89,7 @@ format --BuilderName-option or --TableName-option, e.g.
             'CharacterResidualStrokeCount'],
         'ShapeLookupData': ['Strokes', 'StrokeOrder', 'CharacterDecomposition',
             'LocaleCharacterGlyph', 'StrokeCount', 'ComponentLookup',
-            'CharacterVariant', 'Glyphs'],
+            'DerivedStrokeOrder', 'CharacterVariant', 'Glyphs'],
         'CharacterDomains': ['UnihanCharacterSets', 'GlyphInformationSet'],
         'cjklibData': ['Readings', 'SupportedCharacterReadings',
             'KangxiRadicalData', 'ShapeLookupData', 'CharacterDomains'],
@@ -324,9 +324,12 @@ along with cjklib.  If not, see <http://www.gnu.org/licenses/>.""" \
         parser.add_option("--ignoreConfig", action="store_true",
             dest="ignoreConfig", default=False,
             help="ignore settings from cjklib.conf")
+        parser.add_option("-j", "--jobs", action="store", type='int',
+            metavar="N", dest="jobs", default=1,
+            help="number of tables built in parallel [default: %default]")
 
         optionSet = set(['rebuildExisting', 'rebuildDepending', 'quiet',
-            'databaseUrl', 'attach', 'prefer'])
+            'databaseUrl', 'attach', 'prefer', 'jobs'])
         globalBuilderGroup = OptionGroup(parser, "Global builder commands")
         localBuilderGroup = OptionGroup(parser, "Local builder commands")
         for builder in build.DatabaseBuilder.getTableBuilderClasses():
@@ -20,8 +20,11 @@ Chinese character based functions.
 """
 __all__ = ["CharacterLookup"]
 
+import os
 import math
-from sqlalchemy import select, union
+import copy
+import bisect
+from sqlalchemy import select, union, bindparam
 from sqlalchemy.sql import and_, or_
 
 from cjklib import reading
@@ -76,8 +79,26 @@ class CharacterLookup(object):
     see ``Scripts.txt`` from Unicode
     """
 
+    STROKE_ORDER_CACHE_SIZE = 1000
+    """
+    Maximum number of stroke orders derived from decompositions kept per
+    instance.
+    """
+
+    _hanScriptRanges = None
+    """
+    Sorted start and end codepoints of
+    :attr:`~CharacterLookup.HAN_SCRIPT_RANGES`.
+    """
+
+    _sharedState = {}
+    """
+    Dictionary holding global state information used by all instances of the
+    CharacterLookup sharing the same database connection.
+    """
+
     def __init__(self, locale, characterDomain="Unicode", databaseUrl=None,
-        dbConnectInst=None):
+        dbConnectInst=None, componentIndex=False, characterPack=None):
         """
         If no parameters are given default values are assumed for the connection
         to the database. The database connection parameters can be given in
@@ -97,6 +118,16 @@ class CharacterLookup(object):
         :type dbConnectInst: instance
         :param dbConnectInst: instance of a
             :class:`~cjklib.dbconnector.DatabaseConnector`
+        :type componentIndex: bool
+        :param componentIndex: if ``True`` component searches will be answered
+            from an in-memory index, see
+            :meth:`~CharacterLookup.getCharactersForEquivalentComponents`
+        :type characterPack: str
+        :param characterPack: path to a character data pack written by
+            :func:`~cjklib.cjkpack.exportCharacterPack`, if given glyph,
+            stroke count, radical and variant lookups will be answered from
+            the pack without querying the database. The pack is ignored if it
+            was exported from a different database.
         """
         if locale not in set('TCJKV'):
             raise ValueError('Locale not one out of TCJKV: ' + repr(locale))
@@ -119,6 +150,19 @@ class CharacterLookup(object):
         """``True`` if table ``ComponentLookup`` exists"""
         self.hasStrokeCount = self.db.hasTable('StrokeCount')
         """``True`` if table ``StrokeCount`` exists"""
+        self.hasDerivedStrokeOrder = self.db.hasTable('DerivedStrokeOrder')
+        """``True`` if table ``DerivedStrokeOrder`` exists"""
+        self.componentIndex = componentIndex
+        """``True`` if component searches use an in-memory index"""
+        self.characterPack = None
+        """:class:`~cjklib.cjkpack.CharacterPack` answering lookups"""
+        self._compiledRequests = {}
+        # derived stroke orders, full and partial ones
+        self._strokeOrderCache = {
+            False: util.LRUDict(self.STROKE_ORDER_CACHE_SIZE),
+            True: util.LRUDict(self.STROKE_ORDER_CACHE_SIZE)}
+        if characterPack:
+            self.characterPack = self._getCharacterPack(characterPack)
 
     def _getReadingFactory(self):
         """
@@ -132,6 +176,82 @@ class CharacterLookup(object):
             self._readingFactory = reading.ReadingFactory(dbConnectInst=self.db)
         return self._readingFactory
 
+    def _getCharacterPack(self, filePath):
+        """
+        Gets the character data pack shared by all instances with the same
+        database connection.
+
+        :type filePath: str
+        :param filePath: path of the pack file
+        :rtype: instance
+        :return: a :class:`~cjklib.cjkpack.CharacterPack` instance, ``None``
+            if the pack doesn't match the database
+        """
+        from cjklib import cjkpack
+
+        sharedState = self._sharedState.setdefault(self.db, {})
+        packs = sharedState.setdefault('characterPacks', {})
+        filePath = os.path.abspath(os.path.expanduser(filePath))
+        if filePath not in packs:
+            pack = cjkpack.CharacterPack(filePath)
+            fingerprint = self.db.getDatabaseFingerprint()
+            if pack.fingerprint and fingerprint \
+                and pack.fingerprint != fingerprint:
+                import warnings
+                warnings.warn("Character pack '%s' was exported from a"
+                    " different database and will not be used" % filePath)
+                pack = None
+            packs[filePath] = pack
+        return packs[filePath]
+
+    def _getPackEntries(self, tableName, char):
+        """
+        Gets the entries for the given character from the character data pack.
+
+        :type tableName: str
+        :param tableName: name of the table
+        :type char: str
+        :param char: Chinese character
+        :rtype: list of tuple
+        :return: entries of the table, ``None`` if the table is not packed
+        """
+        if self.characterPack and self.characterPack.hasTable(tableName):
+            return self.characterPack.getEntries(tableName, char)
+
+    def _getCompiledRequest(self, name, getRequest):
+        """
+        Gets a compiled request taking bind parameters, building it on first
+        use. Requests are compiled once per instance for the current
+        *character locale* and *character domain*.
+
+        :type name: tuple
+        :param name: name of the request including the tables it depends on
+        :param getRequest: function returning the select request
+        :return: compiled request
+        """
+        key = (name, self.locale, self.getCharacterDomain())
+        if key not in self._compiledRequests:
+            self._compiledRequests[key] = self.db.compile(getRequest())
+        return self._compiledRequests[key]
+
+    def _selectRowsForCharacters(self, charList, getRequest):
+        """
+        Selects table rows for the given characters, breaking down the list
+        into small chunks to be used in ``IN (...)`` clauses.
+
+        :type charList: list of str
+        :param charList: characters for lookup
+        :param getRequest: function returning the select request for a given
+            list of characters
+        :rtype: list of tuple
+        :return: table rows
+        """
+        rows = []
+        for i in range(int(math.ceil(len(charList) / 500.0))):
+            charListPart = charList[i*500:(i+1)*500]
+            rows.extend(self.db.selectRows(getRequest(charListPart)))
+        return rows
+
     #{ Character domains
 
     def getCharacterDomain(self):
@@ -181,38 +301,90 @@ class CharacterLookup(object):
             return self.db.iterScalars(select(
                 [self._characterDomainTable.c.ChineseCharacter]))
 
+    @classmethod
+    def _getHanScriptRanges(cls):
+        """
+        Gets the start and end codepoints of the Han script ranges for
+        binary search.
+
+        :rtype: tuple
+        :return: list of start codepoints and list of end codepoints
+        """
+        if cls._hanScriptRanges is None:
+            ranges = []
+            for charRange in cls.HAN_SCRIPT_RANGES:
+                if type(charRange) == type(()):
+                    rangeFrom, rangeTo = charRange
+                else:
+                    rangeFrom, rangeTo = (charRange, charRange)
+                ranges.append((int(rangeFrom, 16), int(rangeTo, 16)))
+            ranges.sort()
+            cls._hanScriptRanges = ([start for start, _ in ranges],
+                [end for _, end in ranges])
+        return cls._hanScriptRanges
+
+    def _isHanScriptCharacter(self, char):
+        """
+        Checks if the given character is inside the Han script ranges.
+
+        :type char: str
+        :param char: character
+        :rtype: bool
+        :return: ``True`` if character is inside the Han script ranges
+        """
+        try:
+            codepoint = util.toCodepoint(char)
+        except (ValueError, TypeError):
+            return False
+        rangeStarts, rangeEnds = self._getHanScriptRanges()
+        idx = bisect.bisect_right(rangeStarts, codepoint) - 1
+        return idx >= 0 and codepoint <= rangeEnds[idx]
+
+    def _getDomainCharacterSet(self):
+        """
+        Gets the set of characters of the current table based
+        *character domain*. The set is loaded once and shared by all instances
+        with the same database connection.
+
+        :rtype: frozenset
+        :return: characters inside the current *character domain*
+        """
+        sharedState = self._sharedState.setdefault(self.db, {})
+        domainSets = sharedState.setdefault('domainCharacterSets', {})
+        if self._characterDomain not in domainSets:
+            domainSets[self._characterDomain] = frozenset(
+                self.db.iterScalars(select(
+                    [self._characterDomainTable.c.ChineseCharacter])))
+        return domainSets[self._characterDomain]
+
     def filterDomainCharacters(self, charList):
         """
         Filters a given list of characters to match only those inside the
         current *character domain*. Returns the characters in the given order.
 
+        Each distinct character is only checked once, so that long texts can
+        be filtered quickly.
+
+        .. versionchanged:: 0.3.3
+           A string can be given instead of a list of characters.
+
         :type charList: list of str
-        :param charList: characters to filter
+        :param charList: characters to filter, or a string
         :rtype: list of str
         :return: list of characters inside the current *character domain*
         """
+        if isinstance(charList, basestring):
+            charList = util.getCharacterList(charList)
+
         # constrain to selected character domain
+        charSet = set(charList)
         if self.getCharacterDomain() == 'Unicode':
-            charSet = set(charList)
-            filteredCharList = set()
-            for char in self.getDomainCharacterIterator():
-                if char in charSet:
-                    filteredCharList.add(char)
+            filteredCharSet = set([char for char in charSet
+                if self._isHanScriptCharacter(char)])
         else:
-            filteredCharList = set()
-            # break down into small chunks
-            for i in range(int(math.ceil(len(charList) / 500.0))):
-                charListPart = charList[i*500:(i+1)*500]
-                filteredCharList.update(self.db.selectScalars(select(
-                    [self._characterDomainTable.c.ChineseCharacter],
-                    self._characterDomainTable.c.ChineseCharacter.in_(
-                        charListPart))))
+            filteredCharSet = charSet & self._getDomainCharacterSet()
         # sort
-        sortedFiltered = []
-        for char in charList:
-            if char in filteredCharList:
-                sortedFiltered.append(char)
-        return sortedFiltered
+        return [char for char in charList if char in filteredCharSet]
 
     def isCharacterInDomain(self, char):
         """
@@ -224,7 +396,10 @@ class CharacterLookup(object):
         :return: ``True`` if character is inside the current character domain,
             ``False`` otherwise.
         """
-        return char in self.filterDomainCharacters([char])
+        if self.getCharacterDomain() == 'Unicode':
+            return self._isHanScriptCharacter(char)
+        else:
+            return char in self._getDomainCharacterSet()
 
     def getAvailableCharacterDomains(self):
         """
@@ -288,19 +463,24 @@ class CharacterLookup(object):
                 targetOptions=compatOptions)
 
         # lookup characters
-        table = self.db.tables[tableName]
+        def getRequest():
+            table = self.db.tables[tableName]
 
-        # constrain to selected character domain
-        if self.getCharacterDomain() == 'Unicode':
-            fromObj = []
-        else:
-            fromObj = [table.join(self._characterDomainTable,
-                table.c.ChineseCharacter \
-                    == self._characterDomainTable.c.ChineseCharacter)]
+            # constrain to selected character domain
+            if self.getCharacterDomain() == 'Unicode':
+                fromObj = []
+            else:
+                fromObj = [table.join(self._characterDomainTable,
+                    table.c.ChineseCharacter \
+                        == self._characterDomainTable.c.ChineseCharacter)]
 
-        return self.db.selectScalars(select([table.c.ChineseCharacter],
-            table.c.Reading==readingString,
-            from_obj=fromObj).order_by(table.c.ChineseCharacter))
+            return select([table.c.ChineseCharacter],
+                table.c.Reading == bindparam('reading'),
+                from_obj=fromObj).order_by(table.c.ChineseCharacter)
+
+        return self.db.selectScalars(self._getCompiledRequest(
+            ('charactersForReading', tableName), getRequest),
+            {'reading': readingString})
 
     def getReadingForCharacter(self, char, readingN, **options):
         """
@@ -336,9 +516,14 @@ class CharacterLookup(object):
         readingFactory = self._getReadingFactory()
 
         # lookup readings
-        table = self.db.tables[tableName]
-        readings = self.db.selectScalars(select([table.c.Reading],
-            table.c.ChineseCharacter==char).order_by(table.c.Reading))
+        def getRequest():
+            table = self.db.tables[tableName]
+            return select([table.c.Reading],
+                table.c.ChineseCharacter == bindparam('char'))\
+                .order_by(table.c.Reading)
+
+        readings = self.db.selectScalars(self._getCompiledRequest(
+            ('readingForCharacter', tableName), getRequest), {'char': char})
 
         # check if we need to convert reading
         if compatReading != readingN \
@@ -356,6 +541,60 @@ class CharacterLookup(object):
         else:
             return readings
 
+    def getReadingForCharacters(self, charList, readingN, **options):
+        """
+        Gets all know readings for the given characters in the given target
+        reading. Batch version of
+        :meth:`~CharacterLookup.getReadingForCharacter`, converting each
+        distinct reading only once.
+
+        .. versionadded:: 0.3.3
+
+        :type charList: list of str
+        :param charList: Chinese characters for lookup
+        :type readingN: str
+        :param readingN: name of target reading
+        :param options: additional options for handling the reading output
+        :rtype: dict
+        :return: dictionary of characters and their list of readings,
+            characters without a reading are not included
+        :raise UnsupportedError: if no mapping between characters and target
+            reading exists.
+        :raise ConversionError: if conversion from the internal source reading
+            to the given target reading fails.
+        """
+        compatReading = self._getCompatibleCharacterReading(readingN, False)
+        tableName, compatOptions \
+            = self.CHARARACTER_READING_MAPPING[compatReading]
+        readingFactory = self._getReadingFactory()
+
+        # lookup readings
+        table = self.db.tables[tableName]
+        rows = self._selectRowsForCharacters(list(set(charList)),
+            lambda chars: select([table.c.ChineseCharacter, table.c.Reading],
+                table.c.ChineseCharacter.in_(chars))\
+                .order_by(table.c.Reading))
+
+        # check if we need to convert reading
+        if compatReading != readingN \
+            or readingFactory.isReadingConversionSupported(readingN, readingN):
+            convertedReadings = {}
+            for readingString in set([r for _, r in rows]):
+                convertedReadings[readingString] = readingFactory.convert(
+                    readingString, compatReading, readingN,
+                    sourceOptions=compatOptions, targetOptions=options)
+        else:
+            convertedReadings = None
+
+        readingDict = {}
+        for char, readingString in rows:
+            if convertedReadings is not None:
+                readingString = convertedReadings[readingString]
+            readings = readingDict.setdefault(char, [])
+            if readingString not in readings:
+                readings.append(readingString)
+        return readingDict
+
     def hasMappingForCharacterToReading(self, readingN):
         """
         Returns ``True`` if a mapping between Chinese characters and the given
@@ -498,6 +737,63 @@ class CharacterLookup(object):
         if not variantType in set('CMPZST'):
             raise ValueError("'%s' is not a valid variant type" % variantType)
 
+        entries = self._getPackEntries('CharacterVariant', char)
+        if entries is not None:
+            variants = [variant for variant, vType in entries
+                if vType == variantType]
+            # constrain to selected character domain
+            if variants and self.getCharacterDomain() != 'Unicode':
+                variants = self.filterDomainCharacters(variants)
+            return variants
+
+        def getRequest():
+            table = self.db.tables['CharacterVariant']
+            # constrain to selected character domain
+            if self.getCharacterDomain() == 'Unicode':
+                fromObj = []
+            else:
+                fromObj = [table.join(self._characterDomainTable,
+                    table.c.Variant
+                        == self._characterDomainTable.c.ChineseCharacter)]
+
+            return select([table.c.Variant],
+                and_(table.c.ChineseCharacter == bindparam('char'),
+                    table.c.Type == bindparam('variantType')),
+                from_obj=fromObj).order_by(table.c.Variant)
+
+        return self.db.selectScalars(self._getCompiledRequest(
+            ('characterVariants', 'CharacterVariant'), getRequest),
+            {'char': char, 'variantType': variantType})
+
+    def getCharacterVariantsBatch(self, charList, variantType):
+        """
+        Gets the variant forms of the given type for the given characters.
+        Batch version of :meth:`~CharacterLookup.getCharacterVariants`.
+
+        .. versionadded:: 0.3.3
+
+        :type charList: list of str
+        :param charList: Chinese characters
+        :type variantType: str
+        :param variantType: type of variant(s) to be returned
+        :rtype: dict
+        :return: dictionary of characters and their list of character
+            variant(s) of given type, characters without variants are not
+            included
+        """
+        variantType = variantType.upper()
+        if not variantType in set('CMPZST'):
+            raise ValueError("'%s' is not a valid variant type" % variantType)
+
+        if self.characterPack and self.characterPack.hasTable(
+            'CharacterVariant'):
+            variantDict = {}
+            for char in set(charList):
+                variants = self.getCharacterVariants(char, variantType)
+                if variants:
+                    variantDict[char] = variants
+            return variantDict
+
         table = self.db.tables['CharacterVariant']
         # constrain to selected character domain
         if self.getCharacterDomain() == 'Unicode':
@@ -506,10 +802,16 @@ class CharacterLookup(object):
             fromObj = [table.join(self._characterDomainTable, table.c.Variant
                 == self._characterDomainTable.c.ChineseCharacter)]
 
-        return self.db.selectScalars(select([table.c.Variant],
-            and_(table.c.ChineseCharacter == char,
-                table.c.Type == variantType),
-            from_obj=fromObj).order_by(table.c.Variant))
+        rows = self._selectRowsForCharacters(list(set(charList)),
+            lambda chars: select([table.c.ChineseCharacter, table.c.Variant],
+                and_(table.c.ChineseCharacter.in_(chars),
+                    table.c.Type == variantType),
+                from_obj=fromObj).order_by(table.c.Variant))
+
+        variantDict = {}
+        for char, variant in rows:
+            variantDict.setdefault(char, []).append(variant)
+        return variantDict
 
     def getAllCharacterVariants(self, char):
         """
@@ -528,17 +830,33 @@ class CharacterLookup(object):
         :rtype: list of tuple
         :return: list of character variant(s) with their type
         """
-        table = self.db.tables['CharacterVariant']
-        # constrain to selected character domain
-        if self.getCharacterDomain() == 'Unicode':
-            fromObj = []
-        else:
-            fromObj = [table.join(self._characterDomainTable, table.c.Variant \
-                == self._characterDomainTable.c.ChineseCharacter)]
+        entries = self._getPackEntries('CharacterVariant', char)
+        if entries is not None:
+            # constrain to selected character domain
+            if entries and self.getCharacterDomain() != 'Unicode':
+                domainVariants = set(self.filterDomainCharacters(
+                    [variant for variant, _ in entries]))
+                entries = [(variant, vType) for variant, vType in entries
+                    if variant in domainVariants]
+            return entries
 
-        return self.db.selectRows(select([table.c.Variant, table.c.Type],
-            table.c.ChineseCharacter == char,
-            from_obj=fromObj).order_by(table.c.Variant))
+        def getRequest():
+            table = self.db.tables['CharacterVariant']
+            # constrain to selected character domain
+            if self.getCharacterDomain() == 'Unicode':
+                fromObj = []
+            else:
+                fromObj = [table.join(self._characterDomainTable,
+                    table.c.Variant \
+                        == self._characterDomainTable.c.ChineseCharacter)]
+
+            return select([table.c.Variant, table.c.Type],
+                table.c.ChineseCharacter == bindparam('char'),
+                from_obj=fromObj).order_by(table.c.Variant)
+
+        return self.db.selectRows(self._getCompiledRequest(
+            ('allCharacterVariants', 'CharacterVariant'), getRequest),
+            {'char': char})
 
     def getDefaultGlyph(self, char):
         """
@@ -557,6 +875,51 @@ class CharacterLookup(object):
         """
         return self.getLocaleDefaultGlyph(char, self.locale)
 
+    def getDefaultGlyphs(self, charList):
+        """
+        Gets the default *glyph* for the given characters under the chosen
+        *character locale*. Batch version of
+        :meth:`~CharacterLookup.getDefaultGlyph`.
+
+        .. versionadded:: 0.3.3
+
+        :type charList: list of str
+        :param charList: Chinese characters
+        :rtype: dict
+        :return: dictionary of characters and their glyph index, characters
+            without glyph information are not included
+        """
+        charList = list(set(charList))
+
+        if self.characterPack and self.characterPack.hasTable('Glyphs') \
+            and self.characterPack.hasTable('LocaleCharacterGlyph'):
+            glyphDict = {}
+            for char in charList:
+                try:
+                    glyphDict[char] = self.getDefaultGlyph(char)
+                except exception.NoInformationError:
+                    pass
+            return glyphDict
+
+        # if no entry given, assume default, i.e. the first glyph
+        table = self.db.tables['Glyphs']
+        glyphDict = {}
+        for char, glyph in self._selectRowsForCharacters(charList,
+            lambda chars: select([table.c.ChineseCharacter, table.c.Glyph],
+                table.c.ChineseCharacter.in_(chars))\
+                .order_by(table.c.Glyph.desc())):
+            glyphDict[char] = glyph
+
+        table = self.db.tables['LocaleCharacterGlyph']
+        for char, glyph in self._selectRowsForCharacters(charList,
+            lambda chars: select([table.c.ChineseCharacter, table.c.Glyph],
+                and_(table.c.ChineseCharacter.in_(chars),
+                    table.c.Locale.like(self._locale(self.locale))))\
+                .order_by(table.c.Glyph.desc())):
+            glyphDict[char] = glyph
+
+        return glyphDict
+
     def getLocaleDefaultGlyph(self, char, locale):
         """
         Gets the default *glyph* for the given character under the given
@@ -575,11 +938,26 @@ class CharacterLookup(object):
         :raise NoInformationError: if no glyph information is available
         :raise ValueError: if an invalid *character locale* is specified
         """
-        table = self.db.tables['LocaleCharacterGlyph']
-        glyph = self.db.selectScalar(select([table.c.Glyph],
-            and_(table.c.ChineseCharacter == char,
-                table.c.Locale.like(self._locale(locale))))\
-            .order_by(table.c.Glyph))
+        entries = self._getPackEntries('LocaleCharacterGlyph', char)
+        if entries is not None:
+            # validate locale
+            self._locale(locale)
+            for glyph, locales in entries:
+                if locale.upper() in locales:
+                    return glyph
+            # if no entry given, assume default
+            return self.getCharacterGlyphs(char)[0]
+
+        def getRequest():
+            table = self.db.tables['LocaleCharacterGlyph']
+            return select([table.c.Glyph],
+                and_(table.c.ChineseCharacter == bindparam('char'),
+                    table.c.Locale.like(bindparam('locale'))))\
+                .order_by(table.c.Glyph)
+
+        glyph = self.db.selectScalar(self._getCompiledRequest(
+            ('localeDefaultGlyph', 'LocaleCharacterGlyph'), getRequest),
+            {'char': char, 'locale': self._locale(locale)})
 
         if glyph != None:
             return glyph
@@ -598,9 +976,18 @@ class CharacterLookup(object):
         :raise NoInformationError: if no glyph information is available
         """
         # return all known glyph indices, order to be deterministic
-        table = self.db.tables['Glyphs']
-        result = self.db.selectScalars(select([table.c.Glyph],
-            table.c.ChineseCharacter == char).order_by(table.c.Glyph))
+        entries = self._getPackEntries('Glyphs', char)
+        if entries is not None:
+            result = [glyph for glyph, in entries]
+        else:
+            def getRequest():
+                table = self.db.tables['Glyphs']
+                return select([table.c.Glyph],
+                    table.c.ChineseCharacter == bindparam('char'))\
+                    .order_by(table.c.Glyph)
+
+            result = self.db.selectScalars(self._getCompiledRequest(
+                ('characterGlyphs', 'Glyphs'), getRequest), {'char': char})
         if not result:
             raise exception.NoInformationError(
                 "No glyph information available for '%s'" % char)
@@ -636,9 +1023,19 @@ class CharacterLookup(object):
 
         # if table exists use it
         if self.hasStrokeCount:
-            table = self.db.tables['StrokeCount']
-            result = self.db.selectScalar(select([table.c.StrokeCount],
-                and_(table.c.ChineseCharacter == char, table.c.Glyph == glyph)))
+            entries = self._getPackEntries('StrokeCount', char)
+            if entries is not None:
+                result = dict(entries).get(glyph)
+            else:
+                def getRequest():
+                    table = self.db.tables['StrokeCount']
+                    return select([table.c.StrokeCount],
+                        and_(table.c.ChineseCharacter == bindparam('char'),
+                            table.c.Glyph == bindparam('glyph')))
+
+                result = self.db.selectScalar(self._getCompiledRequest(
+                    ('strokeCount', 'StrokeCount'), getRequest),
+                    {'char': char, 'glyph': glyph})
             if not result:
                 raise exception.NoInformationError(
                     "Character has no stroke count information")
@@ -652,6 +1049,50 @@ class CharacterLookup(object):
                 raise exception.NoInformationError(
                     "Character has no stroke count information")
 
+    def getStrokeCounts(self, charList):
+        """
+        Gets the stroke count for the default *glyph* of the given characters.
+        Batch version of :meth:`~CharacterLookup.getStrokeCount`.
+
+        .. versionadded:: 0.3.3
+
+        :type charList: list of str
+        :param charList: Chinese characters
+        :rtype: dict
+        :return: dictionary of characters and their stroke count, characters
+            without stroke count information are not included
+        """
+        glyphDict = self.getDefaultGlyphs(charList)
+
+        strokeCountDict = {}
+        # if table exists use it
+        if self.hasStrokeCount and self.characterPack \
+            and self.characterPack.hasTable('StrokeCount'):
+            for char, glyph in glyphDict.items():
+                strokeCount = dict(self.characterPack.getEntries(
+                    'StrokeCount', char)).get(glyph)
+                if strokeCount:
+                    strokeCountDict[char] = strokeCount
+        elif self.hasStrokeCount:
+            table = self.db.tables['StrokeCount']
+            for char, glyph, strokeCount in self._selectRowsForCharacters(
+                glyphDict.keys(),
+                lambda chars: select([table.c.ChineseCharacter,
+                    table.c.Glyph, table.c.StrokeCount],
+                    table.c.ChineseCharacter.in_(chars))):
+                if glyphDict[char] == glyph and strokeCount:
+                    strokeCountDict[char] = strokeCount
+        else:
+            # Plan B, use stroke order
+            for char, glyph in glyphDict.items():
+                try:
+                    strokeCountDict[char] = len(self.getStrokeOrder(char,
+                        glyph=glyph))
+                except exception.NoInformationError:
+                    pass
+
+        return strokeCountDict
+
     def getStrokeCountDict(self):
         """
         Returns a stroke count dictionary for all characters in the chosen
@@ -1098,19 +1539,33 @@ class CharacterLookup(object):
         :return: dictionary of key pair character, *glyph* and value stroke
             order
         """
+        if self.hasDerivedStrokeOrder:
+            table = self.db.tables['DerivedStrokeOrder']
+            if self.getCharacterDomain() == 'Unicode':
+                fromObj = []
+            else:
+                fromObj = [table.join(self._characterDomainTable,
+                    table.c.ChineseCharacter \
+                        == self._characterDomainTable.c.ChineseCharacter)]
+            return dict([((char, glyph), strokeOrder)
+                for char, glyph, strokeOrder in self.db.iterRows(select(
+                    [table.c.ChineseCharacter, table.c.Glyph,
+                        table.c.StrokeOrder], from_obj=fromObj))])
+
         tables = [self.db.tables[tableName] \
             for tableName in ['StrokeOrder', 'CharacterDecomposition']]
         # constrain to selected character domain
         if self.getCharacterDomain() != 'Unicode':
-            tables = [table.join(self._characterDomainTable,
-                table.c.ChineseCharacter \
+            tables = [sourceTable.join(self._characterDomainTable,
+                sourceTable.c.ChineseCharacter \
                     == self._characterDomainTable.c.ChineseCharacter) \
-                for table in tables]
+                for sourceTable in tables]
 
         # get all character/glyph pairs for which we have glyph information
         chars = self.db.selectRows(
-            union(*[select([table.c.ChineseCharacter, table.c.Glyph]) \
-                for table in tables]))
+            union(*[select([sourceTable.c.ChineseCharacter,
+                    sourceTable.c.Glyph]) \
+                for sourceTable in tables]))
 
         strokeOrderDict = {}
         cache = {}
@@ -1124,7 +1579,9 @@ class CharacterLookup(object):
     def _getStrokeOrderEntry(self, char, glyph):
         """
         Gets the stroke order sequence for the given character from the
-        database's stroke order lookup table.
+        database's stroke order lookup table. If available, table
+        ``DerivedStrokeOrder`` is used which also includes stroke orders
+        derived from the character decomposition.
 
         :type char: str
         :param char: Chinese character
@@ -1134,10 +1591,20 @@ class CharacterLookup(object):
         :return: string of stroke abbreviations separated by spaces and
             hyphens.
         """
-        table = self.db.tables['StrokeOrder']
-        return self.db.selectScalar(select([table.c.StrokeOrder],
-            and_(table.c.ChineseCharacter == char,
-                table.c.Glyph == glyph), distinct=True))
+        if self.hasDerivedStrokeOrder:
+            tableName = 'DerivedStrokeOrder'
+        else:
+            tableName = 'StrokeOrder'
+
+        def getRequest():
+            table = self.db.tables[tableName]
+            return select([table.c.StrokeOrder],
+                and_(table.c.ChineseCharacter == bindparam('char'),
+                    table.c.Glyph == bindparam('glyph')), distinct=True)
+
+        return self.db.selectScalar(self._getCompiledRequest(
+            ('strokeOrder', tableName), getRequest),
+            {'char': char, 'glyph': glyph})
 
     def _buildStrokeOrder(self, char, glyph, includePartial=False, cache=None):
         """
@@ -1156,7 +1623,8 @@ class CharacterLookup(object):
             returned even if only partial information is available. Unknown
             strokes will be replaced by a question mark (``?``).
         :type cache: dict
-        :param cache: optional dict of cached stroke order entries
+        :param cache: optional dict of cached stroke order entries, by default
+            the bounded cache of this instance is used
         :rtype: str
         :return: string of stroke abbreviations separated by spaces and hyphens.
         """
@@ -1279,17 +1747,19 @@ class CharacterLookup(object):
                 return (strokeOrder, index)
 
             # Try to find a partition without unknown components
-            for decomposition in self.getDecompositionEntries(char, glyph):
+            for decomposition in self._getDecompositionGraph()\
+                .getDecompositionEntries(char, glyph):
                 so, _ = getFromEntry(decomposition)
                 if so:
                     return ' '.join(so)
 
         if cache is None:
-            cache = {}
+            cache = self._strokeOrderCache[includePartial]
         if (char, glyph) not in cache:
             # if there is an entry for the whole character return it
             order = self._getStrokeOrderEntry(char, glyph)
-            if not order:
+            # table DerivedStrokeOrder already includes all full orders
+            if not order and (includePartial or not self.hasDerivedStrokeOrder):
                 order = getFromDecomposition(char, glyph)
             cache[(char, glyph)] = order
 
@@ -1310,14 +1780,54 @@ class CharacterLookup(object):
         :raise NoInformationError: if no Kangxi radical index information for
             given character
         """
-        table = self.db.tables['CharacterKangxiRadical']
-        result = self.db.selectScalar(select([table.c.RadicalIndex],
-            table.c.ChineseCharacter == char))
+        entries = self._getPackEntries('CharacterKangxiRadical', char)
+        if entries is not None:
+            result = entries and entries[0][0]
+        else:
+            def getRequest():
+                table = self.db.tables['CharacterKangxiRadical']
+                return select([table.c.RadicalIndex],
+                    table.c.ChineseCharacter == bindparam('char'))
+
+            result = self.db.selectScalar(self._getCompiledRequest(
+                ('characterKangxiRadicalIndex', 'CharacterKangxiRadical'),
+                getRequest), {'char': char})
         if not result:
             raise exception.NoInformationError(
                 "Character has no Kangxi radical information")
         return result
 
+    def getCharacterKangxiRadicalIndices(self, charList):
+        """
+        Gets the Kangxi radical index for the given characters as defined by
+        the *Unihan* database. Batch version of
+        :meth:`~CharacterLookup.getCharacterKangxiRadicalIndex`.
+
+        .. versionadded:: 0.3.3
+
+        :type charList: list of str
+        :param charList: Chinese characters
+        :rtype: dict
+        :return: dictionary of characters and their Kangxi radical index,
+            characters without information are not included
+        """
+        if self.characterPack and self.characterPack.hasTable(
+            'CharacterKangxiRadical'):
+            radicalIndexDict = {}
+            for char in set(charList):
+                entries = self.characterPack.getEntries(
+                    'CharacterKangxiRadical', char)
+                if entries and entries[0][0]:
+                    radicalIndexDict[char] = entries[0][0]
+            return radicalIndexDict
+
+        table = self.db.tables['CharacterKangxiRadical']
+        return dict([(char, radicalIndex) for char, radicalIndex
+            in self._selectRowsForCharacters(list(set(charList)),
+                lambda chars: select([table.c.ChineseCharacter,
+                    table.c.RadicalIndex], table.c.ChineseCharacter.in_(chars)))
+            if radicalIndex])
+
     def getCharacterKangxiRadicalResidualStrokeCount(self, char, glyph=None):
         u"""
         Gets the Kangxi radical form (either a *Unicode radical form* or a
@@ -1528,10 +2038,25 @@ class CharacterLookup(object):
         """
         if glyph == None:
             glyph = self.getDefaultGlyph(char)
-        table = self.db.tables['CharacterResidualStrokeCount']
-        entry = self.db.selectScalar(select([table.c.ResidualStrokeCount],
-            and_(table.c.ChineseCharacter == char, table.c.Glyph == glyph,
-                table.c.RadicalIndex == radicalIndex)))
+        entries = self._getPackEntries('CharacterResidualStrokeCount', char)
+        if entries is not None:
+            entry = None
+            for entryGlyph, entryRadicalIndex, residualStrokeCount in entries:
+                if entryGlyph == glyph and entryRadicalIndex == radicalIndex:
+                    entry = residualStrokeCount
+                    break
+        else:
+            def getRequest():
+                table = self.db.tables['CharacterResidualStrokeCount']
+                return select([table.c.ResidualStrokeCount],
+                    and_(table.c.ChineseCharacter == bindparam('char'),
+                        table.c.Glyph == bindparam('glyph'),
+                        table.c.RadicalIndex == bindparam('radicalIndex')))
+
+            entry = self.db.selectScalar(self._getCompiledRequest(
+                ('characterResidualStrokeCount',
+                    'CharacterResidualStrokeCount'), getRequest),
+                {'char': char, 'glyph': glyph, 'radicalIndex': radicalIndex})
         if entry != None:
             return entry
         else:
@@ -2091,10 +2616,27 @@ class CharacterLookup(object):
             will be returned
         :rtype: list of tuple
         :return: list of pairs of matching characters and their *glyphs*
+
+        .. versionchanged:: 0.3.3
+           If option ``componentIndex`` is set for this instance, results are
+           looked up from an in-memory index shared by all instances with the
+           same database connection. Matches with the same stroke count are
+           then sorted by character.
         """
         if not componentConstruct:
             return []
 
+        if self.componentIndex:
+            result = self._getComponentIndex().getCharactersForComponents(
+                componentConstruct, self.getCharacterDomain(),
+                not includeAllGlyphs and self.locale or None)
+
+            if not resultIncludeRadicalForms:
+                # exclude radical characters found in decomposition
+                result = [(char, glyph) for char, glyph in result \
+                    if not self.isRadicalChar(char)]
+            return result
+
         # create where clauses
         lookupTable = self.db.tables['ComponentLookup']
         localeTable = self.db.tables['LocaleCharacterGlyph']
@@ -2151,6 +2693,32 @@ class CharacterLookup(object):
 
         return result
 
+    def _getComponentIndex(self):
+        """
+        Gets the component index shared by all instances using the same
+        database connection.
+
+        :rtype: instance
+        :return: :class:`~cjklib.characterlookup.ComponentIndex` instance
+        """
+        sharedState = self._sharedState.setdefault(self.db, {})
+        if 'componentIndex' not in sharedState:
+            sharedState['componentIndex'] = ComponentIndex(self.db)
+        return sharedState['componentIndex']
+
+    def _getDecompositionGraph(self):
+        """
+        Gets the decomposition graph shared by all instances using the same
+        database connection. The graph is loaded on first use.
+
+        :rtype: instance
+        :return: :class:`~cjklib.characterlookup.DecompositionGraph` instance
+        """
+        sharedState = self._sharedState.setdefault(self.db, {})
+        if 'decompositionGraph' not in sharedState:
+            sharedState['decompositionGraph'] = DecompositionGraph(self.db)
+        return sharedState['decompositionGraph']
+
     def getDecompositionEntries(self, char, glyph=None):
         """
         Gets the decomposition of the given character into components from the
@@ -2181,6 +2749,12 @@ class CharacterLookup(object):
                 # no decomposition available
                 return []
 
+        # answer from the decomposition graph if already loaded
+        sharedState = self._sharedState.get(self.db, {})
+        if 'decompositionGraph' in sharedState:
+            return sharedState['decompositionGraph'].getDecompositionEntries(
+                char, glyph)
+
         # get entries from database
         table = self.db.tables['CharacterDecomposition']
         result = self.db.selectScalars(select([table.c.Decomposition],
@@ -2335,24 +2909,8 @@ class CharacterLookup(object):
                 # no decomposition available
                 return []
 
-        decompositionTreeList = []
-        # get tree for each decomposition
-        for componentsList in self.getDecompositionEntries(char, glyph=glyph):
-            decompositionTree = []
-            for component in componentsList:
-                if type(component) != type(()):
-                    # IDS operator
-                    decompositionTree.append(component)
-                else:
-                    # Chinese character with glyph info
-                    character, characterGlyph = component
-                    # get partition of component recursively
-                    componentTree = self.getDecompositionTreeList(character,
-                        glyph=characterGlyph)
-                    decompositionTree.append((character, characterGlyph,
-                        componentTree))
-            decompositionTreeList.append(decompositionTree)
-        return decompositionTreeList
+        return self._getDecompositionGraph().getDecompositionTreeList(char,
+            glyph)
 
     def isComponentInCharacter(self, component, char, glyph=None,
         componentGlyph=None):
@@ -2399,24 +2957,388 @@ class CharacterLookup(object):
             return len(glyphs) > 0 and (componentGlyph == None \
                 or componentGlyph in glyphs)
         else:
-            # use slow way with going through the decomposition tree
-            # get decomposition for the first character from table
-            for componentsList in self.getDecompositionEntries(char,
-                glyph=glyph):
-                # got through decomposition and check for components
-                for charComponent in componentsList:
-                    if type(charComponent) == type(()):
-                        character, characterGlyph = charComponent
-                        if character != u'？':
-                            # check if character and glyph match
-                            if character == component \
-                                and (componentGlyph == None or
-                                    characterGlyph == componentGlyph):
-                                return True
-                            # else recursively step into decomposition of
-                            #   current component
-                            if self.isComponentInCharacter(character, component,
-                                glyph=characterGlyph,
-                                componentGlyph=componentGlyph):
-                                return True
-            return False
+            # check the transitive closure of the decomposition graph
+            if component == u'？':
+                return False
+            components = self._getDecompositionGraph().getComponents(char,
+                glyph)
+            if componentGlyph == None:
+                return component in [character
+                    for character, _ in components]
+            else:
+                return (component, componentGlyph) in components
+
+
+class ComponentIndex(object):
+    """
+    In-memory index mapping components to the characters they are part of.
+    Lookups are done as set operations on integer ids of character/*glyph*
+    pairs. Ids are given in order of stroke count, so that sorting ids sorts
+    results.
+
+    The index is built from table ``ComponentLookup`` or, if not available,
+    from the character decomposition data.
+
+    .. versionadded:: 0.3.3
+    """
+    def __init__(self, dbConnectInst):
+        """
+        :type dbConnectInst: instance
+        :param dbConnectInst: instance of a
+            :class:`~cjklib.dbconnector.DatabaseConnector`
+        """
+        self.db = dbConnectInst
+
+        pairComponents = self._getComponents()
+
+        # assign ids in stroke count order, missing counts first like SQL
+        strokeCountDict = {}
+        if self.db.hasTable('StrokeCount'):
+            table = self.db.tables['StrokeCount']
+            strokeCountDict = dict([((char, glyph), strokeCount)
+                for char, glyph, strokeCount in self.db.iterRows(select(
+                    [table.c.ChineseCharacter, table.c.Glyph,
+                        table.c.StrokeCount]))])
+        def sortKey(pair):
+            strokeCount = strokeCountDict.get(pair)
+            return (strokeCount is not None, strokeCount, pair)
+        self._pairs = sorted(pairComponents.keys(), key=sortKey)
+        pairIds = dict([(pair, pairId)
+            for pairId, pair in enumerate(self._pairs)])
+
+        componentIds = {}
+        characterIds = {}
+        for pair, components in pairComponents.iteritems():
+            pairId = pairIds[pair]
+            characterIds.setdefault(pair[0], set()).add(pairId)
+            for component in components:
+                componentIds.setdefault(component, set()).add(pairId)
+        self._componentIds = dict([(component, frozenset(ids))
+            for component, ids in componentIds.iteritems()])
+        self._characterIds = dict([(char, frozenset(ids))
+            for char, ids in characterIds.iteritems()])
+
+        # glyph locales per id, ids without entry are valid for all locales
+        self._pairLocales = {}
+        table = self.db.tables['LocaleCharacterGlyph']
+        for char, glyph, locale in self.db.iterRows(select(
+            [table.c.ChineseCharacter, table.c.Glyph, table.c.Locale])):
+            if (char, glyph) in pairIds:
+                self._pairLocales.setdefault(pairIds[(char, glyph)],
+                    set()).add(locale.upper())
+
+        self._localeIds = {}
+        self._domainIds = {}
+
+    def _getComponents(self):
+        """
+        Gets the components of all character/*glyph* pairs.
+
+        :rtype: dict
+        :return: dictionary of character/*glyph* pairs and their set of
+            components
+        """
+        pairComponents = {}
+        if self.db.hasTable('ComponentLookup'):
+            table = self.db.tables['ComponentLookup']
+            for char, glyph, component in self.db.iterRows(select(
+                [table.c.ChineseCharacter, table.c.Glyph, table.c.Component])):
+                pairComponents.setdefault((char, glyph), set()).add(component)
+        else:
+            # resolve decompositions using the shared graph, only characters
+            #   with decomposition are included, like the table does
+            cjk = CharacterLookup('T', dbConnectInst=self.db)
+            graph = cjk._getDecompositionGraph()
+            for char, glyph in graph.getPairs():
+                pairComponents[(char, glyph)] = set([component
+                    for component, _ in graph.getComponents(char, glyph)])
+
+        return pairComponents
+
+    def _getLocaleIds(self, locale):
+        """
+        Gets the ids of pairs whose glyph is valid under the given locale.
+
+        :type locale: str
+        :param locale: *character locale* (one out of TCJKV)
+        :rtype: frozenset
+        :return: set of ids
+        """
+        if locale not in self._localeIds:
+            self._localeIds[locale] = frozenset([pairId for pairId
+                in range(len(self._pairs))
+                if pairId not in self._pairLocales
+                    or [l for l in self._pairLocales[pairId] if locale in l]])
+        return self._localeIds[locale]
+
+    def _getDomainIds(self, characterDomain):
+        """
+        Gets the ids of pairs whose character is inside the given domain.
+
+        :type characterDomain: str
+        :param characterDomain: *character domain*
+        :rtype: frozenset
+        :return: set of ids
+        """
+        if characterDomain not in self._domainIds:
+            table = self.db.tables[characterDomain + 'Set']
+            ids = set()
+            for char in self.db.iterScalars(select([table.c.ChineseCharacter])):
+                ids.update(self._characterIds.get(char, []))
+            self._domainIds[characterDomain] = frozenset(ids)
+        return self._domainIds[characterDomain]
+
+    def getCharactersForComponents(self, componentConstruct,
+        characterDomain='Unicode', locale=None):
+        """
+        Gets all characters that contain at least one component per list
+        entry, sorted by stroke count.
+
+        :type componentConstruct: list of list of str
+        :param componentConstruct: list of character components given as single
+            characters or, for alternative characters, given as a list
+        :type characterDomain: str
+        :param characterDomain: *character domain* to constrain results to
+        :type locale: str
+        :param locale: *character locale* whose glyphs are returned, ``None``
+            to return all glyphs
+        :rtype: list of tuple
+        :return: list of pairs of matching characters and their *glyphs*
+        """
+        ids = None
+        for characterList in componentConstruct:
+            # find chars for components, also include 米 for [u'米', u'木'].
+            matchingIds = set()
+            for char in characterList:
+                matchingIds.update(self._componentIds.get(char, []))
+                matchingIds.update(self._characterIds.get(char, []))
+
+            if ids is None:
+                ids = matchingIds
+            else:
+                ids &= matchingIds
+            if not ids:
+                return []
+
+        if locale is not None:
+            ids &= self._getLocaleIds(locale)
+        if characterDomain != 'Unicode':
+            ids &= self._getDomainIds(characterDomain)
+
+        return [self._pairs[pairId] for pairId in sorted(ids)]
+
+
+class DecompositionGraph(object):
+    """
+    In-memory graph of character decompositions. Nodes are character/*glyph*
+    pairs, edges lead from a character to the components of its
+    decompositions.
+
+    The graph is loaded from table ``CharacterDecomposition`` with a single
+    query. Transitive closures and decomposition trees are memoized, so
+    resolving deep decompositions doesn't need one query per layer.
+
+    Cycles in the decomposition data are detected while computing closures,
+    components on a cycle are not expanded again in decomposition trees.
+
+    .. versionadded:: 0.3.3
+    """
+    def __init__(self, dbConnectInst):
+        """
+        :type dbConnectInst: instance
+        :param dbConnectInst: instance of a
+            :class:`~cjklib.dbconnector.DatabaseConnector`
+        """
+        self.db = dbConnectInst
+
+        self._entries = {}
+        table = self.db.tables['CharacterDecomposition']
+        for char, glyph, decomposition in self.db.iterRows(select(
+            [table.c.ChineseCharacter, table.c.Glyph, table.c.Decomposition])\
+                .order_by(table.c.SubIndex)):
+            self._entries.setdefault((char, glyph), []).append(
+                CharacterLookup.decompositionFromString(decomposition))
+
+        # adjacency lists of components in order of appearance
+        self._edges = {}
+        for pair, decompositions in self._entries.iteritems():
+            components = []
+            for decomposition in decompositions:
+                for entry in decomposition:
+                    if type(entry) == type(()) and entry not in components:
+                        components.append(entry)
+            self._edges[pair] = components
+
+        self._closures = {}
+        self._cycles = []
+        self._cyclicPairs = set()
+        self._treeLists = {}
+
+    def getPairs(self):
+        """
+        Gets all character/*glyph* pairs with a decomposition.
+
+        :rtype: list of tuple
+        :return: list of character/*glyph* pairs
+        """
+        return self._entries.keys()
+
+    def getDecompositionEntries(self, char, glyph):
+        """
+        Gets the first layer decompositions of the given character.
+
+        :type char: str
+        :param char: Chinese character
+        :type glyph: int
+        :param glyph: *glyph* of the character
+        :rtype: list
+        :return: list of first layer decompositions
+        """
+        return [list(decomposition)
+            for decomposition in self._entries.get((char, glyph), [])]
+
+    def _resolve(self, pair):
+        """
+        Computes the transitive closure of the given pair and of all pairs
+        reachable from it. Strongly connected components are found using
+        Tarjan's algorithm, members of one component share their closure.
+
+        :type pair: tuple
+        :param pair: character/*glyph* pair
+        """
+        index = {}
+        lowLink = {}
+        stack = []
+        onStack = set()
+
+        def visit(node):
+            index[node] = lowLink[node] = len(index)
+            stack.append(node)
+            onStack.add(node)
+            for component in self._edges.get(node, []):
+                if component in self._closures:
+                    continue
+                if component not in index:
+                    visit(component)
+                    lowLink[node] = min(lowLink[node], lowLink[component])
+                elif component in onStack:
+                    lowLink[node] = min(lowLink[node], index[component])
+
+            if lowLink[node] == index[node]:
+                members = []
+                while True:
+                    member = stack.pop()
+                    onStack.remove(member)
+                    members.append(member)
+                    if member == node:
+                        break
+
+                closure = set()
+                for member in members:
+                    for component in self._edges.get(member, []):
+                        closure.add(component)
+                        if component in self._closures:
+                            closure.update(self._closures[component])
+                closure = frozenset(closure)
+
+                if len(members) > 1 or node in self._edges.get(node, []):
+                    self._cycles.append(members)
+                    self._cyclicPairs.update(members)
+                for member in members:
+                    self._closures[member] = closure
+
+        if pair not in self._closures:
+            visit(pair)
+
+    def getComponents(self, char, glyph):
+        """
+        Gets all components of the given character, i.e. the transitive
+        closure over its decompositions.
+
+        :type char: str
+        :param char: Chinese character
+        :type glyph: int
+        :param glyph: *glyph* of the character
+        :rtype: frozenset
+        :return: set of component/*glyph* pairs
+        """
+        self._resolve((char, glyph))
+        return self._closures[(char, glyph)]
+
+    def getCycles(self):
+        """
+        Gets all cycles in the decomposition data.
+
+        :rtype: list of list of tuple
+        :return: list of character/*glyph* pairs per cycle
+        """
+        for pair in self._entries:
+            self._resolve(pair)
+        return [list(members) for members in self._cycles]
+
+    def isCyclic(self, char, glyph):
+        """
+        Checks if the given character is part of a decomposition cycle.
+
+        :type char: str
+        :param char: Chinese character
+        :type glyph: int
+        :param glyph: *glyph* of the character
+        :rtype: bool
+        :return: ``True`` if the character is its own component
+        """
+        self._resolve((char, glyph))
+        return (char, glyph) in self._cyclicPairs
+
+    def _getTreeList(self, pair, path):
+        """
+        Gets the decomposition trees of the given pair. Trees are memoized
+        unless the pair is part of a cycle, as then its tree depends on the
+        path it was reached from.
+
+        :type pair: tuple
+        :param pair: character/*glyph* pair
+        :type path: tuple
+        :param path: pairs already expanded above the given pair
+        :rtype: list
+        :return: list of decomposition trees
+        """
+        if pair in self._treeLists:
+            return self._treeLists[pair]
+
+        self._resolve(pair)
+        path = path + (pair, )
+        treeList = []
+        for decomposition in self._entries.get(pair, []):
+            tree = []
+            for entry in decomposition:
+                if type(entry) != type(()):
+                    # IDS operator
+                    tree.append(entry)
+                elif entry in path:
+                    # don't run into a cycle
+                    tree.append((entry[0], entry[1], []))
+                else:
+                    tree.append((entry[0], entry[1],
+                        self._getTreeList(entry, path)))
+            treeList.append(tree)
+
+        if pair not in self._cyclicPairs:
+            self._treeLists[pair] = treeList
+        return treeList
+
+    def getDecompositionTreeList(self, char, glyph):
+        """
+        Gets the decomposition of the given character into components as a
+        list of decomposition trees.
+
+        :type char: str
+        :param char: Chinese character
+        :type glyph: int
+        :param glyph: *glyph* of the character
+        :rtype: list
+        :return: list of decomposition trees, see
+            :meth:`~cjklib.characterlookup.CharacterLookup.getDecompositionTreeList`
+        """
+        # memoized trees are shared, give the caller its own copy
+        return copy.deepcopy(self._getTreeList((char, glyph), ()))
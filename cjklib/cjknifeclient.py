@@ -0,0 +1,155 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# This file is part of cjklib.
+#
+# cjklib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# cjklib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with cjklib.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Thin client for a :mod:`cjklib.cjknife` server started with
+``cjknife --server``.
+
+The client forwards its command line to the server over a local Unix socket
+and prints the server's response. Database connections and caches of the
+server stay warm between calls, so that repeated calls are answered quickly.
+If no server is running, the command is run in the client's own process.
+
+This module only depends on the standard library to keep the client's
+startup time low.
+
+.. versionadded:: 0.3.3
+"""
+
+__all__ = ["getDefaultSocketPath", "sendMessage", "receiveMessage",
+    "callServer"]
+
+import os
+import sys
+import socket
+import struct
+import locale
+import tempfile
+
+SOCKET_ENVIRONMENT_VARIABLE = 'CJKNIFE_SOCKET'
+"""Environment variable overriding the default socket path."""
+
+def getDefaultSocketPath():
+    """
+    Returns the path of the server's socket. The path can be set with
+    environment variable ``CJKNIFE_SOCKET``, by default a file in the
+    temporary directory named after the user is used.
+
+    :rtype: str
+    :return: path of the socket
+    """
+    if os.environ.get(SOCKET_ENVIRONMENT_VARIABLE):
+        return os.environ[SOCKET_ENVIRONMENT_VARIABLE]
+    userId = getattr(os, 'getuid', lambda: 0)()
+    return os.path.join(tempfile.gettempdir(), 'cjknife-%d.socket' % userId)
+
+def _receiveExactly(connection, size):
+    """Receives the given number of bytes from the connection."""
+    chunks = []
+    while size > 0:
+        chunk = connection.recv(min(size, 65536))
+        if not chunk:
+            raise IOError("Connection closed unexpectedly")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+def sendMessage(connection, parts):
+    """
+    Sends a message consisting of the given byte strings. Each part is
+    prefixed with its length.
+
+    :type connection: socket
+    :param connection: connected socket
+    :type parts: list of str
+    :param parts: byte strings
+    """
+    data = [struct.pack('!I', len(parts))]
+    for part in parts:
+        data.append(struct.pack('!I', len(part)))
+        data.append(part)
+    connection.sendall(''.join(data))
+
+def receiveMessage(connection):
+    """
+    Receives a message sent with
+    :func:`~cjklib.cjknifeclient.sendMessage`.
+
+    :type connection: socket
+    :param connection: connected socket
+    :rtype: list of str
+    :return: byte strings
+    """
+    count, = struct.unpack('!I', _receiveExactly(connection, 4))
+    parts = []
+    for _ in range(count):
+        size, = struct.unpack('!I', _receiveExactly(connection, 4))
+        parts.append(_receiveExactly(connection, size))
+    return parts
+
+def callServer(argv, socketPath=None, encoding=None):
+    """
+    Runs cjknife with the given arguments on the server.
+
+    :type argv: list of str
+    :param argv: command line arguments, without the program name
+    :type socketPath: str
+    :param socketPath: path of the server's socket
+    :type encoding: str
+    :param encoding: encoding of the arguments and the returned output
+    :rtype: tuple
+    :return: exit status, output and error output as byte strings
+    :raise socket.error: if no server is listening
+    """
+    socketPath = socketPath or getDefaultSocketPath()
+    encoding = encoding or sys.stdout.encoding \
+        or locale.getpreferredencoding() or 'ascii'
+
+    if not hasattr(socket, 'AF_UNIX'):
+        raise socket.error("Unix sockets not supported")
+    # don't talk to a server of another user
+    if os.stat(socketPath).st_uid != getattr(os, 'getuid', lambda: 0)():
+        raise socket.error("Socket '%s' owned by other user" % socketPath)
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socketPath)
+        sendMessage(connection, [encoding] + list(argv))
+        status, output, errorOutput = receiveMessage(connection)
+    finally:
+        connection.close()
+
+    return int(status), output, errorOutput
+
+def main():
+    """
+    Main method
+    """
+    try:
+        status, output, errorOutput = callServer(sys.argv[1:])
+    except (socket.error, OSError, IOError):
+        # no server running, fall back to an own process
+        from cjklib import cjknife
+        cjknife.main()
+        return
+
+    sys.stdout.write(output)
+    sys.stderr.write(errorOutput)
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
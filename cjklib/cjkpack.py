@@ -0,0 +1,340 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# This file is part of cjklib.
+#
+# cjklib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# cjklib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with cjklib.  If not, see <http://www.gnu.org/licenses/>.
+
+u"""
+Compact binary snapshot of character data ("cjkpack") for lookups without
+SQL.
+
+Tables of per-character data used by
+:class:`~cjklib.characterlookup.CharacterLookup`, like glyphs, stroke counts,
+radicals and variants, are compiled into a single versioned file. For each
+table the file holds a sorted array of code points, an array of offsets and
+one array of integer values per column. The file is memory-mapped at runtime
+and entries are found by binary search without reading the whole file.
+
+Example:
+
+- Export the character data of the default database:
+
+    >>> from cjklib import cjkpack
+    >>> cjkpack.exportCharacterPack('cjklib.pack')
+
+- Use it for lookups:
+
+    >>> from cjklib.characterlookup import CharacterLookup
+    >>> cjk = CharacterLookup('T', characterPack='cjklib.pack')
+    >>> cjk.getStrokeCount(u'说')
+    9
+
+- On the command line::
+
+    $ python -m cjklib.cjkpack cjklib.pack
+
+.. versionadded:: 0.3.3
+"""
+
+__all__ = ["PACK_VERSION", "PACK_TABLES", "exportCharacterPack",
+    "CharacterPack"]
+
+import os
+import sys
+import mmap
+import struct
+import bisect
+import tempfile
+from optparse import OptionParser
+
+from cjklib import util
+
+PACK_VERSION = 1
+"""Version of the file format, files of other versions are rejected."""
+
+PACK_TABLES = [
+    ('Glyphs', [('Glyph', 'int')]),
+    ('LocaleCharacterGlyph', [('Glyph', 'int'), ('Locale', 'letters')]),
+    ('StrokeCount', [('Glyph', 'int'), ('StrokeCount', 'int')]),
+    ('CharacterKangxiRadical', [('RadicalIndex', 'int')]),
+    ('CharacterResidualStrokeCount', [('Glyph', 'int'),
+        ('RadicalIndex', 'int'), ('ResidualStrokeCount', 'int')]),
+    ('CharacterVariant', [('Variant', 'char'), ('Type', 'letters')]),
+    ]
+"""
+Tables included in a pack, keyed by column ``ChineseCharacter``, with their
+value columns and column types. Type ``int`` stores integers, ``char`` single
+characters and ``letters`` sets of upper case letters (e.g. locales).
+"""
+
+_MAGIC = 'CJKPACK\x00'
+# Start of every pack file
+
+_HEADER = struct.Struct('<8sII40s')
+# Magic, version, number of sections and database fingerprint
+
+_SECTION_HEADER = struct.Struct('<32sIII8s')
+# Table name, number of keys, number of values, number of columns and
+#   column type codes
+
+_INTEGER = struct.Struct('<i')
+# Single array item
+
+_NULL = -0x80000000
+# Stored for database NULL values
+
+_TYPE_CODES = {'int': 'i', 'char': 'c', 'letters': 'l'}
+# Codes of the column types stored in the section header
+
+def _encodeValue(columnType, value):
+    """Encodes a column value as an integer."""
+    if value is None:
+        return _NULL
+    elif columnType == 'int':
+        return int(value)
+    elif columnType == 'char':
+        return util.toCodepoint(value)
+    else:
+        mask = 0
+        for letter in value.upper():
+            if 'A' <= letter <= 'Z':
+                mask |= 1 << (ord(letter) - ord('A'))
+        return mask
+
+def _decodeInteger(value):
+    """Decodes a value of type ``int``."""
+    if value == _NULL:
+        return None
+    return value
+
+def _decodeCharacter(value):
+    """Decodes a value of type ``char``."""
+    if value == _NULL:
+        return None
+    return util.fromCodepoint(value)
+
+def _decodeLetters(value):
+    """Decodes a value of type ``letters``."""
+    if value == _NULL:
+        return None
+    return u''.join([unichr(ord('A') + i) for i in range(26)
+        if value & (1 << i)])
+
+_DECODERS = {'i': _decodeInteger, 'c': _decodeCharacter, 'l': _decodeLetters}
+# Decoder per column type code
+
+def exportCharacterPack(filePath, dbConnectInst=None):
+    """
+    Compiles the character data of the given database into a pack file.
+    Tables not available in the database are left out.
+
+    :type filePath: str
+    :param filePath: path of the pack file to write
+    :type dbConnectInst: instance
+    :param dbConnectInst: instance of a
+        :class:`~cjklib.dbconnector.DatabaseConnector`, by default the default
+        connection is used
+    """
+    from sqlalchemy import select
+
+    if dbConnectInst:
+        db = dbConnectInst
+    else:
+        from cjklib import dbconnector
+        db = dbconnector.getDBConnector()
+
+    sections = []
+    for tableName, columns in PACK_TABLES:
+        if not db.hasTable(tableName):
+            continue
+        table = db.tables[tableName]
+        rows = []
+        for row in db.iterRows(select([table.c.ChineseCharacter]
+            + [table.c[column] for column, _ in columns])):
+            try:
+                codepoint = util.toCodepoint(row[0])
+            except (ValueError, TypeError):
+                # not a single character
+                continue
+            rows.append((codepoint, tuple([_encodeValue(columnType, value)
+                for (_, columnType), value in zip(columns, row[1:])])))
+        # sort by character, then by values, e.g. glyph
+        rows.sort()
+
+        keys = []
+        offsets = []
+        for idx, (codepoint, _) in enumerate(rows):
+            if not keys or keys[-1] != codepoint:
+                keys.append(codepoint)
+                offsets.append(idx)
+        offsets.append(len(rows))
+
+        data = [_SECTION_HEADER.pack(tableName, len(keys), len(rows),
+                len(columns), ''.join([_TYPE_CODES[columnType]
+                    for _, columnType in columns])),
+            struct.pack('<%di' % len(keys), *keys),
+            struct.pack('<%di' % len(offsets), *offsets)]
+        for columnIdx in range(len(columns)):
+            data.append(struct.pack('<%di' % len(rows),
+                *[values[columnIdx] for _, values in rows]))
+        sections.append(''.join(data))
+
+    fingerprint = db.getDatabaseFingerprint() or ''
+
+    # write to a temporary file first so readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(filePath))
+    handle, tempPath = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        f = os.fdopen(handle, 'wb')
+        try:
+            f.write(_HEADER.pack(_MAGIC, PACK_VERSION, len(sections),
+                fingerprint))
+            for section in sections:
+                f.write(section)
+        finally:
+            f.close()
+        if os.path.exists(filePath) and sys.platform == 'win32':
+            os.remove(filePath)
+        os.rename(tempPath, filePath)
+    except:
+        os.remove(tempPath)
+        raise
+
+
+class _PackArray(object):
+    """
+    Read-only sequence of 32 bit integers inside a buffer. Items are unpacked
+    on access, so the :mod:`bisect` functions can search the buffer without
+    copying it.
+    """
+    def __init__(self, buf, offset, length):
+        self._buf = buf
+        self._offset = offset
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, idx):
+        if idx < 0 or idx >= self._length:
+            raise IndexError("pack array index out of range")
+        return _INTEGER.unpack_from(self._buf, self._offset + 4 * idx)[0]
+
+
+class CharacterPack(object):
+    """
+    Memory-mapped character data pack written by
+    :func:`~cjklib.cjkpack.exportCharacterPack`.
+    """
+    def __init__(self, filePath):
+        """
+        :type filePath: str
+        :param filePath: path of the pack file
+        :raise ValueError: if the file is no pack file or of another version
+        """
+        self.filePath = filePath
+        f = open(filePath, 'rb')
+        try:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise ValueError("'%s' is no character pack" % filePath)
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+        magic, version, sectionCount, fingerprint \
+            = _HEADER.unpack_from(self._buf, 0)
+        if magic != _MAGIC:
+            raise ValueError("'%s' is no character pack" % filePath)
+        if version != PACK_VERSION:
+            raise ValueError("Character pack '%s' has version %d, expected %d"
+                % (filePath, version, PACK_VERSION))
+
+        self.fingerprint = fingerprint.rstrip('\x00') or None
+        """Fingerprint of the database the pack was exported from"""
+
+        self._sections = {}
+        offset = _HEADER.size
+        for _ in range(sectionCount):
+            tableName, keyCount, valueCount, columnCount, typeCodes \
+                = _SECTION_HEADER.unpack_from(self._buf, offset)
+            offset += _SECTION_HEADER.size
+
+            keys = _PackArray(self._buf, offset, keyCount)
+            offset += 4 * keyCount
+            offsets = _PackArray(self._buf, offset, keyCount + 1)
+            offset += 4 * (keyCount + 1)
+            columns = []
+            for typeCode in typeCodes[:columnCount]:
+                columns.append((_PackArray(self._buf, offset, valueCount),
+                    _DECODERS[typeCode]))
+                offset += 4 * valueCount
+
+            self._sections[tableName.rstrip('\x00')] = (keys, offsets, columns)
+
+    def hasTable(self, tableName):
+        """
+        Checks if the pack includes data of the given table.
+
+        :type tableName: str
+        :param tableName: name of the table
+        :rtype: bool
+        :return: ``True`` if the table's data is included
+        """
+        return tableName in self._sections
+
+    def getEntries(self, tableName, char):
+        """
+        Gets the values stored for the given character.
+
+        :type tableName: str
+        :param tableName: name of the table
+        :type char: str
+        :param char: Chinese character
+        :rtype: list of tuple
+        :return: values of the table's columns as given by
+            :data:`~cjklib.cjkpack.PACK_TABLES`, sorted
+        :raise KeyError: if the table is not included
+        """
+        keys, offsets, columns = self._sections[tableName]
+        try:
+            codepoint = util.toCodepoint(char)
+        except (ValueError, TypeError):
+            return []
+
+        idx = bisect.bisect_left(keys, codepoint)
+        if idx == len(keys) or keys[idx] != codepoint:
+            return []
+
+        return [tuple([decode(column[valueIdx]) for column, decode in columns])
+            for valueIdx in range(offsets[idx], offsets[idx + 1])]
+
+
+def main():
+    """
+    Main method, exports the character data of the configured database.
+    """
+    parser = OptionParser(usage="%prog [options] FILE",
+        description="Exports character data into a pack file for lookups"
+            " without SQL.")
+    parser.add_option('--database', dest='databaseUrl',
+        help='database url [default: configured database]')
+    opts, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error("output file needed")
+
+    from cjklib import dbconnector
+    exportCharacterPack(args[0], dbconnector.getDBConnector(opts.databaseUrl))
+
+if __name__ == "__main__":
+    main()
@@ -22,17 +22,26 @@ Simple read access to (multiple) SQL databases.
 __all__ = ["getDBConnector", "getDefaultConfiguration", "DatabaseConnector"]
 
 import os
+import sys
+import hashlib
 import logging
 import glob
 import operator
+import threading
+import weakref
 from itertools import imap
 
 from sqlalchemy import MetaData, Table, engine_from_config
 from sqlalchemy.sql import text
+from sqlalchemy.sql.expression import ClauseElement, Insert, Update, Delete
+from sqlalchemy.engine.base import Compiled
+from sqlalchemy.sql.util import find_tables
 from sqlalchemy.engine.url import make_url
+from sqlalchemy.interfaces import PoolListener
+from sqlalchemy.pool import QueuePool
 
 from cjklib.util import (locateProjectFile, getConfigSettings, getSearchPaths,
-    deprecated, LazyDict, OrderedDict)
+    deprecated, LazyDict, OrderedDict, LRUDict)
 
 _dbconnectInst = None
 # Cached instance of a DatabaseConnector used for connections with settings of
@@ -161,6 +170,28 @@ class DatabaseConnector(object):
         configuration. Further databases can be attached by passing a list
         of URLs or names for keyword ``'attach'``.
 
+        By default a single connection is shared. Pass a pool size for keyword
+        ``'poolSize'`` to use the connector from several threads: each thread
+        then checks out its own connection from a pool of the given size, see
+        :attr:`~cjklib.dbconnector.DatabaseConnector.connection`.
+
+        Databases that never change after build can be opened with keyword
+        ``'readOnly'``. For SQLite keywords ``'mmapSize'`` and ``'cacheSize'``
+        set memory-mapped I/O in bytes and the page cache size for the main
+        and all attached databases, so that several processes share pages
+        through the operating system.
+
+        Results of the ``select`` methods can be cached by giving the maximum
+        number of cached requests for keyword ``'queryCacheSize'``. Use this
+        for databases that don't change, or call
+        :meth:`~cjklib.dbconnector.DatabaseConnector.invalidateQueryCache`
+        after changing tables outside of
+        :meth:`~cjklib.dbconnector.DatabaseConnector.execute`.
+
+        Reading operators can store tables derived from the database as
+        snapshots in the directory given for keyword ``'snapshotPath'``, see
+        :meth:`~cjklib.dbconnector.DatabaseConnector.getDatabaseFingerprint`.
+
         .. seealso::
 
             documentation of sqlalchemy.create_engine()
@@ -194,11 +225,72 @@ class DatabaseConnector(object):
                 in ['1', 'yes', 'true', 'on'])
         self.registerUnicode = registerUnicode
 
-        self.engine = engine_from_config(configuration, prefix='sqlalchemy.')
+        readOnly = configuration.pop('readOnly', False)
+        if isinstance(readOnly, basestring):
+            readOnly = readOnly.lower() in ['1', 'yes', 'true', 'on']
+        self.readOnly = readOnly
+        """``True`` if databases are opened read-only"""
+        self.mmapSize = configuration.pop('mmapSize', None)
+        """Size in bytes of memory-mapped I/O for SQLite databases"""
+        if self.mmapSize is not None:
+            self.mmapSize = int(self.mmapSize)
+        self.cacheSize = configuration.pop('cacheSize', None)
+        """Page cache size for SQLite databases, negative values in KiB"""
+        if self.cacheSize is not None:
+            self.cacheSize = int(self.cacheSize)
+
+        queryCacheSize = configuration.pop('queryCacheSize', None)
+        if queryCacheSize and int(queryCacheSize) > 0:
+            self._queryCache = LRUDict(int(queryCacheSize))
+        else:
+            self._queryCache = None
+        self._queryCacheLock = threading.Lock()
+        self._queryCacheHits = 0
+        self._queryCacheMisses = 0
+        # names of tables used by compiled requests, to invalidate the cache
+        self._compiledTables = weakref.WeakKeyDictionary()
+
+        self.snapshotPath = configuration.pop('snapshotPath', None)
+        """Directory for snapshots of derived tables, ``None`` to disable"""
+        if self.snapshotPath:
+            self.snapshotPath = os.path.expanduser(self.snapshotPath)
+
+        poolSize = configuration.pop('poolSize', None)
+        self.pooled = bool(poolSize)
+        """``True`` if connections are checked out per thread from a pool"""
+        engineOptions = {}
+        if self.pooled:
+            engineOptions['pool_size'] = int(poolSize)
+            url = make_url(self.databaseUrl)
+            if url.drivername == 'sqlite':
+                if not url.database or url.database == ':memory:':
+                    raise ValueError("In-memory SQLite databases are private"
+                        " to one connection and can't be used with a pool."
+                        " Check your 'poolSize' settings!")
+                # SQLite's default pool closes connections of other threads
+                #   if more threads than its size exist, share instead
+                engineOptions['poolclass'] = QueuePool
+                engineOptions['connect_args'] = {'check_same_thread': False}
+
+        self.engine = engine_from_config(configuration, prefix='sqlalchemy.',
+            **engineOptions)
         """SQLAlchemy engine object"""
-        self.connection = self.engine.connect()
-        """SQLAlchemy database connection object"""
-        self.metadata = MetaData(bind=self.connection)
+
+        # attach databases and register functions on every new connection
+        self.attached = OrderedDict()
+        """Mapping of attached database URLs to internal schema names"""
+        self.compatibilityUnicodeSupport = False
+        self.engine.pool.add_listener(_ConnectionPreparer(self))
+
+        self._threadConnection = threading.local()
+        if self.pooled:
+            self._connection = None
+            # create tables on the calling thread's connection, so that they
+            #   take part in its transaction
+            self.metadata = MetaData(bind=_ThreadConnectionBind(self))
+        else:
+            self._connection = self.engine.connect()
+            self.metadata = MetaData(bind=self._connection)
         """SQLAlchemy metadata object"""
 
         # multi-database table access
@@ -213,17 +305,105 @@ class DatabaseConnector(object):
             self._mainSchema = self.engine.url.database
 
         # attach other databases
-        self.attached = OrderedDict()
-        """Mapping of attached database URLs to internal schema names"""
         attach = configuration.pop('attach', [])
         searchPaths = self.engine.name == 'sqlite'
         for url in self._findAttachableDatabases(attach, searchPaths):
             self.attachDatabase(url)
 
-        # register unicode functions
-        self.compatibilityUnicodeSupport = False
-        if self.registerUnicode:
-            self._registerUnicode()
+    @property
+    def connection(self):
+        """
+        SQLAlchemy database connection object.
+
+        In pooled mode every thread checks out its own connection on first
+        access, which is kept until
+        :meth:`~cjklib.dbconnector.DatabaseConnector.releaseConnection` is
+        called. The ``select`` methods use this connection if the thread holds
+        one, e.g. for an open transaction, and otherwise check out a
+        connection for the single request.
+        """
+        if not self.pooled:
+            return self._connection
+
+        connection = getattr(self._threadConnection, 'connection', None)
+        if connection is None or connection.closed:
+            connection = self.engine.connect()
+            self._threadConnection.connection = connection
+        else:
+            # catch up with databases attached since checkout
+            self._prepareConnection(connection.connection)
+        return connection
+
+    def releaseConnection(self):
+        """
+        Returns the current thread's connection to the pool. Only has an
+        effect in pooled mode.
+
+        .. versionadded:: 0.3.3
+        """
+        if self.pooled:
+            connection = getattr(self._threadConnection, 'connection', None)
+            if connection is not None:
+                self._threadConnection.connection = None
+                connection.close()
+
+    def _prepareConnection(self, dbapiConnection):
+        """
+        Attaches databases missing on the given DB-API connection, applies
+        connection settings and registers Unicode functions if requested.
+
+        :param dbapiConnection: pooled DB-API connection
+        """
+        if self.engine.name != 'sqlite':
+            return
+
+        info = dbapiConnection.info
+        if 'cjklib_attached' not in info:
+            info['cjklib_attached'] = set()
+            self._setPragmas(dbapiConnection, 'main')
+        attachedSchemas = info['cjklib_attached']
+        if len(attachedSchemas) < len(self.attached):
+            for databaseUrl, schema in self.attached.items():
+                if schema not in attachedSchemas:
+                    cursor = dbapiConnection.cursor()
+                    cursor.execute("ATTACH DATABASE ? AS ?",
+                        (make_url(databaseUrl).database, schema))
+                    cursor.close()
+                    attachedSchemas.add(schema)
+                    self._setPragmas(dbapiConnection, schema)
+
+        if self.registerUnicode and 'cjklib_unicode' not in info:
+            info['cjklib_unicode'] = True
+            self._registerUnicode(dbapiConnection)
+
+    def _setPragmas(self, dbapiConnection, schema):
+        """
+        Applies the read-only, memory-mapping and cache settings to the given
+        SQLite database.
+
+        :param dbapiConnection: pooled DB-API connection
+        :type schema: str
+        :param schema: schema name of main or attached database
+        """
+        identifier_preparer = self.engine.dialect.identifier_preparer
+        qschema = identifier_preparer.quote_identifier(schema)
+
+        pragmas = []
+        if self.readOnly and schema == 'main':
+            # affects all databases of the connection
+            pragmas.append("PRAGMA query_only = 1")
+        if self.mmapSize is not None:
+            pragmas.append("PRAGMA %s.mmap_size = %d"
+                % (qschema, self.mmapSize))
+        if self.cacheSize is not None:
+            pragmas.append("PRAGMA %s.cache_size = %d"
+                % (qschema, self.cacheSize))
+
+        if pragmas:
+            cursor = dbapiConnection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
 
     def _findAttachableDatabases(self, attachList, searchPaths=False):
         """
@@ -271,16 +451,21 @@ class DatabaseConnector(object):
 
         return attachable
 
-    def _registerUnicode(self):
+    def _registerUnicode(self, dbapiConnection):
         """
         Register functions and collations to bring Unicode support to certain
         engines.
+
+        :param dbapiConnection: pooled DB-API connection
         """
         if self.engine.name == 'sqlite':
-            uUmlaut = self.selectScalar(text(u"SELECT lower('Ü');"))
+            cursor = dbapiConnection.cursor()
+            cursor.execute(u"SELECT lower('Ü');")
+            uUmlaut, = cursor.fetchone()
+            cursor.close()
             if uUmlaut != u'ü':
                 # register own Unicode aware functions
-                con = self.connection.connection
+                con = dbapiConnection
                 con.create_function("lower", 1, lambda s: s and s.lower())
                 con.create_collation("NOCASE",
                     lambda a, b: cmp(a.decode('utf8').lower(),
@@ -357,12 +542,15 @@ class DatabaseConnector(object):
             if dbName.endswith('.db'): dbName = dbName[:-3]
             schema = '%s_%d' % (dbName, len(self.attached))
 
-            self.execute(text("""ATTACH DATABASE :database AS :schema"""),
-                database=databaseFile, schema=schema)
+            self.attached[databaseUrl] = schema
+            try:
+                self._prepareConnection(self.connection.connection)
+            except:
+                del self.attached[databaseUrl]
+                raise
         else:
             schema = url.database
-
-        self.attached[databaseUrl] = schema
+            self.attached[databaseUrl] = schema
 
         return schema
 
@@ -463,9 +651,214 @@ class DatabaseConnector(object):
 
     def execute(self, *options, **keywords):
         """
-        Executes a request on the given database.
+        Executes a request on the given database, using the current thread's
+        connection in pooled mode.
         """
-        return self.connection.execute(*options, **keywords)
+        result = self.connection.execute(*options, **keywords)
+        if (self._queryCache is not None and options
+            and isinstance(options[0], (Insert, Update, Delete))):
+            self.invalidateQueryCache([options[0].table.name])
+        return result
+
+    def compile(self, request):
+        """
+        Compiles a request for this database. A compiled request can be
+        executed repeatedly by the select methods with different values for
+        its bind parameters, avoiding to build and compile the request for
+        every call.
+
+        .. versionadded:: 0.3.3
+
+        :param request: SQL request, using ``bindparam()`` for values that
+            change between calls
+        :return: compiled request
+        """
+        return request.compile(bind=self.engine)
+
+    def _execute(self, request, params):
+        """
+        Executes a select request with optional bind parameter values.
+
+        In pooled mode a thread not holding a connection checks out one for
+        this request only. It is returned to the pool once the result is
+        closed or fully fetched.
+        """
+        if self.pooled:
+            connection = getattr(self._threadConnection, 'connection', None)
+            if connection is None or connection.closed:
+                connection = self.engine
+            else:
+                # catch up with databases attached since checkout
+                self._prepareConnection(connection.connection)
+        else:
+            connection = self._connection
+
+        if params:
+            return connection.execute(request, params)
+        return connection.execute(request)
+
+    def _fetch(self, request, fetch, params):
+        """
+        Executes a select request and fetches its result, closing the result
+        afterwards.
+        """
+        result = self._execute(request, params)
+        try:
+            return fetch(result)
+        finally:
+            result.close()
+
+    def _select(self, request, fetch, params=None):
+        """
+        Executes a select query and fetches its result. Results are served from
+        the query cache if enabled.
+
+        :param request: SQL request
+        :param fetch: function fetching the result from the result proxy
+        :type params: dict
+        :param params: values of bind parameters
+        """
+        if self._queryCache is None:
+            return self._fetch(request, fetch, params)
+
+        if isinstance(request, Compiled):
+            # compiled requests are reused, so only look up tables once
+            if request not in self._compiledTables:
+                self._compiledTables[request] = set([table.name for table
+                    in find_tables(request.statement, check_columns=True)
+                    if isinstance(table, Table)]) or None
+            tables = self._compiledTables[request]
+            key = (unicode(request),
+                tuple(sorted(request.construct_params(params).items())))
+        elif isinstance(request, ClauseElement):
+            tables = set([table.name for table
+                in find_tables(request, check_columns=True)
+                if isinstance(table, Table)])
+            if not tables:
+                # e.g. text requests, tables unknown
+                tables = None
+            # compile once for both key and execution
+            request = request.compile(bind=self.engine)
+            key = (unicode(request),
+                tuple(sorted(request.construct_params(params).items())))
+        else:
+            key = (request, ())
+            tables = None
+        # results of the same request differ by the kind of fetch
+        key = (fetch.__name__, ) + key
+
+        try:
+            hash(key)
+        except TypeError:
+            return self._fetch(request, fetch, params)
+
+        self._queryCacheLock.acquire()
+        try:
+            entry = self._queryCache.get(key)
+            if entry is None:
+                self._queryCacheMisses += 1
+            else:
+                self._queryCacheHits += 1
+        finally:
+            self._queryCacheLock.release()
+
+        if entry is None:
+            value = self._fetch(request, fetch, params)
+            entry = (value, tables, _getResultSize(value))
+            self._queryCacheLock.acquire()
+            try:
+                self._queryCache[key] = entry
+            finally:
+                self._queryCacheLock.release()
+
+        value = entry[0]
+        if isinstance(value, list):
+            # don't hand out the cached object
+            return value[:]
+        return value
+
+    def invalidateQueryCache(self, tableNames=None):
+        """
+        Removes cached results of requests on the given tables. Results of
+        requests with unknown tables are always removed.
+
+        .. versionadded:: 0.3.3
+
+        :type tableNames: list of str
+        :param tableNames: names of changed tables, ``None`` to clear the
+            whole cache
+        """
+        if self._queryCache is None:
+            return
+
+        self._queryCacheLock.acquire()
+        try:
+            if tableNames is None:
+                self._queryCache.clear()
+            else:
+                tableNames = set(tableNames)
+                for key, (_, tables, _) in self._queryCache.items():
+                    if tables is None or tables & tableNames:
+                        del self._queryCache[key]
+        finally:
+            self._queryCacheLock.release()
+
+    def getQueryCacheStatistics(self):
+        """
+        Returns statistics of the query cache: number of ``'hits'`` and
+        ``'misses'``, the number of cached ``'entries'`` and the estimated
+        size of cached results in ``'bytes'``.
+
+        .. versionadded:: 0.3.3
+
+        :rtype: dict
+        :return: cache statistics, ``None`` if no cache is used
+        """
+        if self._queryCache is None:
+            return None
+
+        self._queryCacheLock.acquire()
+        try:
+            return {'hits': self._queryCacheHits,
+                'misses': self._queryCacheMisses,
+                'entries': len(self._queryCache),
+                'bytes': sum([size for _, (_, _, size)
+                    in self._queryCache.items()])}
+        finally:
+            self._queryCacheLock.release()
+
+    def getDatabaseFingerprint(self):
+        """
+        Returns a fingerprint of the main and all attached databases. The
+        fingerprint changes once a database file is rebuilt and can thus key
+        data derived from the database's content.
+
+        Only SQLite database files are supported. The path, size and
+        modification time of each file are hashed instead of its content so
+        that the fingerprint is cheap to compute.
+
+        .. versionadded:: 0.3.3
+
+        :rtype: str
+        :return: hex digest, ``None`` if a database is not a file
+        """
+        if self.engine.name != 'sqlite':
+            return None
+
+        fingerprint = hashlib.sha1()
+        for databaseUrl in [self.databaseUrl] + self.attached.keys():
+            filePath = make_url(databaseUrl).database
+            if not filePath or filePath == ':memory:':
+                return None
+            filePath = os.path.abspath(filePath)
+            try:
+                stat = os.stat(filePath)
+            except OSError:
+                return None
+            fingerprint.update(repr((filePath, stat.st_size, stat.st_mtime,
+                stat.st_ino)))
+
+        return fingerprint.hexdigest()
 
     def _decode(self, data):
         """
@@ -488,73 +881,144 @@ class DatabaseConnector(object):
             else:
                 return data
 
-    def selectScalar(self, request):
+    def selectScalar(self, request, params=None):
         """
         Executes a select query and returns a single variable.
 
         :param request: SQL request
+        :type params: dict
+        :param params: values of bind parameters, e.g. for a request compiled
+            with :meth:`~cjklib.dbconnector.DatabaseConnector.compile`
         :return: a scalar
         """
-        result = self.execute(request)
-        assert result.rowcount <= 1
-        firstRow = result.fetchone()
-        assert not firstRow or len(firstRow) == 1
-        if firstRow:
-            return self._decode(firstRow[0])
+        def fetchScalar(result):
+            assert result.rowcount <= 1
+            firstRow = result.fetchone()
+            assert not firstRow or len(firstRow) == 1
+            if firstRow:
+                return self._decode(firstRow[0])
+
+        return self._select(request, fetchScalar, params)
 
-    def selectScalars(self, request):
+    def selectScalars(self, request, params=None):
         """
         Executes a select query and returns a list of scalars.
 
         :param request: SQL request
+        :type params: dict
+        :param params: values of bind parameters, e.g. for a request compiled
+            with :meth:`~cjklib.dbconnector.DatabaseConnector.compile`
         :return: a list of scalars
         """
-        result = self.execute(request)
-        return [self._decode(row[0]) for row in result.fetchall()]
+        def fetchScalars(result):
+            return [self._decode(row[0]) for row in result.fetchall()]
 
-    def iterScalars(self, request):
+        return self._select(request, fetchScalars, params)
+
+    def iterScalars(self, request, params=None):
         """
         Executes a select query and returns an iterator of scalars.
 
         .. versionadded:: 0.3
 
         :param request: SQL request
+        :type params: dict
+        :param params: values of bind parameters, e.g. for a request compiled
+            with :meth:`~cjklib.dbconnector.DatabaseConnector.compile`
         :return: an iterator of scalars
         """
-        result = self.execute(request)
+        result = self._execute(request, params)
         return imap(self._decode, imap(operator.itemgetter(0), result))
 
-    def selectRow(self, request):
+    def selectRow(self, request, params=None):
         """
         Executes a select query and returns a single table row.
 
         :param request: SQL request
+        :type params: dict
+        :param params: values of bind parameters, e.g. for a request compiled
+            with :meth:`~cjklib.dbconnector.DatabaseConnector.compile`
         :return: a list of scalars
         """
-        result = self.execute(request)
-        assert result.rowcount <= 1
-        firstRow = result.fetchone()
-        if firstRow:
-            return self._decode(tuple(firstRow))
+        def fetchRow(result):
+            assert result.rowcount <= 1
+            firstRow = result.fetchone()
+            if firstRow:
+                return self._decode(tuple(firstRow))
+
+        return self._select(request, fetchRow, params)
 
-    def selectRows(self, request):
+    def selectRows(self, request, params=None):
         """
         Executes a select query and returns a list of table rows.
 
         :param request: SQL request
+        :type params: dict
+        :param params: values of bind parameters, e.g. for a request compiled
+            with :meth:`~cjklib.dbconnector.DatabaseConnector.compile`
         :return: a list of tuples
         """
-        result = self.execute(request)
-        return [self._decode(tuple(row)) for row in result.fetchall()]
+        def fetchRows(result):
+            return [self._decode(tuple(row)) for row in result.fetchall()]
+
+        return self._select(request, fetchRows, params)
 
-    def iterRows(self, request):
+    def iterRows(self, request, params=None):
         """
         Executes a select query and returns an iterator of table rows.
 
         .. versionadded:: 0.3
 
         :param request: SQL request
+        :type params: dict
+        :param params: values of bind parameters, e.g. for a request compiled
+            with :meth:`~cjklib.dbconnector.DatabaseConnector.compile`
         :return: an iterator of tuples
         """
-        result = self.execute(request)
+        result = self._execute(request, params)
         return imap(self._decode, result)
+
+
+def _getResultSize(value):
+    """
+    Estimates the memory size of a query result in bytes.
+
+    :param value: scalar, tuple or list of scalars or tuples
+    :rtype: int
+    :return: size in bytes, ``0`` if not supported by the Python version
+    """
+    if not hasattr(sys, 'getsizeof'):
+        return 0
+
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for entry in value:
+            size += sys.getsizeof(entry)
+            if isinstance(entry, tuple):
+                size += sum([sys.getsizeof(cell) for cell in entry])
+    return size
+
+
+class _ConnectionPreparer(PoolListener):
+    """
+    Prepares new connections of a
+    :class:`~cjklib.dbconnector.DatabaseConnector`'s pool.
+    """
+    def __init__(self, db):
+        self.db = db
+
+    def checkout(self, dbapi_con, con_record, con_proxy):
+        self.db._prepareConnection(con_proxy)
+
+
+class _ThreadConnectionBind(object):
+    """
+    Bind for SQLAlchemy metadata of a pooled
+    :class:`~cjklib.dbconnector.DatabaseConnector` that delegates to the
+    calling thread's connection.
+    """
+    def __init__(self, db):
+        self.db = db
+
+    def __getattr__(self, name):
+        return getattr(self.db.connection, name)
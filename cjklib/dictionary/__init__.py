@@ -40,15 +40,18 @@ __all__ = [
     ]
 
 import types
-from itertools import imap, ifilter
+import zlib
+from itertools import imap
 
-from sqlalchemy import select, Table
-from sqlalchemy.sql import or_
+from sqlalchemy import select, union, Table, Integer
+from sqlalchemy.sql import or_, operators, bindparam
+from sqlalchemy.sql.expression import Select
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.exc import NoSuchTableError
 
 from cjklib import dbconnector
 from cjklib import exception
-from cjklib.util import cachedproperty
+from cjklib.util import cachedproperty, LRUDict
 
 from cjklib.dictionary import entry as entryfactory
 from cjklib.dictionary import format as formatstrategy
@@ -123,6 +126,87 @@ def getDictionary(dictionaryName, **options):
     dictCls = getDictionaryClass(dictionaryName)
     return dictCls(**options)
 
+def _getClauseKey(clause, binds):
+    """
+    Gets a key describing the structure of the given SQL clause. Clauses with
+    the same key compile to the same SQL and only differ in the values of
+    their bind parameters, which are appended to ``binds`` in a fixed order.
+
+    Only the clauses built by the search strategies are supported.
+
+    :param clause: SQLAlchemy clause, column name or list thereof
+    :type binds: list
+    :param binds: list bind parameters are added to
+    :rtype: tuple
+    :return: key, ``None`` if the structure of the clause is not supported
+    """
+    def getKeys(clauses):
+        keys = []
+        for subClause in clauses:
+            key = _getClauseKey(subClause, binds)
+            if key is None:
+                return None
+            keys.append(key)
+        return tuple(keys)
+
+    if clause is None:
+        return ('none', )
+    elif isinstance(clause, basestring):
+        return ('name', clause)
+    elif isinstance(clause, (list, tuple)):
+        keys = getKeys(clause)
+        return keys is not None and ('list', keys) or None
+
+    visitName = getattr(clause, '__visit_name__', None)
+    if visitName == 'bindparam':
+        binds.append(clause)
+        return (visitName, clause.type.__class__)
+    elif visitName == 'column':
+        table = clause.table
+        return (visitName, getattr(table, 'schema', None),
+            getattr(table, 'name', None), clause.name, clause.is_literal)
+    elif visitName == 'textclause':
+        if clause.bindparams:
+            return None
+        return (visitName, clause.text)
+    elif visitName in ('null', 'true', 'false'):
+        return (visitName, )
+
+    if visitName == 'binary':
+        keys = getKeys([clause.left, clause.right])
+        extra = (clause.operator, tuple(sorted(clause.modifiers.items())))
+    elif visitName == 'clauselist':
+        keys = getKeys(clause.clauses)
+        extra = (clause.operator, clause.group, clause.group_contents)
+    elif visitName == 'grouping':
+        keys = getKeys([clause.element])
+        extra = ()
+    elif visitName == 'unary':
+        keys = getKeys([clause.element])
+        extra = (clause.operator, clause.modifier)
+    elif visitName == 'function':
+        keys = getKeys([clause.clause_expr])
+        extra = (clause.name, tuple(clause.packagenames))
+    else:
+        return None
+
+    if keys is None:
+        return None
+    return (visitName, extra, keys)
+
+class _BoundLimitSelect(Select):
+    """
+    Select with ``LIMIT`` and ``OFFSET`` given as bind parameters
+    ``'cjklib_limit'`` and ``'cjklib_offset'``, so that a compiled request
+    can be reused for every page of results.
+    """
+
+@compiles(_BoundLimitSelect)
+def _compileBoundLimitSelect(element, compiler, **kw):
+    return compiler.visit_select(element, **kw) + " LIMIT %s OFFSET %s" % (
+        compiler.process(bindparam('cjklib_limit', type_=Integer())),
+        compiler.process(bindparam('cjklib_offset', type_=Integer())))
+
 #}
 #{ Dictionary classes
 
@@ -266,6 +350,8 @@ class EDICTStyleDictionary(BaseDictionary):
                 = searchstrategy.SimpleWildcardTranslation()
         super(EDICTStyleDictionary, self).__init__(**options)
 
+        self._searchRequests = LRUDict(self.SEARCH_REQUEST_CACHE_SIZE)
+
         if not self.available(self.db):
             raise ValueError("Table '%s' for dictionary does not exist"
                 % self.DICTIONARY_TABLE)
@@ -288,11 +374,167 @@ class EDICTStyleDictionary(BaseDictionary):
         except NoSuchTableError:
             pass
 
-    def _search(self, whereClause, filters, limit, orderBy):
+    SEARCH_CHUNK_SIZE = 50
+    """
+    Minimum number of rows fetched from the database at once when a limited
+    search needs to filter results.
+    """
+
+    def _getSearchQuery(self, whereClauses, orderBy, stableOrder=False,
+        boundLimit=False):
         """
-        Does the actual search for a given where clause and then narrows the
-        result set given a list of filters. The results are then formatted
-        given the instance's rules.
+        Builds the query for a given list of alternative where clauses.
+
+        SQLite cannot use a full text search ``MATCH`` inside an ``OR``
+        expression. If one of the clauses is a full text search, a ``UNION``
+        of the single selects is done instead.
+
+        If ``stableOrder`` is ``True`` all remaining columns are added to the
+        ``ORDER BY`` clause, so that subsequent queries with an ``OFFSET``
+        continue exactly where the former one stopped.
+
+        If ``boundLimit`` is ``True`` the query takes its limit and offset from
+        bind parameters ``'cjklib_limit'`` and ``'cjklib_offset'``.
+        """
+        if boundLimit:
+            selectClass = _BoundLimitSelect
+        else:
+            selectClass = select
+        dictionaryTable = self.db.tables[self.DICTIONARY_TABLE]
+
+        columns = [dictionaryTable.c[col] for col in self.COLUMNS]
+        fullTextClauses = [clause for clause in (whereClauses or [])
+            if getattr(clause, 'operator', None) is operators.match_op]
+        if fullTextClauses and len(whereClauses) > 1:
+            # select from union to allow ordering by column
+            unionTable = union(*[select(columns, clause)
+                for clause in whereClauses]).alias()
+            resultColumns = [unionTable.c[col] for col in self.COLUMNS]
+            query = selectClass(resultColumns)
+        else:
+            unionTable = None
+            resultColumns = columns
+            if whereClauses:
+                query = selectClass(columns, or_(*whereClauses),
+                    distinct=True)
+            else:
+                query = selectClass(columns, distinct=True)
+
+        orderByCols = []
+        if orderBy is not None:
+            if type(orderBy) != type([]):
+                orderBy = [orderBy]
+
+            for col in orderBy:
+                if isinstance(col, basestring):
+                    col = dictionaryTable.c[col]
+                if unionTable is not None:
+                    col = unionTable.corresponding_column(col) or col
+                orderByCols.append(col)
+
+        if stableOrder:
+            for col in resultColumns:
+                if col not in orderByCols:
+                    orderByCols.append(col)
+
+        return query.order_by(*orderByCols)
+
+    SEARCH_REQUEST_CACHE_SIZE = 100
+    """Maximum number of compiled search requests kept per instance."""
+
+    def _getSearchRequest(self, whereClauses, orderBy, stableOrder, limit,
+        offset):
+        """
+        Gets the compiled search request for the given where clauses and the
+        values of its bind parameters.
+
+        Requests are compiled once for every structure of where clauses, later
+        searches with the same structure only bind their values. A given
+        limit and offset are bound, too, so that all pages of a search share
+        one request.
+
+        :rtype: tuple
+        :return: request and dictionary of bind parameter values, ``None`` if
+            the request already holds the values
+        """
+        binds = []
+        key = _getClauseKey([whereClauses, orderBy], binds)
+        if key is None:
+            query = self._getSearchQuery(whereClauses, orderBy,
+                stableOrder=stableOrder).limit(limit).offset(offset or None)
+            return query, None
+
+        # engines differ in how to give an offset without limit, so only
+        #   bind both if limited
+        boundLimit = limit is not None
+        if boundLimit:
+            key = (key, stableOrder, True, None)
+            params = {'cjklib_limit': limit, 'cjklib_offset': offset or 0}
+        else:
+            key = (key, stableOrder, False, offset or None)
+            params = {}
+
+        if key in self._searchRequests:
+            request, bindNames = self._searchRequests[key]
+            params.update(zip(bindNames, [bind.value for bind in binds]))
+            return request, params
+
+        query = self._getSearchQuery(whereClauses, orderBy,
+            stableOrder=stableOrder, boundLimit=boundLimit)
+        if not boundLimit:
+            query = query.offset(offset or None)
+
+        request = self.db.compile(query)
+        bindNames = [request.bind_names.get(bind) for bind in binds]
+        if None not in bindNames:
+            self._searchRequests[key] = (request, bindNames)
+        return request, params or None
+
+    def _iterFilteredRows(self, whereClauses, orderBy, filterFunc, offset,
+        limit):
+        """
+        Iterates over the rows of the search query that pass the filter
+        function, starting from the given row offset.
+
+        For a given ``limit`` rows are fetched in chunks of growing size, so
+        that a search yields up to ``limit`` results even if the filter
+        function drops rows returned by the database.
+
+        :rtype: iterator of tuple
+        :return: tuples of the offset following the row and the row itself
+        """
+        if not limit:
+            request, params = self._getSearchRequest(whereClauses, orderBy,
+                False, None, offset)
+            for row in self.db.iterRows(request, params):
+                offset += 1
+                if not filterFunc or filterFunc(row):
+                    yield offset, row
+            return
+
+        chunkSize = max(limit, self.SEARCH_CHUNK_SIZE)
+        while True:
+            request, params = self._getSearchRequest(whereClauses, orderBy,
+                True, chunkSize, offset)
+            rows = self.db.selectRows(request, params)
+            for row in rows:
+                offset += 1
+                if not filterFunc or filterFunc(row):
+                    yield offset, row
+
+            if len(rows) < chunkSize:
+                return
+            chunkSize = chunkSize * 2
+
+    def _searchPage(self, whereClauses, filters, limit, orderBy, offset=0):
+        """
+        Does the actual search for a given list of alternative where clauses
+        and then narrows the result set given a list of filters. The results
+        are then formatted given the instance's rules.
+
+        :rtype: tuple
+        :return: list of entries and the row offset to continue the search
+            from, ``None`` if no more entries exist
         """
         def _getFilterFunction(filterList):
             """Creates a function for filtering search results."""
@@ -309,28 +551,34 @@ class EDICTStyleDictionary(BaseDictionary):
 
             return anyFunc
 
-        dictionaryTable = self.db.tables[self.DICTIONARY_TABLE]
-
-        orderByCols = []
-        if orderBy is not None:
-            if type(orderBy) != type([]):
-                orderBy = [orderBy]
-
-            for col in orderBy:
-                if isinstance(col, basestring):
-                    orderByCols.append(dictionaryTable.c[col])
-                else:
-                    orderByCols.append(col)
-
-        # lookup in db
-        results = self.db.iterRows(
-            select([dictionaryTable.c[col] for col in self.COLUMNS],
-                whereClause, distinct=True).order_by(*orderByCols).limit(limit))
-
         # filter
+        filterFunc = None
         if filters:
-            results = ifilter(_getFilterFunction(filters), results)
-
+            filterFunc = _getFilterFunction(filters)
+
+        # lookup in db, looking ahead one entry to know if more entries exist
+        results = []
+        nextOffset = None
+        lastOffset = offset
+        if limit is not None:
+            fetchLimit = limit + 1
+        else:
+            fetchLimit = None
+        for rowOffset, row in self._iterFilteredRows(whereClauses, orderBy,
+            filterFunc, offset, fetchLimit):
+            if limit is not None and len(results) >= limit:
+                # continue after the last entry returned
+                nextOffset = lastOffset
+                break
+            results.append(row)
+            lastOffset = rowOffset
+
+        return self._formatResults(results), nextOffset
+
+    def _formatResults(self, results):
+        """
+        Formats the given database rows following the instance's rules.
+        """
         # format readings and translations
         if self.columnFormatStrategies:
             results = imap(list, results)
@@ -339,10 +587,135 @@ class EDICTStyleDictionary(BaseDictionary):
             results = imap(tuple, results)
 
         # format results
-        entries = self.entryFactory.getEntries(results)
+        return self.entryFactory.getEntries(results)
 
+    def _search(self, whereClauses, filters, limit, orderBy):
+        """
+        Does the actual search for a given list of alternative where clauses
+        and then narrows the result set given a list of filters. The results
+        are then formatted given the instance's rules.
+        """
+        entries, _ = self._searchPage(whereClauses, filters, limit, orderBy)
         return entries
 
+    ANNOTATION_CHUNK_SIZE = 500
+    """Maximum number of headwords looked up in one query when annotating."""
+
+    def _getHeadwordColumns(self):
+        """Returns the names of the columns holding headwords."""
+        return ['Headword']
+
+    @cachedproperty
+    def _headwordIndex(self):
+        """
+        In-memory index of all headwords for scanning text. A trie is
+        flattened to a set of headwords, a set of all headword prefixes and the
+        maximum headword length.
+        """
+        dictionaryTable = self.db.tables[self.DICTIONARY_TABLE]
+
+        headwords = set()
+        for column in self._getHeadwordColumns():
+            headwords.update(self.db.selectScalars(
+                select([dictionaryTable.c[column]], distinct=True)))
+        headwords.discard(None)
+        headwords.discard('')
+
+        prefixes = set()
+        maxLength = 0
+        for headword in headwords:
+            maxLength = max(maxLength, len(headword))
+            for i in range(1, len(headword)):
+                prefixes.add(headword[:i])
+
+        return headwords, prefixes, maxLength
+
+    def getHeadwordSpans(self, text, allMatches=False):
+        """
+        Segments the given text into headwords of the dictionary. The text is
+        scanned once using an in-memory index of all headwords which is
+        loaded on first use.
+
+        By default the longest headword starting at a position is chosen and
+        scanning continues after it. Characters not covered by any headword
+        are skipped.
+
+        :type text: str
+        :param text: running text
+        :type allMatches: bool
+        :param allMatches: if ``True`` all headwords found in the text are
+            returned, including overlapping ones
+        :rtype: list of tuple
+        :return: list of start and end offsets of headwords in the text
+        """
+        headwords, prefixes, maxLength = self._headwordIndex
+
+        spans = []
+        start = 0
+        while start < len(text):
+            matchEnds = []
+            for end in range(start + 1,
+                min(len(text), start + maxLength) + 1):
+                substring = text[start:end]
+                if substring in headwords:
+                    matchEnds.append(end)
+                if substring not in prefixes:
+                    break
+
+            if allMatches:
+                spans.extend((start, end) for end in matchEnds)
+                start += 1
+            elif matchEnds:
+                spans.append((start, matchEnds[-1]))
+                start = matchEnds[-1]
+            else:
+                start += 1
+
+        return spans
+
+    def annotate(self, text, allMatches=False):
+        """
+        Annotates the given text with dictionary entries. The text is
+        segmented by
+        :meth:`~cjklib.dictionary.EDICTStyleDictionary.getHeadwordSpans` and
+        entries for all found headwords are fetched in batches afterwards.
+
+        :type text: str
+        :param text: running text
+        :type allMatches: bool
+        :param allMatches: if ``True`` all headwords found in the text are
+            returned, including overlapping ones
+        :rtype: list of tuple
+        :return: list of start and end offsets of headwords in the text
+            together with a list of their entries
+        """
+        spans = self.getHeadwordSpans(text, allMatches=allMatches)
+
+        dictionaryTable = self.db.tables[self.DICTIONARY_TABLE]
+        columns = [dictionaryTable.c[col] for col in self.COLUMNS]
+        headwordColumns = self._getHeadwordColumns()
+        headwordColumnsIdx = [self.COLUMNS.index(column)
+            for column in headwordColumns]
+
+        # fetch entries of all found headwords
+        headwords = list(set(text[start:end] for start, end in spans))
+        headwordRows = dict((headword, []) for headword in headwords)
+        for i in range(0, len(headwords), self.ANNOTATION_CHUNK_SIZE):
+            chunk = headwords[i:i + self.ANNOTATION_CHUNK_SIZE]
+            rows = self.db.selectRows(select(columns,
+                or_(*[dictionaryTable.c[column].in_(chunk)
+                    for column in headwordColumns]), distinct=True))
+            for row in rows:
+                for headword in set(row[idx] for idx in headwordColumnsIdx):
+                    if headword in headwordRows:
+                        headwordRows[headword].append(row)
+
+        headwordEntries = dict((headword, list(self._formatResults(rows)))
+            for headword, rows in headwordRows.items())
+
+        return [(start, end, headwordEntries[text[start:end]][:])
+            for start, end in spans]
+
     def getAll(self, limit=None, orderBy=None):
         """
         Get all dictionary entries.
@@ -375,14 +748,10 @@ class EDICTStyleDictionary(BaseDictionary):
         :type orderBy: list
         :param orderBy: list of column names or SQLAlchemy column objects giving
             the order of returned entries
-
-        .. todo::
-            * bug: Specifying a ``limit`` might yield less results than
-              possible.
         """
         clauses, filters = self._getHeadwordSearch(headwordStr)
 
-        return self._search(or_(*clauses), filters, limit, orderBy)
+        return self._search(clauses, filters, limit, orderBy)
 
     def _getReadingSearch(self, readingStr, **options):
         dictionaryTable = self.db.tables[self.DICTIONARY_TABLE]
@@ -426,14 +795,10 @@ class EDICTStyleDictionary(BaseDictionary):
             the order of returned entries
         :raise ConversionError: if search string cannot be converted to the
             dictionary's reading.
-
-        .. todo::
-            * bug: Specifying a ``limit`` might yield less results than
-              possible.
         """
         clauses, filters = self._getReadingSearch(readingStr, **options)
 
-        return self._search(or_(*clauses), filters, limit, orderBy)
+        return self._search(clauses, filters, limit, orderBy)
 
     def _getTranslationSearch(self, translationStr, **options):
         dictionaryTable = self.db.tables[self.DICTIONARY_TABLE]
@@ -456,14 +821,10 @@ class EDICTStyleDictionary(BaseDictionary):
         :type orderBy: list
         :param orderBy: list of column names or SQLAlchemy column objects giving
             the order of returned entries
-
-        .. todo::
-            * bug: Specifying a ``limit`` might yield less results than
-              possible.
         """
         clauses, filters = self._getTranslationSearch(translationStr)
 
-        return self._search(or_(*clauses), filters, limit, orderBy)
+        return self._search(clauses, filters, limit, orderBy)
 
     def getFor(self, searchStr, limit=None, orderBy=None, **options):
         """
@@ -475,23 +836,85 @@ class EDICTStyleDictionary(BaseDictionary):
         :type orderBy: list
         :param orderBy: list of column names or SQLAlchemy column objects giving
             the order of returned entries
-
-        .. todo::
-            * bug: Specifying a ``limit`` might yield less results than
-              possible.
         """
+        clauses, filters = self._getMixedSearch(searchStr, **options)
+
+        return self._search(clauses, filters, limit, orderBy)
+
+    def _getMixedSearch(self, searchStr, **options):
         clauseList = []
         filterList = []
         for searchFunc in (self._getHeadwordSearch, self._getReadingSearch,
             self._getTranslationSearch):
             try:
-                clauses, filters =  searchFunc(searchStr, **options)
+                clauses, filters = searchFunc(searchStr, **options)
             except exception.ConversionError:
-                pass
+                continue
             clauseList.extend(clauses)
             filterList.extend(filters)
 
-        return self._search(or_(*clauseList), filterList, limit, orderBy)
+        return clauseList, filterList
+
+    def getPage(self, searchStr, limit, searchBy=None, continuation=None,
+        orderBy=None, **options):
+        """
+        Get a page of dictionary entries matching the given string. The
+        returned continuation token can be passed to a subsequent call with
+        the same arguments to get the next page of entries.
+
+        :type searchStr: str
+        :param searchStr: search string
+        :type limit: int
+        :param limit: number of entries per page
+        :type searchBy: str
+        :param searchBy: ``'headword'``, ``'reading'`` or ``'translation'``
+            to search the respective column, ``None`` to search all as
+            :meth:`~cjklib.dictionary.EDICTStyleDictionary.getFor` does
+        :type continuation: str
+        :param continuation: continuation token returned for the former page,
+            ``None`` for the first page
+        :type orderBy: list
+        :param orderBy: list of column names or SQLAlchemy column objects giving
+            the order of returned entries
+        :rtype: tuple
+        :return: list of entries and continuation token for the next page,
+            ``None`` if no more entries exist
+        :raise ValueError: if the continuation token is invalid for the given
+            search
+        """
+        searchFuncs = {None: self._getMixedSearch,
+            'headword': self._getHeadwordSearch,
+            'reading': self._getReadingSearch,
+            'translation': self._getTranslationSearch}
+        if searchBy not in searchFuncs:
+            raise ValueError("Invalid value '%s' for searchBy" % searchBy)
+        if not limit or limit < 1:
+            raise ValueError("Invalid page size '%s'" % limit)
+
+        # tie token to the search, so tokens from other searches are rejected
+        checksum = '%08x' % (zlib.crc32(repr((self.PROVIDES, searchStr,
+            searchBy, orderBy, sorted(options.items())))) & 0xffffffff)
+        if continuation is None:
+            offset = 0
+        else:
+            try:
+                offset, tokenChecksum = continuation.split(':')
+                offset = int(offset, 16)
+            except (AttributeError, ValueError):
+                raise ValueError("Invalid continuation token '%s'"
+                    % continuation)
+            if tokenChecksum != checksum or offset < 0:
+                raise ValueError("Invalid continuation token '%s'"
+                    % continuation)
+
+        clauses, filters = searchFuncs[searchBy](searchStr, **options)
+        entries, nextOffset = self._searchPage(clauses, filters, limit,
+            orderBy, offset)
+
+        if nextOffset is None:
+            return list(entries), None
+        else:
+            return list(entries), '%x:%s' % (nextOffset, checksum)
 
 
 class EDICT(EDICTStyleDictionary):
@@ -655,6 +1078,14 @@ class CEDICT(EDICTStyleEnhancedReadingDictionary):
 
         return clauses, filters
 
+    def _getHeadwordColumns(self):
+        columns = []
+        if self.headword != 't':
+            columns.append('HeadwordSimplified')
+        if self.headword != 's':
+            columns.append('HeadwordTraditional')
+        return columns
+
     def _getHeadwordSearch(self, headwordStr, **options):
         dictionaryTable = self.db.tables[self.DICTIONARY_TABLE]
 
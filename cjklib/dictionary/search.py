@@ -18,8 +18,8 @@
 """
 Search strategies for dictionaries.
 
-.. todo::
-    * Impl: Allow simple FTS3 searching as build support is already provided.
+Translation search strategies make use of SQLite's full text search (FTS3) if
+the dictionary was built with option ``enableFTS3``.
 """
 
 __all__ = [
@@ -410,12 +410,103 @@ class Wildcard(Exact, _WildcardBase):
 #{ Translation search strategies
 
 class SingleEntryTranslation(Exact):
-    """Basic translation search strategy."""
+    """
+    Basic translation search strategy.
+
+    If the dictionary provides a full text search table (see
+    :meth:`~cjklib.build.builder.EDICTFormatBuilder.buildFTS3Tables`) the
+    search is done with a ``MATCH`` query on the words of the search string,
+    otherwise a ``LIKE`` query is used.
+    """
+    _fullTextTokenRegex = re.compile(
+        u'[^\x00-\x2f\x3a-\x40\x5b-\x60\x7b-\x7f]+')
+    """
+    Regular expression matching a token of SQLite's FTS3 ``simple`` tokenizer.
+    """
+
     def __init__(self, caseInsensitive=True, **options):
         Exact.__init__(self, caseInsensitive=caseInsensitive,
             **options)
+        self._fullTextTable = None
+
+    def setDictionaryInstance(self, dictInstance):
+        super(SingleEntryTranslation, self).setDictionaryInstance(
+            dictInstance)
+
+        self._fullTextTable = None
+        tableName = getattr(dictInstance, 'DICTIONARY_TABLE', None)
+        if (tableName and dictInstance.db.engine.name == 'sqlite'
+            and dictInstance.db.hasTable(tableName + '_Text')):
+            self._fullTextTable = dictInstance.db.tables[tableName + '_Text']
+
+    def _getFullTextQuery(self, entities):
+        """
+        Gets a query for SQLite's full text search that is a necessary
+        condition for the given search string to match. Search strings are
+        expected to match on word boundaries.
+
+        :type entities: list
+        :param entities: search string split into plain strings and wildcards
+        :rtype: str
+        :return: full text query, ``None`` if no query can be given
+        """
+        # join unescaped parts
+        joinedEntities = []
+        for entity in entities:
+            if (isinstance(entity, basestring) and joinedEntities
+                and isinstance(joinedEntities[-1], basestring)):
+                joinedEntities[-1] = joinedEntities[-1] + entity
+            else:
+                joinedEntities.append(entity)
+
+        phrases = []
+        for idx, entity in enumerate(joinedEntities):
+            if not isinstance(entity, basestring):
+                continue
+
+            phrase = []
+            for matchObj in self._fullTextTokenRegex.finditer(entity):
+                token = matchObj.group(0)
+                if ((idx > 0 and matchObj.start() == 0)
+                    or [c for c in token
+                        if ord(c) > 127 and c.lower() != c.upper()]):
+                    # no suffix search, no case folding for non-ASCII
+                    if phrase:
+                        phrases.append(phrase)
+                    phrase = []
+                    continue
+
+                token = token.lower()
+                if (idx < len(joinedEntities) - 1
+                    and matchObj.end() == len(entity)):
+                    # prefix search
+                    token = token + '*'
+                phrase.append(token)
+            if phrase:
+                phrases.append(phrase)
+
+        if phrases:
+            return ' '.join(['"%s"' % ' '.join(tokens) for tokens in phrases])
+
+    def _getFullTextClause(self, column, entities):
+        """
+        Gets a ``MATCH`` clause for the given search string if the dictionary
+        has full text search support.
+
+        :rtype: SQLAlchemy clause
+        :return: clause, ``None`` if full text search cannot be used
+        """
+        if (self._fullTextTable is not None
+            and column.name in self._fullTextTable.c):
+            query = self._getFullTextQuery(entities)
+            if query:
+                return column.match(query)
 
     def getWhereClause(self, column, searchStr):
+        fullTextClause = self._getFullTextClause(column, [searchStr])
+        if fullTextClause is not None:
+            return fullTextClause
+
         return self._contains(column, _escapeWildcards(searchStr), escape='\\')
 
     def getMatchFunction(self, searchStr):
@@ -439,6 +530,11 @@ class WildcardTranslation(SingleEntryTranslation,
             + '/')
 
     def getWhereClause(self, column, searchStr):
+        fullTextClause = self._getFullTextClause(column,
+            self._parseWildcardString(searchStr))
+        if fullTextClause is not None:
+            return fullTextClause
+
         wildcardSearchStr = self._getWildcardQuery(searchStr)
         return self._contains(column, wildcardSearchStr)
 
@@ -501,6 +597,11 @@ class SimpleWildcardTranslation(SingleEntryTranslation,
         return self._compileRegex('/' + regexStr + '/')
 
     def getWhereClause(self, column, searchStr):
+        fullTextClause = self._getFullTextClause(column,
+            self._parseWildcardString(searchStr))
+        if fullTextClause is not None:
+            return fullTextClause
+
         wildcardSearchStr = self._getWildcardQuery(searchStr)
         return self._contains(column, wildcardSearchStr)
 
@@ -549,6 +650,11 @@ class CEDICTWildcardTranslation(SingleEntryTranslation,
         return self._compileRegex('/' + regexStr + '[/,]')
 
     def getWhereClause(self, column, searchStr):
+        fullTextClause = self._getFullTextClause(column,
+            self._parseWildcardString(searchStr))
+        if fullTextClause is not None:
+            return fullTextClause
+
         wildcardSearchStr = self._getWildcardQuery(searchStr)
         return self._contains(column, wildcardSearchStr)
 
@@ -602,6 +708,11 @@ class HanDeDictWildcardTranslation(SingleEntryTranslation,
             + '[/\,\;\.\?\!]')
 
     def getWhereClause(self, column, searchStr):
+        fullTextClause = self._getFullTextClause(column,
+            self._parseWildcardString(searchStr))
+        if fullTextClause is not None:
+            return fullTextClause
+
         wildcardSearchStr = self._getWildcardQuery(searchStr)
         return self._contains(column, wildcardSearchStr)
 
@@ -702,12 +813,14 @@ class _SimpleReadingWildcardBase(_WildcardBase):
     class SingleWildcard:
         """Wildcard matching exactly one reading entity."""
         SQL_LIKE_STATEMENT = '_%'
+        SQL_LIKE_STATEMENT_PLAIN = '_%'
         def match(self, entity):
             return entity is not None
 
     class MultipleWildcard:
         """Wildcard matching zero, one or multiple reading entities."""
         SQL_LIKE_STATEMENT = '%'
+        SQL_LIKE_STATEMENT_PLAIN = '%'
         def match(self, entity):
             return True
 
@@ -762,12 +875,18 @@ class _SimpleReadingWildcardBase(_WildcardBase):
 
         return self._wildcardForms
 
-    def _getWildcardReading(self, entities):
-        """Joins reading entities, taking care of wildcards."""
+    def _getWildcardReading(self, entities, plain=False):
+        """
+        Joins reading entities, taking care of wildcards. If ``plain`` is
+        ``True`` the query for the plain reading column is given.
+        """
         entityList = []
         for entity in entities:
             if not isinstance(entity, basestring):
-                entity = entity.SQL_LIKE_STATEMENT
+                if plain:
+                    entity = entity.SQL_LIKE_STATEMENT_PLAIN
+                else:
+                    entity = entity.SQL_LIKE_STATEMENT
             else:
                 entity = _escapeWildcards(entity, escape=self.escape)
 
@@ -985,6 +1104,48 @@ class _TonelessReadingWildcardBase(_SimpleReadingWildcardBase):
         return any(any((not isinstance(entity, basestring))
             for entity in entities) for entities in wildcardForms)
 
+    @staticmethod
+    def _getPlainReadingColumn(column):
+        """
+        Returns the column holding the reading without tonal information, if
+        the dictionary provides one for the given reading column.
+        """
+        if column.name == 'Reading' and 'ReadingPlain' in column.table.c:
+            return column.table.c.ReadingPlain
+
+    def _getPlainQuery(self, searchStr, **options):
+        """
+        Gets queries for the column holding the reading without tonal
+        information. The column is stored in lower case, and so are the
+        queries.
+
+        :rtype: list of tuple
+        :return: list of queries and a flag set to ``True`` if the query
+            includes wildcards
+        """
+        plainForms = self._getPlainForms(searchStr, **options)
+
+        queries = []
+        for entities in plainForms:
+            plainEntities = []
+            for entity in entities:
+                if not isinstance(entity, basestring):
+                    entity, plainEntity, _ = entity
+                    plainEntities.append(plainEntity or entity)
+                elif self._supportWildcards:
+                    plainEntities.extend(self._parseWildcardString(entity))
+                else:
+                    plainEntities.extend(getCharacterList(entity))
+
+            if any((not isinstance(entity, basestring))
+                for entity in plainEntities):
+                query = self._getWildcardReading(plainEntities)
+                queries.append((query.lower(), True))
+            else:
+                queries.append((' '.join(plainEntities).lower(), False))
+
+        return queries
+
     def _getSimpleQuery(self, searchStr, **options):
         #assert not self._hasWildcardForms(searchStr, **options)
         wildcardForms = self._getWildcardForms(searchStr, **options)
@@ -1052,6 +1213,18 @@ class TonelessWildcardReading(SimpleReading,
 
     def getWhereClause(self, column, searchStr, **options):
         if self._hasWildcardForms(searchStr, **options):
+            plainColumn = self._getPlainReadingColumn(column)
+            if plainColumn is not None:
+                # use indexed reading without tones, tones checked by filter
+                clauses = []
+                for query, hasWildcards in self._getPlainQuery(searchStr,
+                    **options):
+                    if hasWildcards:
+                        clauses.append(self._like(plainColumn, query))
+                    else:
+                        clauses.append(self._equals(plainColumn, query))
+                return or_(*clauses)
+
             queries = self._getWildcardQuery(searchStr, **options)
             return or_(*[self._like(column, query) for query in queries])
         else:
@@ -1087,6 +1260,7 @@ class _MixedReadingWildcardBase(_SimpleReadingWildcardBase):
         """
         SQL_LIKE_STATEMENT = '_%'
         SQL_LIKE_STATEMENT_HEADWORD = '_'
+        SQL_LIKE_STATEMENT_PLAIN = '_%'
         def match(self, entity):
             return entity is not None
 
@@ -1097,6 +1271,7 @@ class _MixedReadingWildcardBase(_SimpleReadingWildcardBase):
         """
         SQL_LIKE_STATEMENT = '%'
         SQL_LIKE_STATEMENT_HEADWORD = '%'
+        SQL_LIKE_STATEMENT_PLAIN = '%'
         def match(self, entity):
             return True
 
@@ -1112,6 +1287,7 @@ class _MixedReadingWildcardBase(_SimpleReadingWildcardBase):
             return _escapeWildcards(self._headwordEntity, self._escape)
         SQL_LIKE_STATEMENT = '_%'
         SQL_LIKE_STATEMENT_HEADWORD = property(headwordEntity)
+        SQL_LIKE_STATEMENT_PLAIN = '_%'
         def match(self, entity):
             if entity is None:
                 return False
@@ -1340,6 +1516,9 @@ class _MixedTonelessReadingWildcardBase(_MixedReadingWildcardBase,
             return _escapeWildcards(self._plainEntity, self._escape) + '_'
         SQL_LIKE_STATEMENT = property(tonelessReadingEntity)
         SQL_LIKE_STATEMENT_HEADWORD = '_'
+        def plainReadingEntity(self):
+            return _escapeWildcards(self._plainEntity, self._escape)
+        SQL_LIKE_STATEMENT_PLAIN = property(plainReadingEntity)
         def match(self, entity):
             if entity is None:
                 return False
@@ -1347,6 +1526,19 @@ class _MixedTonelessReadingWildcardBase(_MixedReadingWildcardBase,
             return (readingEntity == self._plainEntity
                 or readingEntity[:-1] == self._plainEntity)
 
+    class TonalReadingWildcard(_MixedReadingWildcardBase.ReadingWildcard):
+        """
+        Wildcard matching an exact reading entity with tonal information and
+        one arbitrary headword character.
+        """
+        def __init__(self, readingEntity, plainEntity, escape):
+            _MixedReadingWildcardBase.ReadingWildcard.__init__(self,
+                readingEntity, escape)
+            self._plainEntity = plainEntity
+        def plainReadingEntity(self):
+            return _escapeWildcards(self._plainEntity, self._escape)
+        SQL_LIKE_STATEMENT_PLAIN = property(plainReadingEntity)
+
     def __init__(self, supportWildcards=True, headwordFullwidthCharacters=False,
         **options):
         _MixedReadingWildcardBase.__init__(self, supportWildcards,
@@ -1356,6 +1548,10 @@ class _MixedTonelessReadingWildcardBase(_MixedReadingWildcardBase,
     def _createTonelessReadingWildcard(self, plainEntity):
         return self.TonelessReadingWildcard(plainEntity, self.escape)
 
+    def _createTonalReadingWildcard(self, readingEntity, plainEntity):
+        return self.TonalReadingWildcard(readingEntity, plainEntity,
+            self.escape)
+
     def _getWildcardForms(self, readingStr, **options):
         if self._getWildcardFormsOptions != (readingStr, options):
             self._getWildcardFormsOptions = (readingStr, options)
@@ -1378,7 +1574,8 @@ class _MixedTonelessReadingWildcardBase(_MixedReadingWildcardBase,
                                     plainEntity))
                         else:
                             searchEntities.append(
-                                self._createReadingWildcard(entity))
+                                self._createTonalReadingWildcard(entity,
+                                    plainEntity or entity))
                     elif self._supportWildcards:
                         parsedEntities = self._parseWildcardString(entity)
                         searchEntities.extend(parsedEntities)
@@ -1454,6 +1651,20 @@ class MixedTonelessWildcardReading(SimpleReading,
         :param searchStr: search string
         :return: SQLAlchemy clause
         """
+        plainColumn = self._getPlainReadingColumn(readingColumn)
+        if plainColumn is not None:
+            # use indexed reading without tones, tones checked by filter
+            searchPairs = self._getWildcardForms(searchStr, **options)
+            if searchPairs:
+                return or_(*[
+                        and_(self._like(headwordColumn,
+                                self._getWildcardHeadword(searchEntities)),
+                            self._like(plainColumn, self._getWildcardReading(
+                                searchEntities, plain=True).lower()))
+                        for searchEntities in searchPairs])
+            else:
+                return None
+
         queries = self._getWildcardQuery(searchStr, **options)
         if queries:
             return or_(*[
@@ -19,14 +19,14 @@ u"""
 Character reading based functions (transliterations, romanizations, ...).
 """
 
-__all__ = ['operator', 'converter', 'ReadingFactory']
+__all__ = ['operator', 'converter', 'pipeline', 'ReadingFactory']
 
 import types
+import threading
 
 from cjklib.exception import UnsupportedError
 from cjklib import dbconnector
-from cjklib.reading import operator as readingoperator
-from cjklib.reading import converter as readingconverter
+from cjklib.util import LRUDict
 
 class ReadingFactory(object):
     u"""
@@ -69,6 +69,7 @@ class ReadingFactory(object):
         :return: list of all classes inheriting form
             :class:`~cjklib.reading.operator.ReadingOperator`
         """
+        from cjklib.reading import operator as readingoperator
         # get all non-abstract classes that inherit from ReadingOperator
         readingOperatorClasses = [clss for clss \
             in readingoperator.__dict__.values() \
@@ -89,6 +90,7 @@ class ReadingFactory(object):
         :return: list of all classes inheriting form
             :class:`~cjklib.reading.converter.ReadingConverter`
         """
+        from cjklib.reading import converter as readingconverter
         # get all non-abstract classes that inherit from ReadingConverter
         readingConverterClasses = [clss \
             for clss in readingconverter.__dict__.values() \
@@ -98,7 +100,9 @@ class ReadingFactory(object):
 
         return readingConverterClasses
 
-    _sharedState = {'readingOperatorClasses': {}, 'readingConverterClasses': {}}
+    _sharedState = {'readingOperatorClasses': {}, 'readingConverterClasses': {},
+        'defaultOperatorsPublished': False, 'defaultConvertersPublished': False,
+        'publishLock': threading.Lock()}
     """
     Dictionary holding global state information used by all instances of the
     ReadingFactory.
@@ -197,7 +201,8 @@ class ReadingFactory(object):
         def __getattr__(self, name):
             return getattr(self.converterInst, name)
 
-    def __init__(self, databaseUrl=None, dbConnectInst=None):
+    def __init__(self, databaseUrl=None, dbConnectInst=None,
+        resultCacheSize=None):
         """
         Initialises the ReadingFactory.
 
@@ -213,6 +218,10 @@ class ReadingFactory(object):
         :type dbConnectInst: instance
         :param dbConnectInst: instance of a
             :class:`~cjklib.dbconnector.DatabaseConnector`
+        :type resultCacheSize: int
+        :param resultCacheSize: if given, sets the size of the result cache
+            shared by all factories of the same database, see
+            :meth:`~cjklib.reading.ReadingFactory.setResultCacheSize`
         """
         # get connector to database
         if dbConnectInst:
@@ -224,19 +233,165 @@ class ReadingFactory(object):
         if self.db not in self._sharedState:
             # clear also generates the structure
             self.clearCache()
-        # publish default reading operators and converters
-            for readingOperator in self.getReadingOperatorClasses():
-                self.publishReadingOperator(readingOperator)
-            for readingConverter in self.getReadingConverterClasses():
-                self.publishReadingConverter(readingConverter)
+        # default reading operators and converters are published on first use,
+        #   see _publishDefaultOperators() and _publishDefaultConverters()
+
+        if resultCacheSize is not None:
+            self.setResultCacheSize(resultCacheSize)
 
     #{ Meta
 
     def clearCache(self):
-        """Clears cached classes for the current database."""
+        """
+        Clears cached classes and cached results for the current database.
+        """
+        resultCache = None
+        if self.db in self._sharedState:
+            resultCache = self._sharedState[self.db].get('resultCache', None)
+
         self._sharedState[self.db] = {}
         self._sharedState[self.db]['readingOperatorInstances'] = {}
         self._sharedState[self.db]['readingConverterInstances'] = {}
+        self._sharedState[self.db]['resultCacheLock'] = threading.Lock()
+        self._sharedState[self.db]['resultCacheHits'] = 0
+        self._sharedState[self.db]['resultCacheMisses'] = 0
+        if resultCache is not None:
+            self._sharedState[self.db]['resultCache'] = LRUDict(
+                resultCache.maxsize)
+        else:
+            self._sharedState[self.db]['resultCache'] = None
+
+    def setResultCacheSize(self, size):
+        """
+        Sets the maximum number of results of
+        :meth:`~cjklib.reading.ReadingFactory.convert` and
+        :meth:`~cjklib.reading.ReadingFactory.decompose` cached for the
+        current database. The least recently used result is dropped once the
+        cache is full. The cache is shared by all factories using the same
+        database connection. Existing entries are discarded.
+
+        .. versionadded:: 0.3.3
+
+        :type size: int
+        :param size: maximum number of cached results, ``0`` or ``None`` to
+            disable the cache
+        """
+        state = self._sharedState[self.db]
+        state['resultCacheLock'].acquire()
+        try:
+            if size:
+                state['resultCache'] = LRUDict(int(size))
+            else:
+                state['resultCache'] = None
+            state['resultCacheHits'] = 0
+            state['resultCacheMisses'] = 0
+        finally:
+            state['resultCacheLock'].release()
+
+    def getResultCacheStatistics(self):
+        """
+        Returns statistics of the result cache: number of ``'hits'`` and
+        ``'misses'``, the number of cached ``'entries'`` and the maximum
+        number of entries in ``'size'``.
+
+        .. versionadded:: 0.3.3
+
+        :rtype: dict
+        :return: cache statistics, ``None`` if no cache is used
+        """
+        state = self._sharedState[self.db]
+        state['resultCacheLock'].acquire()
+        try:
+            resultCache = state['resultCache']
+            if resultCache is None:
+                return None
+
+            return {'hits': state['resultCacheHits'],
+                'misses': state['resultCacheMisses'],
+                'entries': len(resultCache), 'size': resultCache.maxsize}
+        finally:
+            state['resultCacheLock'].release()
+
+    def _getCachedResult(self, method, key, args, options, function):
+        """
+        Returns the result of the given function, looking it up in the result
+        cache first if enabled. Calls with operators given explicitly are not
+        cached, as results depend on the state of those instances.
+        """
+        state = self._sharedState[self.db]
+        if (state['resultCache'] is None or args
+            or 'sourceOperators' in options or 'targetOperators' in options):
+            return function()
+
+        try:
+            cacheKey = (method, key, self._getHashableCopy(options))
+            hash(cacheKey)
+        except TypeError:
+            return function()
+
+        lock = state['resultCacheLock']
+        lock.acquire()
+        try:
+            resultCache = state['resultCache']
+            if resultCache is not None and cacheKey in resultCache:
+                state['resultCacheHits'] += 1
+                return resultCache[cacheKey]
+            state['resultCacheMisses'] += 1
+        finally:
+            lock.release()
+
+        result = function()
+
+        lock.acquire()
+        try:
+            resultCache = state['resultCache']
+            if resultCache is not None:
+                resultCache[cacheKey] = result
+        finally:
+            lock.release()
+        return result
+
+    def _publishDefaultOperators(self):
+        """
+        Publishes the library's reading operators. Module
+        :mod:`cjklib.reading.operator` is only imported on first use of a
+        reading.
+        """
+        state = self._sharedState
+        if state['defaultOperatorsPublished']:
+            return
+
+        state['publishLock'].acquire()
+        try:
+            if not state['defaultOperatorsPublished']:
+                for readingOperator in self.getReadingOperatorClasses():
+                    state['readingOperatorClasses']\
+                        [readingOperator.READING_NAME] = readingOperator
+                state['defaultOperatorsPublished'] = True
+        finally:
+            state['publishLock'].release()
+
+    def _publishDefaultConverters(self):
+        """
+        Publishes the library's reading converters. Module
+        :mod:`cjklib.reading.converter` is only imported on first use of a
+        conversion.
+        """
+        state = self._sharedState
+        if state['defaultConvertersPublished']:
+            return
+
+        state['publishLock'].acquire()
+        try:
+            if not state['defaultConvertersPublished']:
+                for readingConverter in self.getReadingConverterClasses():
+                    for fromReading, toReading \
+                        in readingConverter.CONVERSION_DIRECTIONS:
+                        state['readingConverterClasses']\
+                            [(fromReading, toReading)] = readingConverter
+                state['defaultConvertersPublished'] = True
+        finally:
+            state['publishLock'].release()
 
     def publishReadingOperator(self, readingOperator):
         """
@@ -247,6 +402,7 @@ class ReadingFactory(object):
         :param readingOperator: a new
             :class:`~cjklib.reading.operator.ReadingOperator` to be published
         """
+        self._publishDefaultOperators()
         self._sharedState['readingOperatorClasses']\
             [readingOperator.READING_NAME] = readingOperator
 
@@ -258,6 +414,7 @@ class ReadingFactory(object):
         :return: a list of readings a
             :class:`~cjklib.reading.operator.ReadingOperator` is available for
         """
+        self._publishDefaultOperators()
         return self._sharedState['readingOperatorClasses'].keys()
 
     def getReadingOperatorClass(self, readingN):
@@ -271,6 +428,7 @@ class ReadingFactory(object):
         :return: a :class:`~cjklib.reading.operator.ReadingOperator` class
         :raise UnsupportedError: if the given reading is not supported.
         """
+        self._publishDefaultOperators()
         if readingN not in self._sharedState['readingOperatorClasses']:
             raise UnsupportedError("reading '%s' not supported" % readingN)
         return self._sharedState['readingOperatorClasses'][readingN]
@@ -292,7 +450,10 @@ class ReadingFactory(object):
         opt = options.copy()
         if 'dbConnectInst' not in opt:
             opt['dbConnectInst'] = self.db
-        return operatorClass(**opt)
+        readingOperator = operatorClass(**opt)
+        # store tables derived from the database for later instances
+        readingOperator.updateSnapshot()
+        return readingOperator
 
     def publishReadingConverter(self, readingConverter):
         """
@@ -303,6 +464,7 @@ class ReadingFactory(object):
         :param readingConverter: a new
             :class:`~cjklib.reading.converter.ReadingConverter` to be published
         """
+        self._publishDefaultConverters()
         for fromReading, toReading in readingConverter.CONVERSION_DIRECTIONS:
             self._sharedState['readingConverterClasses']\
                 [(fromReading, toReading)] = readingConverter
@@ -403,6 +565,7 @@ class ReadingFactory(object):
         :rtype: bool
         :return: true if conversion is supported, false otherwise
         """
+        self._publishDefaultConverters()
         return (fromReading, toReading) \
             in self._sharedState['readingConverterClasses']
 
@@ -575,6 +738,7 @@ class ReadingFactory(object):
             ReadingOperator, but an instance is already given in ``args``.
         :raise UnsupportedError: if source or target reading is not supported.
         """
+        from cjklib.reading import operator as readingoperator
         # check options, don't overwrite existing operators
         for arg in args:
             if isinstance(arg, readingoperator.ReadingOperator):
@@ -685,9 +849,13 @@ class ReadingFactory(object):
         :raise UnsupportedError: if source or target reading is not supported
             for conversion.
         """
-        readingConv = self._getReadingConverterInstance(fromReading, toReading,
-            *args, **options)
-        return readingConv.convert(readingStr, fromReading, toReading)
+        def convert():
+            readingConv = self._getReadingConverterInstance(fromReading,
+                toReading, *args, **options)
+            return readingConv.convert(readingStr, fromReading, toReading)
+
+        return self._getCachedResult('convert',
+            (readingStr, fromReading, toReading), args, options, convert)
 
     def convertEntities(self, readingEntities, fromReading, toReading, *args,
         **options):
@@ -758,8 +926,13 @@ class ReadingFactory(object):
         :raise DecompositionError: if the string can not be decomposed.
         :raise UnsupportedError: if the given reading is not supported.
         """
-        readingOp = self._getReadingOperatorInstance(readingN, **options)
-        return readingOp.decompose(string)
+        def decompose():
+            readingOp = self._getReadingOperatorInstance(readingN, **options)
+            # cached list is shared, store as tuple
+            return tuple(readingOp.decompose(string))
+
+        return list(self._getCachedResult('decompose', (string, readingN),
+            (), options, decompose))
 
     def compose(self, readingEntities, readingN, **options):
         """
@@ -850,18 +850,12 @@ class PinyinWadeGilesConverter(RomanisationConverter):
         plainSyllable, tone = self._f.splitEntityTone(entity, fromReading,
             **self.DEFAULT_READING_OPTIONS[fromReading])
 
-        # lookup in database
+        # lookup in mapping
         if fromReading == "WadeGiles":
-            table = self.db.tables['WadeGilesPinyinMapping']
-            transSyllable = self.db.selectScalar(
-                select([table.c.Pinyin], table.c.WadeGiles == plainSyllable))
+            transSyllable = self._wadeGilesPinyinMapping.get(plainSyllable)
         elif fromReading == "Pinyin":
-            # mapping from WG to Pinyin has old, dialect forms, use index
-            table = self.db.tables['WadeGilesPinyinMapping']
-            transSyllables = self.db.selectScalars(
-                select([table.c.WadeGiles],
-                    and_(table.c.Pinyin == plainSyllable,
-                        table.c.PinyinIdx == 0)))
+            transSyllables = self._pinyinWadeGilesMapping.get(plainSyllable,
+                [])
             if len(transSyllables) > 1:
                 raise AmbiguousConversionError(
                     "conversion for entity '%s' is ambiguous: %s" \
@@ -883,6 +877,25 @@ class PinyinWadeGilesConverter(RomanisationConverter):
             #   accepted by the operator
             raise ConversionError(*e.args)
 
+    @cachedproperty
+    def _wadeGilesPinyinMapping(self):
+        """Mapping of Wade-Giles syllables to Pinyin, loaded on first use."""
+        table = self.db.tables['WadeGilesPinyinMapping']
+        return dict(self.db.iterRows(
+            select([table.c.WadeGiles, table.c.Pinyin])))
+
+    @cachedproperty
+    def _pinyinWadeGilesMapping(self):
+        """Mapping of Pinyin syllables to Wade-Giles, loaded on first use."""
+        # mapping from WG to Pinyin has old, dialect forms, use index
+        table = self.db.tables['WadeGilesPinyinMapping']
+        mapping = {}
+        for wadeGiles, pinyin in self.db.iterRows(
+            select([table.c.WadeGiles, table.c.Pinyin],
+                table.c.PinyinIdx == 0)):
+            mapping.setdefault(pinyin, []).append(wadeGiles)
+        return mapping
+
 
 class GRDialectConverter(ReadingConverter):
     u"""
@@ -1249,11 +1262,9 @@ class GRPinyinConverter(RomanisationConverter):
             plainSyllable, tone = self._f.splitEntityTone(entity, fromReading,
                 **self.DEFAULT_READING_OPTIONS[fromReading])
 
-        # lookup in database
+        # lookup in mapping
         if fromReading == "GR":
-            table = self.db.tables['PinyinGRMapping']
-            transSyllable = self.db.selectScalar(select([table.c.Pinyin],
-                table.c.GR == plainSyllable))
+            transSyllable = self._grPinyinMapping.get(plainSyllable)
             transTone = self._grToneMapping[tone]
 
         elif fromReading == "Pinyin":
@@ -1262,9 +1273,7 @@ class GRPinyinConverter(RomanisationConverter):
                 erlhuahForm = True
                 plainSyllable = plainSyllable[:-1]
 
-            table = self.db.tables['PinyinGRMapping']
-            transSyllable = self.db.selectScalar(select([table.c.GR],
-                table.c.Pinyin == plainSyllable))
+            transSyllable = self._pinyinGRMapping.get(plainSyllable)
             if self._pyToneMapping[tone]:
                 transTone = self._pyToneMapping[tone]
             else:
@@ -1302,6 +1311,18 @@ class GRPinyinConverter(RomanisationConverter):
         """GROperator instance"""
         return readingoperator.GROperator(**self.DEFAULT_READING_OPTIONS['GR'])
 
+    @cachedproperty
+    def _pinyinGRMapping(self):
+        """Mapping of Pinyin syllables to GR, loaded on first use."""
+        table = self.db.tables['PinyinGRMapping']
+        return dict(self.db.iterRows(select([table.c.Pinyin, table.c.GR])))
+
+    @cachedproperty
+    def _grPinyinMapping(self):
+        """Mapping of GR syllables to Pinyin, loaded on first use."""
+        return dict((gr, pinyin) for pinyin, gr
+            in self._pinyinGRMapping.items())
+
 
 class PinyinIPAConverter(DialectSupportReadingConverter):
     u"""
@@ -1924,12 +1945,9 @@ class JyutpingYaleConverter(RomanisationConverter):
         plainSyllable, tone = self._f.splitEntityTone(entity, fromReading,
             **self.DEFAULT_READING_OPTIONS[fromReading])
 
-        # lookup in database
+        # lookup in mapping
         if fromReading == "CantoneseYale":
-            table = self.db.tables['JyutpingYaleMapping']
-            transSyllable = self.db.selectScalar(
-                select([table.c.Jyutping],
-                    table.c.CantoneseYale == plainSyllable))
+            transSyllable = self._yaleJyutpingMapping.get(plainSyllable)
             # get tone
             if tone:
                 # get tone number from first character of string representation
@@ -1937,10 +1955,7 @@ class JyutpingYaleConverter(RomanisationConverter):
             else:
                 transTone = None
         elif fromReading == "Jyutping":
-            table = self.db.tables['JyutpingYaleMapping']
-            transSyllable = self.db.selectScalar(
-                select([table.c.CantoneseYale],
-                    table.c.Jyutping == plainSyllable))
+            transSyllable = self._jyutpingYaleMapping.get(plainSyllable)
             # get tone
             if not tone:
                 transTone = None
@@ -1958,6 +1973,21 @@ class JyutpingYaleConverter(RomanisationConverter):
             #   accepted by the operator
             raise ConversionError(*e.args)
 
+    @cachedproperty
+    def _jyutpingYaleMapping(self):
+        """Mapping of Jyutping syllables to Cantonese Yale, loaded on first use.
+        """
+        table = self.db.tables['JyutpingYaleMapping']
+        return dict(self.db.iterRows(
+            select([table.c.Jyutping, table.c.CantoneseYale])))
+
+    @cachedproperty
+    def _yaleJyutpingMapping(self):
+        """Mapping of Cantonese Yale syllables to Jyutping, loaded on first use.
+        """
+        return dict((yale, jyutping) for jyutping, yale
+            in self._jyutpingYaleMapping.items())
+
 
 class ShanghaineseIPADialectConverter(EntityWiseReadingConverter):
     u"""
@@ -33,11 +33,15 @@ __all__ = [
     "CantoneseIPAOperator"
     ]
 
+import os
 import re
 import string
 import unicodedata
 import copy
 import types
+import hashlib
+import tempfile
+import cPickle
 
 from sqlalchemy import select
 from sqlalchemy.sql import or_
@@ -56,6 +60,15 @@ class ReadingOperator(object):
     READING_NAME = None
     """Unique name of reading"""
 
+    SNAPSHOT_ATTRIBUTES = []
+    """
+    Names of cached methods and properties holding tables derived from the
+    database, which are stored in a snapshot, see
+    :meth:`~cjklib.reading.operator.ReadingOperator.updateSnapshot`.
+    """
+    SNAPSHOT_VERSION = 1
+    """Version of the snapshot content, increase when the tables change."""
+
     def __init__(self, **options):
         """
         :param options: extra options
@@ -75,6 +88,9 @@ class ReadingOperator(object):
             else:
                 setattr(self, option, optionValue)
 
+        self._snapshotFile = self._getSnapshotFile()
+        self._snapshotLoaded = self._loadSnapshot()
+
     @classmethod
     def getDefaultOptions(cls):
         """
@@ -110,6 +126,134 @@ class ReadingOperator(object):
         """
         raise NotImplementedError
 
+    def _getSnapshotFile(self):
+        """
+        Returns the path of the snapshot file for the current database and
+        options. Options given as functions are not part of the key, tables
+        stored in the snapshot must not depend on them.
+
+        :rtype: str
+        :return: path of the snapshot file, ``None`` if snapshots are not
+            supported
+        """
+        snapshotPath = getattr(self.db, 'snapshotPath', None)
+        if not self.SNAPSHOT_ATTRIBUTES or not snapshotPath:
+            return None
+
+        fingerprint = self.db.getDatabaseFingerprint()
+        if fingerprint is None:
+            return None
+
+        options = []
+        for option in sorted(self.getDefaultOptions().keys()):
+            value = getattr(self, option)
+            if hasattr(value, '__call__'):
+                continue
+            elif isinstance(value, dict):
+                value = sorted(value.items())
+            options.append((option, value))
+
+        key = hashlib.sha1(repr((self.SNAPSHOT_VERSION, fingerprint,
+            options))).hexdigest()
+        return os.path.join(snapshotPath,
+            '%s-%s.pickle' % (self.READING_NAME, key))
+
+    def _loadSnapshot(self):
+        """
+        Prefills the cached methods and properties given in
+        :attr:`~cjklib.reading.operator.ReadingOperator.SNAPSHOT_ATTRIBUTES`
+        from the snapshot file.
+
+        :rtype: bool
+        :return: ``True`` if a snapshot was loaded
+        """
+        if not self._snapshotFile:
+            return False
+
+        try:
+            f = open(self._snapshotFile, 'rb')
+            try:
+                snapshot = cPickle.load(f)
+            finally:
+                f.close()
+        except IOError:
+            return False
+        except Exception:
+            # broken snapshot, will be replaced by updateSnapshot()
+            return False
+
+        if (not isinstance(snapshot, dict)
+            or set(snapshot.keys()) != set(self.SNAPSHOT_ATTRIBUTES)):
+            return False
+
+        for name, value in snapshot.items():
+            if isinstance(getattr(self.__class__, name), property):
+                # see cachedproperty
+                setattr(self, '_%s_cached' % name, value)
+            else:
+                # see cachedmethod
+                def memo(value=value):
+                    return value
+                memo.__name__ = name
+                self.__dict__[name] = memo
+
+        return True
+
+    def updateSnapshot(self):
+        """
+        Writes the tables derived from the database to a snapshot file, so that
+        later instances with the same options load them in one read on
+        construction instead of recomputing them.
+
+        Snapshots are only supported for SQLite database files and stored in
+        the directory given by the database connector's option
+        ``'snapshotPath'``. They are keyed by the database's fingerprint (see
+        :meth:`~cjklib.dbconnector.DatabaseConnector.getDatabaseFingerprint`)
+        and thus renewed once the database is rebuilt. Nothing is written if a
+        snapshot has been loaded on construction.
+
+        Writing is an optimisation only, failures are silently ignored.
+
+        .. versionadded:: 0.3.3
+
+        :rtype: bool
+        :return: ``True`` if a snapshot was written
+        """
+        if self._snapshotLoaded or not self._snapshotFile:
+            return False
+
+        snapshot = {}
+        for name in self.SNAPSHOT_ATTRIBUTES:
+            if isinstance(getattr(self.__class__, name), property):
+                snapshot[name] = getattr(self, name)
+            else:
+                snapshot[name] = getattr(self, name)()
+
+        snapshotPath = os.path.dirname(self._snapshotFile)
+        tempFile = None
+        try:
+            if not os.path.isdir(snapshotPath):
+                os.makedirs(snapshotPath)
+            handle, tempFile = tempfile.mkstemp(suffix='.tmp',
+                dir=snapshotPath)
+            f = os.fdopen(handle, 'wb')
+            try:
+                cPickle.dump(snapshot, f, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+            # replace atomically, concurrent readers see the old or new file
+            os.rename(tempFile, self._snapshotFile)
+        except (IOError, OSError, cPickle.PicklingError):
+            if tempFile and os.path.exists(tempFile):
+                try:
+                    os.remove(tempFile)
+                except OSError:
+                    pass
+            return False
+
+        self._snapshotLoaded = True
+        return True
+
     def compose(self, readingEntities):
         """
         Composes the given list of basic entities to a string.
@@ -364,8 +508,9 @@ class RomanisationOperator(ReadingOperator):
             else:
                 return [[readingString]]
         resultList = []
+        pathCache = {}
         for entry in segmentationTree:
-            resultList.extend(self._treeToList(entry))
+            resultList.extend(self._treeToList(entry, pathCache))
         return resultList
 
     def _recursiveSegmentation(self, readingString):
@@ -375,29 +520,37 @@ class RomanisationOperator(ReadingOperator):
 
         The tree is represented by tuples ``(syllable, subtree)``.
 
+        The tree is built as a lattice over the string's positions, starting
+        from the end of the string. Each position is visited only once and
+        subtrees for a given position are shared between all branches ending
+        there, so that segmentation runs in linear time with respect to the
+        length of the input string.
+
         :type readingString: str
         :param readingString: reading string
         :rtype: list of tuple
         :return: a tree of possible segmentations (if ambiguous) into single
             syllables
         """
-        segmentationParts = []
-        substringIndex = 1
-        while substringIndex <= len(readingString) \
-            and self._hasEntitySubstring(
-                readingString[0:substringIndex].lower()):
-
-            entity = readingString[0:substringIndex]
-            if self.isReadingEntity(entity) or self.isFormattingEntity(entity):
-                remaining = readingString[substringIndex:]
-                if remaining != '':
-                    remainingParts = self._recursiveSegmentation(remaining)
-                    if remainingParts != []:
-                        segmentationParts.append((entity, remainingParts))
-                else:
-                    segmentationParts.append((entity, None))
-            substringIndex = substringIndex + 1
-        return segmentationParts
+        stringLength = len(readingString)
+        # lattice[i] holds the segmentation tree of readingString[i:]
+        lattice = [[] for _ in range(stringLength + 1)]
+        for startIndex in range(stringLength - 1, -1, -1):
+            segmentationParts = lattice[startIndex]
+            endIndex = startIndex + 1
+            while endIndex <= stringLength \
+                and self._hasEntitySubstring(
+                    readingString[startIndex:endIndex].lower()):
+
+                entity = readingString[startIndex:endIndex]
+                if self.isReadingEntity(entity) \
+                    or self.isFormattingEntity(entity):
+                    if endIndex == stringLength:
+                        segmentationParts.append((entity, None))
+                    elif lattice[endIndex]:
+                        segmentationParts.append((entity, lattice[endIndex]))
+                endIndex = endIndex + 1
+        return lattice[0]
 
     def _hasMergeableEntities(self, decomposition):
         """
@@ -535,7 +688,7 @@ class RomanisationOperator(ReadingOperator):
         return frozenset()
 
     @staticmethod
-    def _treeToList(tupleTree):
+    def _treeToList(tupleTree, pathCache=None):
         """
         Converts a tree to a list containing all full paths from root to leaf
         node.
@@ -550,20 +703,27 @@ class RomanisationOperator(ReadingOperator):
         :type tupleTree: tuple
         :param tupleTree: a tree realised through a tuple of a node and a
             subtree
+        :type pathCache: dict
+        :param pathCache: optional dictionary to store paths of already
+            visited subtrees, used for trees sharing subtrees
         :rtype: list of list
         :return: a list of all paths contained by the given tree
         """
-        resultList = []
         root, pathList = tupleTree
         if not pathList:
             return [[root]]
-        for path in pathList:
-            subList = RomanisationOperator._treeToList(path)
-            for entry in subList:
-                newEntry = [root]
-                newEntry.extend(entry)
-                resultList.append(newEntry)
-        return resultList
+
+        if pathCache is not None and id(pathList) in pathCache:
+            subPaths = pathCache[id(pathList)]
+        else:
+            subPaths = []
+            for path in pathList:
+                subPaths.extend(RomanisationOperator._treeToList(path,
+                    pathCache))
+            if pathCache is not None:
+                pathCache[id(pathList)] = subPaths
+
+        return [[root] + entry for entry in subPaths]
 
 
 class TonalFixedEntityOperator(ReadingOperator):
@@ -1174,6 +1334,10 @@ class PinyinOperator(TonalRomanisationOperator):
     APOSTROPHE_LIST = ["'", u'’', u'´', u'‘', u'`', u'ʼ', u'ˈ', u'′', u'ʻ']
     """List of apostrophes used in guessing routine."""
 
+    SNAPSHOT_ATTRIBUTES = ['getPlainReadingEntities', 'getReadingEntities',
+        'getFormattingEntities', 'getReadingCharacters', '_substringTable',
+        '_plainSubstringTable']
+
     def __init__(self, **options):
         u"""
         :param options: extra options
@@ -2769,6 +2933,12 @@ class GROperator(TonalRomanisationOperator):
     ˳ (U+02F3), ｡ (U+FF61), ￮ (U+FFEE), ₀ (U+2080), ₒ (U+2092)
     """
 
+    SNAPSHOT_ATTRIBUTES = ['getPlainReadingEntities',
+        'getFullReadingEntities', 'getReadingEntities',
+        'getFormattingEntities', 'getReadingCharacters', '_substringTable',
+        '_syllableToneLookup', '_rhotacisedFinals', '_abbreviatedLookup',
+        'getAbbreviatedForms', 'getAbbreviatedEntities']
+
     def __init__(self, **options):
         u"""
         :param options: extra options
@@ -3631,6 +3801,8 @@ class MandarinBrailleOperator(ReadingOperator):
 
     TONEMARKS = [u'⠁', u'⠂', u'⠄', u'⠆', '']
 
+    SNAPSHOT_ATTRIBUTES = ['_brailleInitialsFinals']
+
     def __init__(self, **options):
         """
         :param options: extra options
@@ -3659,12 +3831,7 @@ class MandarinBrailleOperator(ReadingOperator):
                 % repr(self.missingToneMark))
 
         # split regex
-        initials = ''.join(self.db.selectScalars(
-            select([self.db.tables['PinyinBrailleInitialMapping'].c.Braille],
-                distinct=True)))
-        finals = ''.join(self.db.selectScalars(
-            select([self.db.tables['PinyinBrailleFinalMapping'].c.Braille],
-                distinct=True)))
+        initials, finals = self._brailleInitialsFinals
         # initial and final optional (but at least one), tone optional
         self._splitRegex = re.compile(ur'((?:(?:[' + re.escape(initials) \
             + '][' + re.escape(finals) + ']?)|['+ re.escape(finals) \
@@ -3679,6 +3846,17 @@ class MandarinBrailleOperator(ReadingOperator):
 
         return options
 
+    @cachedproperty
+    def _brailleInitialsFinals(self):
+        """Strings of all Braille characters for initials and finals."""
+        initials = ''.join(self.db.selectScalars(
+            select([self.db.tables['PinyinBrailleInitialMapping'].c.Braille],
+                distinct=True)))
+        finals = ''.join(self.db.selectScalars(
+            select([self.db.tables['PinyinBrailleFinalMapping'].c.Braille],
+                distinct=True)))
+        return initials, finals
+
     @cachedmethod
     def getTones(self):
         """
@@ -4120,6 +4298,10 @@ class CantoneseYaleOperator(TonalRomanisationOperator):
     - tone numbers.
     """
 
+    SNAPSHOT_ATTRIBUTES = ['getPlainReadingEntities', 'getReadingEntities',
+        'getFormattingEntities', 'getReadingCharacters', '_substringTable',
+        '_plainSubstringTable', '_syllableData']
+
     def __init__(self, **options):
         """
         :param options: extra options
@@ -0,0 +1,218 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# This file is part of cjklib.
+#
+# cjklib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# cjklib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with cjklib.  If not, see <http://www.gnu.org/licenses/>.
+
+u"""
+Conversion of large texts between readings using several processes.
+
+Lines are read in chunks which are converted by a pool of worker processes,
+each holding its own :class:`~cjklib.reading.ReadingFactory` and read-only
+database connection. Results are returned in the order of the input as soon
+as they are available. Lines that can't be converted are reported with an
+error message instead of aborting the whole conversion.
+
+Example:
+
+- Convert lines from Pinyin to IPA:
+
+    >>> from cjklib.reading.pipeline import convertLines
+    >>> list(convertLines([u'l\u01ceosh\u012b'], 'Pinyin', 'MandarinIPA'))
+    [(u'l\u01ceosh\u012b', u'lau\u02e8\u02e9.\u0282\u0285\u02e5\u02e5',\
+ None)]
+
+- On the command line::
+
+    $ python -m cjklib.reading.pipeline -f Pinyin -t WadeGiles < in > out
+
+.. versionadded:: 0.3.3
+"""
+
+__all__ = ["convertLines"]
+
+import sys
+import locale
+from collections import deque
+from optparse import OptionParser
+
+from cjklib import exception
+
+CHUNK_SIZE = 500
+"""Default number of lines converted by a worker in one go."""
+
+_workerFactory = None
+# ReadingFactory of the worker process
+
+_workerConversion = None
+# Source reading, target reading and conversion options of the worker process
+
+def _initWorker(configuration, fromReading, toReading, options):
+    """
+    Sets up a worker process with its own read-only database connection.
+    """
+    from cjklib import dbconnector
+    from cjklib.reading import ReadingFactory
+
+    global _workerFactory, _workerConversion
+    if configuration is None:
+        configuration = dbconnector.getDefaultConfiguration()
+    configuration = configuration.copy()
+    configuration['readOnly'] = True
+
+    db = dbconnector.DatabaseConnector(configuration)
+    _workerFactory = ReadingFactory(dbConnectInst=db)
+    _workerConversion = (fromReading, toReading, options)
+
+def _convertChunk(chunk):
+    """
+    Converts a chunk of lines in the worker process.
+
+    :rtype: list of tuple
+    :return: pairs of converted line and error message, one of which is
+        ``None``
+    """
+    fromReading, toReading, options = _workerConversion
+    results = []
+    for line in chunk:
+        try:
+            results.append((_workerFactory.convert(line, fromReading,
+                toReading, **options), None))
+        except (exception.ConversionError, exception.DecompositionError,
+            exception.CompositionError, exception.UnsupportedError), e:
+            results.append((None, u'%s: %s'
+                % (e.__class__.__name__, unicode(e))))
+    return results
+
+def _iterChunks(lines, chunkSize):
+    """Groups lines in lists of the given size."""
+    chunk = []
+    for line in lines:
+        chunk.append(line.rstrip('\r\n'))
+        if len(chunk) >= chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def convertLines(lines, fromReading, toReading, processes=None,
+    chunkSize=CHUNK_SIZE, configuration=None, **options):
+    """
+    Converts the given lines from the source reading to the target reading
+    using a pool of worker processes.
+
+    Lines are read lazily, only a limited number of chunks is pending at any
+    time, so that input of arbitrary size can be processed. Line breaks are
+    removed from the end of each line.
+
+    :type lines: iterable of str
+    :param lines: input lines, e.g. a file object giving unicode strings
+    :type fromReading: str
+    :param fromReading: name of the source reading
+    :type toReading: str
+    :param toReading: name of the target reading
+    :type processes: int
+    :param processes: number of worker processes, by default the number of
+        CPUs, ``1`` to convert in the current process
+    :type chunkSize: int
+    :param chunkSize: number of lines handed to a worker in one go
+    :type configuration: dict
+    :param configuration: database configuration for the workers, see
+        :class:`~cjklib.dbconnector.DatabaseConnector`, by default the
+        default configuration is used
+    :param options: options passed to
+        :meth:`~cjklib.reading.ReadingFactory.convert`
+    :rtype: iterator of tuple
+    :return: input line, converted line and error message per line. Either
+        the converted line or the error message is ``None``.
+    """
+    chunks = _iterChunks(lines, chunkSize)
+
+    try:
+        import multiprocessing
+    except ImportError:
+        multiprocessing = None
+        processes = 1
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if processes == 1:
+        _initWorker(configuration, fromReading, toReading, options)
+        for chunk in chunks:
+            for line, (result, error) in zip(chunk, _convertChunk(chunk)):
+                yield line, result, error
+        return
+
+    pool = multiprocessing.Pool(processes, _initWorker,
+        (configuration, fromReading, toReading, options))
+    try:
+        # keep workers busy but don't read ahead the whole input
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.apply_async(_convertChunk, (chunk, ))))
+            if len(pending) >= 2 * processes:
+                chunk, asyncResult = pending.popleft()
+                for line, (result, error) in zip(chunk, asyncResult.get()):
+                    yield line, result, error
+
+        while pending:
+            chunk, asyncResult = pending.popleft()
+            for line, (result, error) in zip(chunk, asyncResult.get()):
+                yield line, result, error
+    finally:
+        pool.terminate()
+        pool.join()
+
+def main():
+    """
+    Main method, converts standard input to standard output and reports lines
+    that failed to convert on standard error.
+    """
+    parser = OptionParser(usage="%prog -f READING -t READING [options]",
+        description="Converts text read from standard input between readings"
+            " using several processes.")
+    parser.add_option('-f', '--from', dest='fromReading',
+        help='source reading')
+    parser.add_option('-t', '--to', dest='toReading', help='target reading')
+    parser.add_option('-p', '--processes', type='int', default=None,
+        help='number of worker processes, by default the number of CPUs')
+    parser.add_option('-c', '--chunk-size', type='int', default=CHUNK_SIZE,
+        dest='chunkSize', help='number of lines per chunk [default: %default]')
+    opts, _ = parser.parse_args()
+    if not opts.fromReading or not opts.toReading:
+        parser.error("source and target reading needed")
+
+    encoding = locale.getpreferredencoding() or 'utf8'
+    lines = (line.decode(encoding) for line in iter(sys.stdin.readline, ''))
+
+    failed = 0
+    try:
+        for lineNumber, (line, result, error) in enumerate(convertLines(lines,
+            opts.fromReading, opts.toReading, processes=opts.processes,
+            chunkSize=opts.chunkSize)):
+            if error is not None:
+                failed += 1
+                print >> sys.stderr, ("Line %d: %s" % (lineNumber + 1, error)
+                    ).encode(encoding, 'replace')
+                result = line
+            sys.stdout.write(result.encode(encoding, 'replace') + '\n')
+    except KeyboardInterrupt:
+        print >> sys.stderr, "Keyboard interrupt."
+        sys.exit(1)
+
+    if failed:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -20,7 +20,8 @@ Unit tests.
 """
 
 __all__ = ['readingoperator', 'readingconverter', 'characterlookup',
-    'dictionary', 'attr', 'DatabaseConnectorMock', 'EngineMock']
+    'dictionary', 'databaseconnector', 'importtime', 'cjkpack', 'cjknife',
+    'attr', 'DatabaseConnectorMock', 'EngineMock']
 
 from cjklib import dbconnector
 
@@ -25,11 +25,17 @@ Unit tests for :mod:`cjklib.build.builder`.
 import unittest
 import types
 import re
+import os
 import os.path
+import tempfile
+import shutil
+import zipfile
 
-from sqlalchemy import Table
+from sqlalchemy import Table, Integer, Unicode
+from sqlalchemy.exc import IntegrityError
 
 from cjklib.build import DatabaseBuilder, builder
+from cjklib import dbconnector
 from cjklib import util
 
 class TableBuilderTest:
@@ -255,6 +261,11 @@ class MysqlCharacterVariantBuilderTest(TableBuilderTest, unittest.TestCase):
     TABLE_DEPEND_OPTIONS = [(builder.UnihanBuilder, {'wideBuild': False})]
 
 
+class GlyphInformationSetBuilderTest(TableBuilderTest, unittest.TestCase):
+    BUILDER = builder.GlyphInformationSetBuilder
+    OPTIONS = [{}, {'batchSize': 1}]
+
+
 class EDICTBuilderTest(TableBuilderTest, unittest.TestCase):
     BUILDER = builder.EDICTBuilder
     OPTIONS = [{'enableFTS3': False},
@@ -285,6 +296,220 @@ class CFDICTBuilderTest(TableBuilderTest, unittest.TestCase):
         {'filePath': './test/downloads/CFDICT', 'fileType': '.zip'}]
 
 
+class _DuplicateKeyBuilder(builder.EntryGeneratorBuilder):
+    """Builder with a duplicate key inside its entries."""
+    PROVIDES = 'CjklibTestDuplicateKey'
+    COLUMNS = ['Key', 'Value']
+    PRIMARY_KEYS = ['Key']
+    COLUMN_TYPES = {'Key': Integer(), 'Value': Unicode(1)}
+
+    ENTRIES = [(1, u'a'), (2, u'b'), (3, u'c'), (2, u'd'), (4, u'e')]
+
+    def getGenerator(self):
+        return iter(self.ENTRIES)
+
+
+class EntryGeneratorBuilderTest(unittest.TestCase):
+    """Tests :class:`~cjklib.build.builder.EntryGeneratorBuilder`."""
+    def setUp(self):
+        self.db = dbconnector.DatabaseConnector('sqlite://')
+
+    def testBatches(self):
+        """Test if entries spanning several batches are inserted."""
+        for batchSize in [1, 2, 5, 10]:
+            instance = _DuplicateKeyBuilder(dbConnectInst=self.db, quiet=True,
+                batchSize=batchSize)
+            instance.ENTRIES = [entry for entry in instance.ENTRIES
+                if entry != (2, u'd')]
+            instance.build()
+
+            table = self.db.tables[instance.PROVIDES]
+            self.assertEquals(sorted(self.db.selectRows(table.select())),
+                instance.ENTRIES)
+            instance.remove()
+
+    def testDuplicateKeyInBatch(self):
+        """
+        Test if a duplicate key inside a batch is reported after inserting the
+        entries before it one by one.
+        """
+        instance = _DuplicateKeyBuilder(dbConnectInst=self.db, quiet=True,
+            batchSize=10)
+        table = instance.buildTableObject(instance.PROVIDES, instance.COLUMNS,
+            instance.COLUMN_TYPES, instance.PRIMARY_KEYS)
+        table.create()
+
+        # record the table's content when an insert fails
+        failures = []
+        execute = self.db.execute
+        def recordingExecute(request, *multiparams):
+            try:
+                return execute(request, *multiparams)
+            except IntegrityError:
+                failures.append((multiparams[0],
+                    sorted(self.db.selectRows(table.select()))))
+                raise
+        self.db.execute = recordingExecute
+
+        self.assertRaises(IntegrityError, instance.insertEntries, table,
+            instance.getGenerator())
+
+        # the entries before the duplicate are inserted and the duplicate
+        #   itself is reported
+        entry, content = failures[-1]
+        self.assertEquals(entry, {'Key': 2, 'Value': u'd'})
+        self.assertEquals(content, [(1, u'a'), (2, u'b'), (3, u'c')])
+
+
+class _ExitingBuilder(builder.TableBuilder):
+    """Builder ending its process, like a killed build process."""
+    PROVIDES = 'CjklibTestExiting'
+
+    def build(self):
+        os._exit(1)
+
+
+class ParallelDatabaseBuilderTest(unittest.TestCase):
+    """
+    Tests building tables in parallel with
+    :class:`~cjklib.build.DatabaseBuilder`.
+    """
+    TABLES = ['GlyphInformationSet', 'PinyinSyllables', 'WadeGilesSyllables']
+
+    def setUp(self):
+        handle, self.databaseFile = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.databaseFile)
+
+    def testParallelBuildEqualsSerialBuild(self):
+        """Test if a parallel build creates the same tables as a serial one."""
+        serialBuilder = DatabaseBuilder(quiet=True, databaseUrl='sqlite://',
+            rebuildExisting=True, noFail=False)
+        serialBuilder.build(self.TABLES)
+
+        parallelBuilder = DatabaseBuilder(quiet=True,
+            databaseUrl='sqlite:///%s' % self.databaseFile,
+            rebuildExisting=True, noFail=False, jobs=2)
+        parallelBuilder.build(self.TABLES)
+
+        self.assertEquals(set(serialBuilder.db.getTableNames()),
+            set(parallelBuilder.db.getTableNames()))
+        for tableName in self.TABLES:
+            serialTable = serialBuilder.db.tables[tableName]
+            parallelTable = parallelBuilder.db.tables[tableName]
+            self.assertEquals(
+                sorted(serialBuilder.db.selectRows(serialTable.select())),
+                sorted(parallelBuilder.db.selectRows(parallelTable.select())))
+
+    def testDyingBuildProcess(self):
+        """Test if a parallel build fails if a build process dies."""
+        parallelBuilder = DatabaseBuilder(quiet=True,
+            databaseUrl='sqlite:///%s' % self.databaseFile,
+            additionalBuilders=[_ExitingBuilder], rebuildExisting=True,
+            noFail=False, jobs=2)
+        self.assertRaises(Exception, parallelBuilder.build,
+            self.TABLES + [_ExitingBuilder.PROVIDES])
+
+
+class PooledDatabaseBuilderTest(unittest.TestCase):
+    """
+    Tests building tables with a pooled
+    :class:`~cjklib.dbconnector.DatabaseConnector`.
+    """
+    TABLES = ['CharacterDecomposition', 'PinyinSyllables']
+
+    def setUp(self):
+        handle, self.databaseFile = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.databaseFile)
+
+    def testPooledBuildEqualsSerialBuild(self):
+        """Test if a build in pooled mode creates the same tables."""
+        serialBuilder = DatabaseBuilder(quiet=True,
+            dbConnectInst=dbconnector.DatabaseConnector('sqlite://'),
+            rebuildExisting=True, noFail=False)
+        serialBuilder.build(self.TABLES)
+
+        db = dbconnector.DatabaseConnector({
+            'sqlalchemy.url': 'sqlite:///%s' % self.databaseFile,
+            'poolSize': 2})
+        pooledBuilder = DatabaseBuilder(quiet=True, dbConnectInst=db,
+            rebuildExisting=True, noFail=False)
+        pooledBuilder.build(self.TABLES)
+
+        for tableName in self.TABLES:
+            serialTable = serialBuilder.db.tables[tableName]
+            pooledTable = db.tables[tableName]
+            self.assertEquals(
+                sorted(serialBuilder.db.selectRows(serialTable.select())),
+                sorted(db.selectRows(pooledTable.select())))
+
+
+class UnihanGeneratorTest(unittest.TestCase):
+    """Tests :class:`~cjklib.build.builder.UnihanGenerator`."""
+    FILES = {
+        'Unihan_Readings.txt': "# comment\n\n"
+            "U+4E00\tkMandarin\tYI1\n"
+            "U+4E00\tkDefinition\tone; a, an; alone\n"
+            "U+4E8C\tkMandarin\tER4\n"
+            "U+20000\tkMandarin\tHE1\n",
+        'Unihan_Variants.txt': "U+4E01\tkSemanticVariant\tU+4E02\n"
+            "U+4E8C\tkZVariant\tU+5F0D\n",
+        }
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fileNames = []
+        for fileName, content in self.FILES.items():
+            filePath = os.path.join(self.directory, fileName)
+            f = open(filePath, 'wb')
+            f.write(content)
+            f.close()
+            self.fileNames.append(filePath)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testMergedEntries(self):
+        """Test if entries of several files are merged in code point order."""
+        generator = builder.UnihanGenerator(self.fileNames, quiet=True)
+        self.assertEquals(list(generator.generator()), [
+            (u'一', {'kMandarin': u'YI1',
+                'kDefinition': u'one; a, an; alone'}),
+            (u'丁', {'kSemanticVariant': u'U+4E02'}),
+            (u'二', {'kMandarin': u'ER4', 'kZVariant': u'U+5F0D'}),
+            (util.fromCodepoint(0x20000), {'kMandarin': u'HE1'}),
+            ])
+
+    def testUseKeys(self):
+        """Test if only requested keys and BMP characters are read."""
+        generator = builder.UnihanGenerator(self.fileNames,
+            useKeys=['kMandarin'], wideBuild=False, quiet=True)
+        self.assertEquals(list(generator.generator()), [
+            (u'一', {'kMandarin': u'YI1'}),
+            (u'二', {'kMandarin': u'ER4'}),
+            ])
+
+    def testZipFile(self):
+        """Test if entries are read from a zip file."""
+        zipPath = os.path.join(self.directory, 'Unihan.zip')
+        z = zipfile.ZipFile(zipPath, 'w', zipfile.ZIP_DEFLATED)
+        for fileName in self.fileNames:
+            z.write(fileName, os.path.basename(fileName))
+        z.close()
+
+        zipGenerator = builder.UnihanGenerator([zipPath], quiet=True)
+        fileGenerator = builder.UnihanGenerator(self.fileNames, quiet=True)
+        self.assertEquals(list(zipGenerator.generator()),
+            list(fileGenerator.generator()))
+        self.assertEquals(sorted(zipGenerator.keys()),
+            ['kDefinition', 'kMandarin', 'kSemanticVariant', 'kZVariant'])
+
+
 # Generate default test classes for TableBuilder without special definitions
 for builderClass in DatabaseBuilder.getTableBuilderClasses(
     resolveConflicts=False):
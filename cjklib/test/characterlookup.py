@@ -25,6 +25,9 @@ Unit tests for :mod:`cjklib.characterlookup`.
 import re
 import unittest
 
+from sqlalchemy import select
+from sqlalchemy.sql import and_
+
 from cjklib.reading import ReadingFactory
 from cjklib import characterlookup
 from cjklib import exception
@@ -208,6 +211,28 @@ class CharacterLookupStrokeOrderTest(CharacterLookupTest, unittest.TestCase):
             except exception.NoInformationError:
                 continue
 
+    def testDerivedStrokeOrderMatchesDecomposition(self):
+        """
+        Tests if stroke orders from table ``DerivedStrokeOrder`` match those
+        derived from the character decomposition.
+        """
+        if not self.characterLookup.hasDerivedStrokeOrder:
+            return
+        cjk = characterlookup.CharacterLookup('T', dbConnectInst=self.db)
+        cjk.hasDerivedStrokeOrder = False
+        for char in [u'说', u'國', u'瀹', u'好', u'峰', u'谢']:
+            for glyph in cjk.getCharacterGlyphs(char):
+                try:
+                    target = cjk.getStrokeOrderAbbrev(char, glyph)
+                except exception.NoInformationError:
+                    target = None
+                try:
+                    result = self.characterLookup.getStrokeOrderAbbrev(char,
+                        glyph)
+                except exception.NoInformationError:
+                    result = None
+                self.assertEquals(result, target)
+
 
 class CharacterLookupReadingMethodsTest(CharacterLookupTest, unittest.TestCase):
     """
@@ -300,6 +325,149 @@ class CharacterLookupReadingMethodsTest(CharacterLookupTest, unittest.TestCase):
                         pass
 
 
+class CharacterLookupBatchMethodsTest(CharacterLookupTest, unittest.TestCase):
+    """
+    Checks if the batch methods of the
+    :class:`~cjklib.characterlookup.CharacterLookup` class return the same
+    results as their single character counterparts.
+    """
+    CHARACTERS = u'中文字漢語學生你好我們说话台臺丢丟乾干口国國a'
+
+    BATCH_METHODS = [
+        ('getReadingForCharacters', 'getReadingForCharacter', ('Pinyin', )),
+        ('getReadingForCharacters', 'getReadingForCharacter', ('Jyutping', )),
+        ('getDefaultGlyphs', 'getDefaultGlyph', ()),
+        ('getStrokeCounts', 'getStrokeCount', ()),
+        ('getCharacterVariantsBatch', 'getCharacterVariants', ('T', )),
+        ('getCharacterKangxiRadicalIndices', 'getCharacterKangxiRadicalIndex',
+            ()),
+        ]
+
+    def testBatchMatchesSingle(self):
+        """Test if batch methods agree with the single character methods."""
+        for batchMethodName, methodName, args in self.BATCH_METHODS:
+            batchMethod = getattr(self.characterLookup, batchMethodName)
+            method = getattr(self.characterLookup, methodName)
+
+            result = batchMethod(self.CHARACTERS, *args)
+            for char in self.CHARACTERS:
+                try:
+                    target = method(char, *args)
+                except exception.NoInformationError:
+                    target = None
+                if target == []:
+                    target = None
+                self.assertEquals(result.get(char), target,
+                    "%s: target %s not reached for %s: %s"
+                        % (batchMethodName, repr(target), repr(char),
+                            repr(result.get(char))))
+
+
+class CharacterLookupComponentIndexTest(CharacterLookupTest,
+    unittest.TestCase):
+    """
+    Checks if the in-memory component index of the
+    :class:`~cjklib.characterlookup.CharacterLookup` class returns the same
+    results as the database lookup.
+    """
+    COMPONENT_CONSTRUCTS = [
+        [[u'门']],
+        [[u'木'], [u'口']],
+        [[u'氵'], [u'口'], [u'木']],
+        [[u'亻', u'人'], [u'言']],
+        [[u'米', u'木']],
+        [[u'a']],
+        ]
+
+    def testIndexMatchesDatabase(self):
+        """Test if the component index agrees with the database lookup."""
+        domains = self.characterLookup.getAvailableCharacterDomains()
+        for locale in ['T', 'C', 'J']:
+            for domain in ['Unicode', 'GB2312']:
+                if domain not in domains:
+                    continue
+                cjk = characterlookup.CharacterLookup(locale, domain,
+                    dbConnectInst=self.db)
+                cjkIndex = characterlookup.CharacterLookup(locale, domain,
+                    dbConnectInst=self.db, componentIndex=True)
+                for construct in self.COMPONENT_CONSTRUCTS:
+                    for includeAllGlyphs in [True, False]:
+                        options = {'includeAllGlyphs': includeAllGlyphs}
+                        target = cjk.getCharactersForEquivalentComponents(
+                            construct, **options)
+                        result = cjkIndex.getCharactersForEquivalentComponents(
+                            construct, **options)
+                        self.assertEquals(set(result), set(target),
+                            "target %s not reached for %s: %s"
+                                % (repr(target), repr(construct),
+                                    repr(result)))
+                        # order by stroke count
+                        strokeCounts = []
+                        for char, glyph in result:
+                            try:
+                                strokeCounts.append(
+                                    cjk.getStrokeCount(char, glyph))
+                            except exception.NoInformationError:
+                                strokeCounts.append(None)
+                        self.assertEquals(strokeCounts, sorted(strokeCounts))
+
+
+class CharacterLookupDecompositionGraphTest(CharacterLookupTest,
+    unittest.TestCase):
+    """
+    Checks if the in-memory decomposition graph of the
+    :class:`~cjklib.characterlookup.CharacterLookup` class agrees with the
+    component lookup table.
+    """
+    CHARACTERS = [u'说', u'國', u'瀹', u'好', u'峰', u'谢']
+    """Characters to decompose."""
+
+    def getTreeComponents(self, treeList):
+        """Gets all components found in the given decomposition trees."""
+        components = set()
+        for tree in treeList:
+            for entry in tree:
+                if type(entry) == type(()):
+                    char, glyph, subTreeList = entry
+                    components.add((char, glyph))
+                    components.update(self.getTreeComponents(subTreeList))
+        return components
+
+    def testGraphMatchesComponentLookup(self):
+        """Test if the decomposition graph agrees with table ComponentLookup."""
+        if not self.characterLookup.hasComponentLookup:
+            return
+        cjk = characterlookup.CharacterLookup('T', dbConnectInst=self.db)
+        graph = cjk._getDecompositionGraph()
+        table = self.db.tables['ComponentLookup']
+        for char in self.CHARACTERS:
+            for glyph in cjk.getCharacterGlyphs(char):
+                target = set(self.db.selectRows(
+                    select([table.c.Component, table.c.ComponentGlyph],
+                        and_(table.c.ChineseCharacter == char,
+                            table.c.Glyph == glyph))))
+                self.assertEquals(set(graph.getComponents(char, glyph)),
+                    target)
+                self.assertEquals(self.getTreeComponents(
+                    cjk.getDecompositionTreeList(char, glyph)), target)
+
+                # use the graph instead of the table
+                cjk.hasComponentLookup = False
+                try:
+                    for component, componentGlyph in target:
+                        if component == u'？':
+                            continue
+                        self.assert_(cjk.isComponentInCharacter(component,
+                            char, glyph, componentGlyph))
+                finally:
+                    cjk.hasComponentLookup = True
+
+    def testNoCycles(self):
+        """Test if the decomposition data is free of cycles."""
+        graph = self.characterLookup._getDecompositionGraph()
+        self.assertEquals(graph.getCycles(), [])
+
+
 class CharacterLookupReferenceTest(CharacterLookupTest):
     METHOD_NAME = None
 
@@ -343,12 +511,14 @@ class CharacterLookupFilterDomainCharactersReferenceTest(
         (('T', 'Unicode'), [
             (([u'说', u'説', u'說', u'丷', u'か', u'국', u'\U000200d3'], ), {},
                 [u'说', u'説', u'說', u'丷', u'\U000200d3']),
+            ((u'说か说\U000200d3국', ), {}, [u'说', u'说', u'\U000200d3']),
             ]),
         (('T', 'BIG5'), [
             (([u'说', u'説', u'說', u'丷', u'か', u'국'], ), {}, [u'說']),
             ]),
         (('T', 'GB2312'), [
             (([u'说', u'説', u'說', u'丷', u'か', u'국'], ), {}, [u'说']),
+            ((u'说說说か', ), {}, [u'说', u'说']),
             ]),
         ]
 
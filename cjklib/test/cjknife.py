@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# This file is part of cjklib.
+#
+# cjklib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# cjklib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with cjklib.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Unit tests for :mod:`cjklib.cjknife`.
+"""
+
+import os
+import sys
+import socket
+import shutil
+import tempfile
+import time
+import subprocess
+import unittest
+from StringIO import StringIO
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import cjklib
+from cjklib import cjknife
+from cjklib import cjknifeclient
+
+class CJKnifeServerTest(unittest.TestCase):
+    """
+    Tests calls of :mod:`cjklib.cjknifeclient` answered by
+    :func:`~cjklib.cjknife.serve`.
+    """
+    STARTUP_TIMEOUT = 30
+    """Seconds to wait for the server to listen."""
+
+    ARGV = ['-l', 'C', '-s', 'Pinyin', '-t', 'WadeGiles', '-m', 'xian1']
+    """Arguments of the call sent to the server."""
+
+    OUTPUT = u'hsien\xb9\n'
+    """Output of the call."""
+
+    def setUp(self):
+        self.hasUnixSockets = hasattr(socket, 'AF_UNIX')
+        if not self.hasUnixSockets:
+            return
+        self.tempPath = tempfile.mkdtemp()
+        self.socketPath = os.path.join(self.tempPath, 'cjknife.socket')
+
+        env = os.environ.copy()
+        libraryPath = os.path.dirname(os.path.dirname(
+            os.path.abspath(cjklib.__file__)))
+        env['PYTHONPATH'] = os.pathsep.join([libraryPath]
+            + [path for path in [env.get('PYTHONPATH')] if path])
+        self.server = subprocess.Popen([sys.executable, '-c',
+                "import sys; from cjklib import cjknife; "
+                "cjknife.serve(sys.argv[1])", self.socketPath],
+            stderr=subprocess.PIPE, env=env)
+
+        startTime = time.time()
+        while not os.path.exists(self.socketPath):
+            if (self.server.poll() is not None
+                or time.time() - startTime > self.STARTUP_TIMEOUT):
+                self.tearDown()
+                self.fail("Server not listening on '%s'" % self.socketPath)
+            time.sleep(0.01)
+
+    def tearDown(self):
+        if not self.hasUnixSockets:
+            return
+        if self.server.poll() is None:
+            self.server.terminate()
+        self.server.communicate()
+        shutil.rmtree(self.tempPath, ignore_errors=True)
+
+    def testRoundTrip(self):
+        """Test if calls are answered by the server."""
+        if not self.hasUnixSockets:
+            return
+        for _ in range(2):
+            status, output, errorOutput = cjknifeclient.callServer(self.ARGV,
+                self.socketPath, 'utf8')
+            self.assertEquals((status, errorOutput), (0, ''))
+            self.assertEquals(output.decode('utf8'), self.OUTPUT)
+
+    def testErrorStatus(self):
+        """Test if the exit status and error output of calls are returned."""
+        if not self.hasUnixSockets:
+            return
+        status, output, errorOutput = cjknifeclient.callServer(
+            ['-l', 'C', '-s', 'Foo', '-m', 'xian1'], self.socketPath, 'utf8')
+        self.assertEquals(status, 1)
+        self.assertEquals(output, '')
+        self.assert_("'Foo' is not a valid reading" in errorOutput)
+
+        status, _, errorOutput = cjknifeclient.callServer(['--server'],
+            self.socketPath, 'utf8')
+        self.assertEquals(status, 1)
+        self.assert_('already running' in errorOutput)
+
+
+class CJKnifeServerCallTest(unittest.TestCase):
+    """Tests :func:`~cjklib.cjknife._handleServerCall`."""
+    def setUp(self):
+        self.configCalls = []
+        self.getConfigSettings = cjknife.getConfigSettings
+        def getConfigSettings(*args, **options):
+            self.configCalls.append(args)
+            return self.getConfigSettings(*args, **options)
+        cjknife.getConfigSettings = getConfigSettings
+
+    def tearDown(self):
+        cjknife.getConfigSettings = self.getConfigSettings
+
+    def testConfigurationNotReadPerCall(self):
+        """Test if calls use the settings read once by the server."""
+        if not hasattr(socket, 'socketpair'):
+            return
+        client, server = socket.socketpair()
+        try:
+            for _ in range(2):
+                cjknifeclient.sendMessage(client,
+                    ['utf8'] + CJKnifeServerTest.ARGV)
+                cjknife._handleServerCall(server, {})
+                status, output, _ = cjknifeclient.receiveMessage(client)
+                self.assertEquals(status, '0')
+                self.assertEquals(output.decode('utf8'),
+                    CJKnifeServerTest.OUTPUT)
+        finally:
+            client.close()
+            server.close()
+
+        self.assertEquals(self.configCalls, [])
+
+
+class CJKnifeBatchTest(unittest.TestCase):
+    """Tests the batch mode of :mod:`cjklib.cjknife`."""
+    def setUp(self):
+        self.charInfo = cjknife.CharacterInfo(charLocale='C',
+            readingN='Pinyin')
+
+    def processBatch(self, command, lines, outputFormat):
+        """Runs the batch command and returns the output lines."""
+        outputFile = StringIO()
+        cjknife.processBatch(self.charInfo, command, 'Pinyin', 'WadeGiles',
+            inputFile=StringIO(u''.join(lines).encode('utf8')),
+            outputFile=outputFile, outputFormat=outputFormat,
+            encoding='utf8')
+        return outputFile.getvalue().decode('utf8').splitlines()
+
+    def testTSVOutput(self):
+        """Test if TSV output gives input, error and result fields."""
+        self.assertEquals(self.processBatch('convert-reading',
+                [u'xian1\n', u'xi1an1\n'], 'tsv'),
+            [u'xian1\t\thsien\xb9', u'xi1an1\t\thsi\xb9-an\xb9'])
+        self.assertEquals(self.processBatch('information',
+                [u'\u897f\n', u'xian1\n'], 'tsv'),
+            [u'\u897f\t\tU+897F\tcharacter\t146\t6\tx\u012b,xi',
+                u'xian1\tnot a single character'])
+
+    def testJSONOutput(self):
+        """Test if JSON output gives one object per input line."""
+        output = self.processBatch('information', [u'\u897f\n', u'xian1\n'],
+            'json')
+        records = [json.loads(line) for line in output]
+        self.assertEquals(len(records), 2)
+        self.assertEquals(records[0]['input'], u'\u897f')
+        self.assertEquals(records[0]['result']['radical index'], 146)
+        self.assertEquals(records[1],
+            {'input': u'xian1', 'error': u'not a single character'})
+
+    def testBatchCommands(self):
+        """Test if all batch commands are supported."""
+        for command in set(cjknife.BATCH_COMMANDS.values()):
+            output = self.processBatch(command, [u'\u897f\n'], 'json')
+            self.assertEquals(len(output), 1)
+            record = json.loads(output[0])
+            self.assertNotEquals(record.get('error'),
+                u'command not supported in batch mode',
+                "Command %s not supported" % repr(command))
+
+    def testCommandArgumentOptional(self):
+        """Test if the command's argument can be left out in batch mode."""
+        for argv in [['--batch', '-m'], ['-m', '--batch'],
+            ['--batch', '--convert-reading'], ['--batch', '-m', 'x']]:
+            stdin, stdout = sys.stdin, sys.stdout
+            sys.stdin = StringIO('xian1\n')
+            sys.stdout = StringIO()
+            try:
+                cjknife.main(['-l', 'C', '-s', 'Pinyin', '-t', 'WadeGiles']
+                    + argv, 'utf8')
+                output = sys.stdout.getvalue()
+            finally:
+                sys.stdin, sys.stdout = stdin, stdout
+            self.assertEquals(output.decode('utf8'), u'xian1\t\thsien\xb9\n',
+                "Mismatch for arguments %s" % repr(argv))
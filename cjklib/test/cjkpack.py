@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# This file is part of cjklib.
+#
+# cjklib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# cjklib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with cjklib.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Unit tests for :mod:`cjklib.cjkpack`.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from cjklib import cjkpack
+from cjklib import characterlookup
+from cjklib import exception
+from cjklib.test import NeedsDatabaseTest
+
+class CharacterPackTest(NeedsDatabaseTest, unittest.TestCase):
+    """
+    Tests if lookups answered from a :class:`~cjklib.cjkpack.CharacterPack`
+    equal those answered by the database.
+    """
+    CHARACTERS = [u'说', u'說', u'丿', u'众', u'间', u'门', u'国', u'國',
+        u'呆', u'豈', u'\U00020000', u'a']
+    """Characters to look up."""
+
+    def setUp(self):
+        NeedsDatabaseTest.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.packPath = os.path.join(self.directory, 'cjklib.pack')
+        cjkpack.exportCharacterPack(self.packPath, self.db)
+
+    def tearDown(self):
+        # don't share the pack with later tests
+        characterlookup.CharacterLookup._sharedState.get(self.db, {}).pop(
+            'characterPacks', None)
+        shutil.rmtree(self.directory)
+
+    def getResult(self, method, *args):
+        """Calls the given method returning the result or exception class."""
+        try:
+            return method(*args)
+        except exception.NoInformationError, e:
+            return e.__class__
+
+    def testVersion(self):
+        """Test if packs of other versions are rejected."""
+        f = open(self.packPath, 'r+b')
+        f.seek(8)
+        f.write('\xff\xff\xff\xff')
+        f.close()
+        self.assertRaises(ValueError, cjkpack.CharacterPack, self.packPath)
+
+    def testLookupEqualsDatabase(self):
+        """Test if lookups from the pack equal the database's results."""
+        for locale in 'TCJKV':
+            dbLookup = characterlookup.CharacterLookup(locale,
+                dbConnectInst=self.db)
+            packLookup = characterlookup.CharacterLookup(locale,
+                dbConnectInst=self.db, characterPack=self.packPath)
+            self.assert_(packLookup.characterPack is not None)
+
+            for methodName in ['getCharacterGlyphs', 'getDefaultGlyph',
+                'getStrokeCount', 'getCharacterKangxiRadicalIndex',
+                'getCharacterKangxiResidualStrokeCount',
+                'getAllCharacterVariants']:
+                for char in self.CHARACTERS:
+                    self.assertEquals(
+                        self.getResult(getattr(packLookup, methodName), char),
+                        self.getResult(getattr(dbLookup, methodName), char),
+                        "Different result for %s(%s) under locale %s"
+                            % (methodName, repr(char), locale))
+
+            for variantType in 'CMPZST':
+                for char in self.CHARACTERS:
+                    self.assertEquals(
+                        packLookup.getCharacterVariants(char, variantType),
+                        dbLookup.getCharacterVariants(char, variantType))
+
+            self.assertEquals(packLookup.getStrokeCounts(self.CHARACTERS),
+                dbLookup.getStrokeCounts(self.CHARACTERS))
+            self.assertEquals(
+                packLookup.getCharacterKangxiRadicalIndices(self.CHARACTERS),
+                dbLookup.getCharacterKangxiRadicalIndices(self.CHARACTERS))
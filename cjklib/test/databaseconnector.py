@@ -0,0 +1,224 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# This file is part of cjklib.
+#
+# cjklib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# cjklib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with cjklib.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Unit tests for :mod:`cjklib.dbconnector`.
+"""
+
+import unittest
+import threading
+import tempfile
+import os
+
+from sqlalchemy import select, Table, Column, Integer, Unicode
+from sqlalchemy.sql import text
+from sqlalchemy.exc import OperationalError
+
+from cjklib import dbconnector
+
+class DatabaseConnectorPoolTest(unittest.TestCase):
+    """
+    Tests the pooled mode of :class:`~cjklib.dbconnector.DatabaseConnector`.
+    """
+    def setUp(self):
+        configuration = dbconnector.getDefaultConfiguration()
+        configuration['poolSize'] = 2
+        self.db = dbconnector.DatabaseConnector(configuration)
+
+    def testConnectionPerThread(self):
+        """Test if each thread uses its own connection."""
+        connections = []
+        def getConnection():
+            connections.append(self.db.connection)
+            self.db.releaseConnection()
+
+        thread = threading.Thread(target=getConnection)
+        thread.start()
+        thread.join()
+
+        self.assert_(self.db.connection is self.db.connection)
+        self.assert_(connections[0] is not self.db.connection)
+
+    def testConcurrentSelect(self):
+        """Test if selects from several threads give the same results."""
+        table = self.db.tables['PinyinSyllables']
+        request = select([table.c.Pinyin]).order_by(table.c.Pinyin)
+        expected = self.db.selectScalars(request)
+
+        results = []
+        def selectRows():
+            for _ in range(10):
+                results.append(self.db.selectScalars(request))
+            self.db.releaseConnection()
+
+        threads = [threading.Thread(target=selectRows) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEquals(len(results), 40)
+        for result in results:
+            self.assertEquals(result, expected)
+
+    def testSelectReturnsConnection(self):
+        """
+        Test if a select returns its connection to the pool if the thread
+        holds none.
+        """
+        self.db.releaseConnection()
+        table = self.db.tables['PinyinSyllables']
+        self.db.selectScalars(select([table.c.Pinyin]))
+        self.db.selectRow(select([table.c.Pinyin]).limit(1))
+        self.assertEquals(self.db.engine.pool.checkedout(), 0)
+
+        # a thread's own connection is used, e.g. for its transaction
+        self.assert_(not self.db.connection.closed)
+        self.db.selectScalars(select([table.c.Pinyin]))
+        self.assertEquals(self.db.engine.pool.checkedout(), 1)
+        self.db.releaseConnection()
+
+    def testAttachedOnEveryConnection(self):
+        """Test if attached databases are available in every thread."""
+        handle, databaseFile = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        try:
+            db = dbconnector.DatabaseConnector({
+                'sqlalchemy.url': 'sqlite:///%s' % databaseFile,
+                'attach': ['cjklib'], 'poolSize': 2})
+            self.assert_(db.attached)
+
+            found = []
+            def hasTable():
+                table = db.tables['PinyinSyllables']
+                found.append(
+                    db.selectScalar(select([table.c.Pinyin]).limit(1)))
+                db.releaseConnection()
+
+            thread = threading.Thread(target=hasTable)
+            thread.start()
+            thread.join()
+
+            self.assert_(found[0])
+        finally:
+            os.remove(databaseFile)
+
+    def testInMemoryDatabase(self):
+        """Test if an in-memory database is rejected in pooled mode."""
+        self.assertRaises(ValueError, dbconnector.DatabaseConnector,
+            {'sqlalchemy.url': 'sqlite://', 'poolSize': 2})
+
+
+class DatabaseConnectorReadOnlyTest(unittest.TestCase):
+    """
+    Tests the read-only and memory-mapped settings of
+    :class:`~cjklib.dbconnector.DatabaseConnector`.
+    """
+    def setUp(self):
+        configuration = dbconnector.getDefaultConfiguration()
+        configuration.update({'readOnly': 'True', 'mmapSize': '1048576',
+            'cacheSize': '-1024'})
+        self.db = dbconnector.DatabaseConnector(configuration)
+
+    def testPragmas(self):
+        """Test if settings are applied to the connection."""
+        self.assertEquals(self.db.selectScalar(text("PRAGMA query_only")), 1)
+        self.assertEquals(self.db.selectScalar(text("PRAGMA cache_size")),
+            -1024)
+        mmapSize = self.db.selectScalar(text("PRAGMA mmap_size"))
+        # SQLite might be compiled with a lower limit
+        self.assert_(mmapSize is None or 0 < mmapSize <= 1048576)
+
+    def testWriteFails(self):
+        """Test if writing to the database is rejected."""
+        self.assertRaises(OperationalError, self.db.execute,
+            text("CREATE TABLE cjklib_readonly_test (a INTEGER)"))
+
+
+class DatabaseConnectorQueryCacheTest(unittest.TestCase):
+    """
+    Tests the query cache of :class:`~cjklib.dbconnector.DatabaseConnector`.
+    """
+    def setUp(self):
+        self.db = dbconnector.DatabaseConnector({'sqlalchemy.url': 'sqlite://',
+            'attach': [], 'queryCacheSize': 2})
+        self.table = Table('CacheTest', self.db.metadata,
+            Column('Key', Integer), Column('Value', Unicode(10)))
+        self.table.create()
+        self.db.execute(self.table.insert(), [{'Key': 1, 'Value': u'a'},
+            {'Key': 2, 'Value': u'b'}])
+
+    def testCachedResults(self):
+        """Test if repeated selects are served from the cache."""
+        request = select([self.table.c.Value]).where(self.table.c.Key == 1)
+        self.assertEquals(self.db.selectScalar(request), u'a')
+        self.assertEquals(self.db.selectScalar(request), u'a')
+        statistics = self.db.getQueryCacheStatistics()
+        self.assertEquals(statistics['misses'], 1)
+        self.assertEquals(statistics['hits'], 1)
+        self.assertEquals(statistics['entries'], 1)
+
+        # different bind parameters are cached separately
+        request = select([self.table.c.Value]).where(self.table.c.Key == 2)
+        self.assertEquals(self.db.selectScalar(request), u'b')
+        self.assertEquals(self.db.getQueryCacheStatistics()['misses'], 2)
+
+    def testFetchKinds(self):
+        """Test if different select methods on one request are cached apart."""
+        self.db = dbconnector.DatabaseConnector({'sqlalchemy.url': 'sqlite://',
+            'attach': [], 'queryCacheSize': 10})
+        self.table.tometadata(self.db.metadata).create()
+        self.db.execute(self.table.insert(), [{'Key': 1, 'Value': u'a'}])
+
+        request = select([self.table.c.Value]).where(self.table.c.Key == 1)
+        for _ in range(2):
+            self.assertEquals(self.db.selectScalars(request), [u'a'])
+            self.assertEquals(self.db.selectScalar(request), u'a')
+            self.assertEquals(self.db.selectRow(request), (u'a', ))
+            self.assertEquals(self.db.selectRows(request), [(u'a', )])
+        statistics = self.db.getQueryCacheStatistics()
+        self.assertEquals(statistics['misses'], 4)
+        self.assertEquals(statistics['hits'], 4)
+
+    def testEviction(self):
+        """Test if least recently used results are dropped."""
+        for key in (1, 2, 1, 3, 1):
+            self.db.selectScalar(
+                select([self.table.c.Value]).where(self.table.c.Key == key))
+        statistics = self.db.getQueryCacheStatistics()
+        self.assertEquals(statistics['entries'], 2)
+        self.assertEquals(statistics['hits'], 2)
+        self.assertEquals(statistics['misses'], 3)
+
+    def testResultCopied(self):
+        """Test if changing a returned list doesn't change the cache."""
+        request = select([self.table.c.Value])
+        self.db.selectScalars(request).append(u'c')
+        self.assertEquals(sorted(self.db.selectScalars(request)), [u'a', u'b'])
+
+    def testInvalidation(self):
+        """Test if changing a table removes its cached results."""
+        request = select([self.table.c.Value]).order_by(self.table.c.Key)
+        self.assertEquals(self.db.selectScalars(request), [u'a', u'b'])
+
+        self.db.execute(self.table.insert().values(Key=3, Value=u'c'))
+        self.assertEquals(self.db.selectScalars(request), [u'a', u'b', u'c'])
+
+        self.db.connection.execute(self.table.delete())
+        self.assertEquals(self.db.selectScalars(request), [u'a', u'b', u'c'])
+        self.db.invalidateQueryCache(['CacheTest'])
+        self.assertEquals(self.db.selectScalars(request), [])
@@ -27,6 +27,9 @@ import os
 import new
 import unittest
 
+from sqlalchemy import select
+from sqlalchemy.sql import operators
+
 from cjklib.dictionary import (getAvailableDictionaries, getDictionaryClass,
     getDictionary)
 from cjklib.dictionary import search as searchstrategy
@@ -93,6 +96,12 @@ class DictionaryResultTest(DictionaryTest):
     DICTIONARY_OPTIONS = {}
     """Options for the dictionary instance passed when constructing object."""
 
+    BUILDER_OPTIONS = {}
+    """Options for the builder of the dictionary."""
+
+    ANNOTATION_RESULTS = []
+    """List of text/options/span tuples for annotation."""
+
     class _ContentGenerator(object):
         def getGenerator(self):
             for line in self.content:
@@ -111,7 +120,7 @@ class DictionaryResultTest(DictionaryTest):
 
         self.builder = DatabaseBuilder(quiet=True, dbConnectInst=self.db,
             additionalBuilders=[contentBuilder], prefer=["SimpleDictBuilder"],
-            rebuildExisting=True, noFail=False)
+            rebuildExisting=True, noFail=False, **self.BUILDER_OPTIONS)
         self.builder.build(self.DICTIONARY)
         assert self.db.mainHasTable(self.DICTIONARY)
 
@@ -140,7 +149,7 @@ class DictionaryResultTest(DictionaryTest):
                 for index in sorted(indices)) + ']'
 
         for methodName, options, requests in self.ACCESS_RESULTS:
-            options = dict(options) or {}
+            options = dict(options)
             method = getattr(self.dictionary, methodName)
             for request, targetResultIndices in requests:
                 results = method(request, **options)
@@ -152,6 +161,115 @@ class DictionaryResultTest(DictionaryTest):
                             % (resultPrettyPrint(targetResultIndices),
                                 resultPrettyPrint(resultIndices))))
 
+    def testLimitedResults(self):
+        """Test if a ``limit`` yields as many results as possible."""
+        for methodName, options, requests in self.ACCESS_RESULTS:
+            options = dict(options)
+            method = getattr(self.dictionary, methodName)
+            for request, targetResultIndices in requests:
+                for limit in range(1, len(targetResultIndices) + 2):
+                    results = list(method(request, limit=limit, **options))
+                    self.assertEquals(len(results),
+                        min(limit, len(targetResultIndices)),
+                        "Wrong result count for method %s and string %s"
+                            % (repr(methodName), repr(request))
+                        + " (limit %d, options %s)" % (limit, repr(options)))
+
+    def testCompiledRequests(self):
+        """Test if reused compiled search requests give the same results."""
+        uncachedDictionary = self.dictionaryClass(dbConnectInst=self.db,
+            **self.DICTIONARY_OPTIONS)
+        for methodName, options, requests in self.ACCESS_RESULTS:
+            options = dict(options)
+            for request, _ in requests[::-1] + requests:
+                uncachedDictionary._searchRequests.clear()
+                self.assertEquals(
+                    sorted(getattr(self.dictionary, methodName)(request,
+                        **options)),
+                    sorted(getattr(uncachedDictionary, methodName)(request,
+                        **options)),
+                    "Mismatch for method %s and string %s (options %s)"
+                        % (repr(methodName), repr(request), repr(options)))
+
+        if self.ACCESS_RESULTS:
+            self.assert_(len(self.dictionary._searchRequests) > 0)
+
+    def testAnnotation(self):
+        """Test annotation of text with dictionary entries."""
+        for text, options, targetSpans in self.ANNOTATION_RESULTS:
+            options = dict(options)
+            annotation = self.dictionary.annotate(text, **options)
+            spans = [(start, end, sorted(self.resultIndexMap[tuple(e)]
+                    for e in entries))
+                for start, end, entries in annotation]
+            self.assertEquals(spans, targetSpans,
+                "Mismatch for text %s (options %s)" % (repr(text),
+                    repr(options))
+                + "\nShould be\n%s\nbut is\n%s" % (repr(targetSpans),
+                    repr(spans)))
+
+            self.assertEquals(self.dictionary.getHeadwordSpans(text,
+                **options), [(start, end) for start, end, _ in targetSpans])
+
+    def testPaging(self):
+        """Test paging through results with continuation tokens."""
+        searchByMap = {'getFor': None, 'getForHeadword': 'headword',
+            'getForReading': 'reading', 'getForTranslation': 'translation'}
+        for methodName, options, requests in self.ACCESS_RESULTS:
+            options = dict(options)
+            searchBy = searchByMap[methodName]
+            for request, targetResultIndices in requests:
+                resultIndices = []
+                continuation = None
+                requestCount = None
+                while True:
+                    results, continuation = self.dictionary.getPage(request,
+                        1, searchBy=searchBy, continuation=continuation,
+                        **options)
+                    self.assert_(len(results) <= 1)
+                    # no token is returned for an empty page to follow
+                    if continuation is not None or resultIndices:
+                        self.assertEquals(len(results), 1)
+                    # later pages reuse the requests compiled for the first
+                    if requestCount is None:
+                        requestCount = len(self.dictionary._searchRequests)
+                    self.assertEquals(len(self.dictionary._searchRequests),
+                        requestCount)
+                    resultIndices.extend(self.resultIndexMap[tuple(e)]
+                        for e in results)
+                    if continuation is None:
+                        break
+                self.assertEquals(sorted(resultIndices),
+                    sorted(targetResultIndices),
+                    "Mismatch paging method %s and string %s (options %s)"
+                        % (repr(methodName), repr(request), repr(options)))
+
+                # token of other search is rejected
+                if len(targetResultIndices) > 1:
+                    _, continuation = self.dictionary.getPage(request, 1,
+                        searchBy=searchBy, **options)
+                    self.assertRaises(ValueError, self.dictionary.getPage,
+                        request + u'%', 1, searchBy=searchBy,
+                        continuation=continuation, **options)
+
+
+class FTS3DictionaryResultTest(object):
+    """
+    Tests results of dictionary built with full text search support. Needs to
+    be combined with a :class:`DictionaryResultTest`.
+    """
+    BUILDER_OPTIONS = {'enableFTS3': True}
+
+    def testFullTextSearchUsed(self):
+        """Test if translation search uses full text search."""
+        self.assert_(self.db.mainHasTable(self.table + '_Text'))
+
+        dictionaryTable = self.db.tables[self.table]
+        for searchStr in (u'to guide', u'Tokyo%', u'%Berlin Wall'):
+            clause = self.dictionary.translationSearchStrategy.getWhereClause(
+                dictionaryTable.c.Translation, searchStr)
+            self.assert_(clause.operator is operators.match_op)
+
 
 class FullDictionaryTest(DictionaryTest):
     """Base class for testing a full database instance."""
@@ -213,6 +331,18 @@ class EDICTDictionaryResultTest(DictionaryResultTest, unittest.TestCase):
         ('getForTranslation', (), [(u'tokyo%', [0, 1, 2])]),
     ]
 
+    ANNOTATION_RESULTS = [
+        (u'東京都と頭胸部', (), [(0, 3, [2]), (4, 7, [3])]),
+        (u'東京都と頭胸部', (('allMatches', True), ),
+            [(0, 2, [0]), (0, 3, [2]), (4, 7, [3])]),
+        (u'とうきょう', (), []),
+    ]
+
+
+class EDICTFTS3DictionaryResultTest(FTS3DictionaryResultTest,
+    EDICTDictionaryResultTest):
+    pass
+
 
 class CEDICTMetaTest(DictionaryMetaTest, unittest.TestCase):
     DICTIONARY = 'CEDICT'
@@ -254,6 +384,10 @@ class CEDICTDictionaryResultTest(DictionaryResultTest, unittest.TestCase):
             [(u'zhi导%', [1, 4, 5, 6, 7])]),
         ('getFor', (), [(u'個', [8])]),
         ('getFor', (('toneMarkType', 'numbers'),), [(u'xian1', [9, 10])]),
+        ('getFor', (('toneMarkType', 'numbers'),), [(u'xian', [9, 10])]),
+        ('getFor', (('toneMarkType', 'numbers'),), [(u'xi an', [9])]),
+        ('getFor', (('toneMarkType', 'numbers'),), [(u'Xi an1', [9])]),
+        ('getFor', (('toneMarkType', 'numbers'),), [(u'c pan', [11])]),
         ('getFor', (('toneMarkType', 'numbers'),), [(u'C pan', [11])]),
         ('getFor', (('toneMarkType', 'numbers'),), [(u'Ｃpan', [11])]),
         ('getFor', (('toneMarkType', 'numbers'),), [(u'Ｃ pan', [11])]),
@@ -265,6 +399,29 @@ class CEDICTDictionaryResultTest(DictionaryResultTest, unittest.TestCase):
         ('getFor', (('toneMarkType', 'numbers'),), [(u'\U000289c0bo1', [13])]),
         ]
 
+    ANNOTATION_RESULTS = [
+        (u'我知道指导教授是西安人', (),
+            [(1, 3, [0]), (3, 7, [6]), (8, 10, [9])]),
+        (u'我知道指導教授是西安人', (('allMatches', True), ),
+            [(1, 3, [0]), (3, 5, [4]), (3, 7, [6]), (8, 10, [9])]),
+    ]
+
+    def testPlainReading(self):
+        """Test if the reading without tonal information is provided."""
+        table = self.db.tables[self.table]
+        self.assert_('ReadingPlain' in table.c)
+
+        plainReadings = dict(self.db.selectRows(
+            select([table.c.HeadwordSimplified, table.c.ReadingPlain])))
+        self.assertEquals(plainReadings[u'直到'], u'zhi dao')
+        self.assertEquals(plainReadings[u'西安'], u'xi an')
+        self.assertEquals(plainReadings[u'Ｃ盘'], u'c pan')
+
+
+class CEDICTFTS3DictionaryResultTest(FTS3DictionaryResultTest,
+    CEDICTDictionaryResultTest):
+    pass
+
 
 class CEDICTGRMetaTest(DictionaryMetaTest, unittest.TestCase):
     DICTIONARY = 'CEDICTGR'
@@ -318,6 +475,11 @@ class HanDeDictDictionaryResultTest(DictionaryResultTest, unittest.TestCase):
         ]
 
 
+class HanDeDictFTS3DictionaryResultTest(FTS3DictionaryResultTest,
+    HanDeDictDictionaryResultTest):
+    pass
+
+
 class CFDICTMetaTest(DictionaryMetaTest, unittest.TestCase):
     DICTIONARY = 'CFDICT'
 
@@ -347,6 +509,11 @@ class CFDICTDictionaryResultTest(DictionaryResultTest, unittest.TestCase):
         ]
 
 
+class CFDICTFTS3DictionaryResultTest(FTS3DictionaryResultTest,
+    CFDICTDictionaryResultTest):
+    pass
+
+
 class ParameterTest(DictionaryResultTest):
     PARAMETER_DESC = None
 
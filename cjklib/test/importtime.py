@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# This file is part of cjklib.
+#
+# cjklib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# cjklib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with cjklib.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Checks that importing :mod:`cjklib` and :mod:`cjklib.cjknife` defers heavy
+modules to their first use, and benchmarks the import time of
+:mod:`cjklib.cjknife`.
+"""
+
+import os
+import sys
+import unittest
+import subprocess
+
+import cjklib
+from cjklib.test import attr
+
+class ImportTimeTest(unittest.TestCase):
+    """
+    Checks that heavy modules are imported on first use only and that
+    importing the command line interface stays within its budget.
+    """
+    IMPORT_TIME_BUDGET = 1.0
+    """
+    Maximum time in seconds for ``import cjklib.cjknife`` in a fresh
+    interpreter, generous to allow for slow machines.
+    """
+
+    REPETITIONS = 3
+    """Number of measurements, the fastest one is compared to the budget."""
+
+    LAZY_MODULES = ['cjklib.characterlookup', 'cjklib.reading.operator',
+        'cjklib.reading.converter', 'cjklib.dictionary']
+    """Modules that need to be imported on first use only."""
+
+    def runPython(self, code):
+        """
+        Runs the given code in a fresh interpreter using this copy of cjklib
+        and returns its output.
+        """
+        env = os.environ.copy()
+        libraryPath = os.path.dirname(os.path.dirname(
+            os.path.abspath(cjklib.__file__)))
+        env['PYTHONPATH'] = os.pathsep.join([libraryPath]
+            + [path for path in [env.get('PYTHONPATH')] if path])
+
+        process = subprocess.Popen([sys.executable, '-c', code],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        output, error = process.communicate()
+        self.assertEquals(process.returncode, 0, error)
+        return output
+
+    def testLazyModules(self):
+        """Test if importing cjknife skips modules only needed later."""
+        output = self.runPython("import sys; import cjklib.cjknife; "
+            "print ' '.join(sys.modules.keys())")
+        loadedModules = set(output.split())
+
+        for moduleName in self.LAZY_MODULES:
+            self.assert_(moduleName not in loadedModules,
+                "Module %s imported by cjknife on startup" % moduleName)
+
+    def testReadingFactoryLazyOperators(self):
+        """
+        Test if creating a ReadingFactory doesn't import operators and
+        converters.
+        """
+        output = self.runPython("import sys; "
+            "from cjklib.reading import ReadingFactory; ReadingFactory(); "
+            "print ' '.join(sys.modules.keys())")
+        loadedModules = set(output.split())
+
+        self.assert_('cjklib.reading.operator' not in loadedModules)
+        self.assert_('cjklib.reading.converter' not in loadedModules)
+
+    def testPackageImport(self):
+        """Test if importing cjklib skips modules only needed later."""
+        output = self.runPython("import sys; import cjklib; "
+            "print ' '.join(sys.modules.keys())")
+        loadedModules = set(output.split())
+
+        for moduleName in self.LAZY_MODULES:
+            self.assert_(moduleName not in loadedModules,
+                "Module %s imported by cjklib on startup" % moduleName)
+
+    @attr('slow')
+    def testImportTimeBudget(self):
+        """Test if importing cjknife stays within the time budget."""
+        timings = []
+        for _ in range(self.REPETITIONS):
+            output = self.runPython("import time; startTime = time.time(); "
+                "import cjklib.cjknife; print time.time() - startTime")
+            timings.append(float(output.strip()))
+
+        self.assert_(min(timings) <= self.IMPORT_TIME_BUDGET,
+            "Importing cjknife took %.3fs, budget is %.3fs"
+                % (min(timings), self.IMPORT_TIME_BUDGET))
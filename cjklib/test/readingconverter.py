@@ -32,6 +32,7 @@ import types
 import unittest
 
 from cjklib.reading import ReadingFactory, converter, operator
+from cjklib.reading.pipeline import convertLines
 from cjklib import exception
 from cjklib.test import NeedsDatabaseTest, attr
 
@@ -381,6 +382,104 @@ class ReadingConverterTestCaseCheck(NeedsDatabaseTest, unittest.TestCase):
         return testClasses
 
 
+class ReadingFactoryResultCacheTest(NeedsDatabaseTest, unittest.TestCase):
+    """Checks the result cache of :class:`~cjklib.reading.ReadingFactory`."""
+    def setUp(self):
+        NeedsDatabaseTest.setUp(self)
+        self.f = ReadingFactory(dbConnectInst=self.db, resultCacheSize=2)
+
+    def tearDown(self):
+        self.f.setResultCacheSize(None)
+
+    def testConvert(self):
+        """Test if conversion results are cached."""
+        result = self.f.convert(u'nǐhǎo', 'Pinyin', 'WadeGiles')
+        self.assertEquals(self.f.convert(u'nǐhǎo', 'Pinyin', 'WadeGiles'),
+            result)
+        statistics = self.f.getResultCacheStatistics()
+        self.assertEquals(statistics['hits'], 1)
+        self.assertEquals(statistics['misses'], 1)
+        self.assertEquals(statistics['entries'], 1)
+
+        # different options make a different key
+        self.f.convert(u'nǐhǎo', 'Pinyin', 'WadeGiles',
+            targetOptions={'toneMarkType': 'numbers'})
+        self.assertEquals(self.f.getResultCacheStatistics()['misses'], 2)
+
+        # cache is shared between factories
+        f = ReadingFactory(dbConnectInst=self.db)
+        f.convert(u'nǐhǎo', 'Pinyin', 'WadeGiles')
+        self.assertEquals(self.f.getResultCacheStatistics()['hits'], 2)
+
+    def testDecompose(self):
+        """Test if cached decompositions are not changed by callers."""
+        entities = self.f.decompose(u'tiān\'ānmén', 'Pinyin')
+        entities.append('x')
+        self.assertEquals(self.f.decompose(u'tiān\'ānmén', 'Pinyin'),
+            [u'tiān', u"'", u'ān', u'mén'])
+        self.assertEquals(self.f.getResultCacheStatistics()['hits'], 1)
+
+    def testEviction(self):
+        """Test if the least recently used result is dropped."""
+        for string in (u'nǐ', u'hǎo', u'nǐ', u'ma'):
+            self.f.convert(string, 'Pinyin', 'WadeGiles')
+        self.assertEquals(self.f.getResultCacheStatistics()['entries'], 2)
+        self.f.convert(u'nǐ', 'Pinyin', 'WadeGiles')
+        self.assertEquals(self.f.getResultCacheStatistics()['hits'], 2)
+        self.f.convert(u'hǎo', 'Pinyin', 'WadeGiles')
+        self.assertEquals(self.f.getResultCacheStatistics()['hits'], 2)
+
+    def testClearCache(self):
+        """Test if clearing the cache keeps its size."""
+        self.f.convert(u'nǐhǎo', 'Pinyin', 'WadeGiles')
+        self.f.clearCache()
+        self.assertEquals(self.f.getResultCacheStatistics(),
+            {'hits': 0, 'misses': 0, 'entries': 0, 'size': 2})
+
+        self.f.setResultCacheSize(None)
+        self.assertEquals(self.f.getResultCacheStatistics(), None)
+
+
+class ConvertLinesTest(NeedsDatabaseTest, unittest.TestCase):
+    """Checks the conversion pipeline of :mod:`cjklib.reading.pipeline`."""
+    LINES = [u'nǐhǎo\n', u'xièxie\n', u'nǐhǎo, zàijiàn\n', u'nǐxyz\n',
+        u'bù kèqi']
+
+    def setUp(self):
+        NeedsDatabaseTest.setUp(self)
+        self.f = ReadingFactory(dbConnectInst=self.db)
+
+    def checkResults(self, results):
+        self.assertEquals([line for line, _, _ in results],
+            [line.rstrip('\n') for line in self.LINES])
+        for line, result, error in results:
+            try:
+                expected = self.f.convert(line, 'Pinyin', 'WadeGiles')
+                self.assertEquals(result, expected)
+                self.assertEquals(error, None)
+            except (exception.ConversionError, exception.DecompositionError,
+                exception.CompositionError):
+                self.assertEquals(result, None)
+                self.assert_(error)
+
+    def testInProcess(self):
+        """Test if lines are converted in order in the current process."""
+        self.checkResults(list(convertLines(iter(self.LINES), 'Pinyin',
+            'WadeGiles', processes=1, chunkSize=2)))
+
+    @attr('slow')
+    def testProcessPool(self):
+        """Test if lines are converted in order by worker processes."""
+        lines = self.LINES * 10
+        serialResults = list(convertLines(iter(lines), 'Pinyin', 'WadeGiles',
+            processes=1, chunkSize=3))
+        self.checkResults(serialResults[:len(self.LINES)])
+
+        results = list(convertLines(iter(lines), 'Pinyin', 'WadeGiles',
+            processes=2, chunkSize=3))
+        self.assertEquals(results, serialResults)
+
+
 class ReadingConverterReferenceTest(ReadingConverterTest):
     """
     Base class for testing of references against
@@ -26,6 +26,8 @@ import re
 import types
 import unittest
 import unicodedata
+import shutil
+import tempfile
 
 from cjklib.reading import ReadingFactory
 from cjklib import exception
@@ -182,6 +184,57 @@ class ReadingOperatorConsistencyTest(ReadingOperatorTest):
         # test instantiation of default options
         self.readingOperatorClass(**readingDialect)
 
+    def testSnapshot(self):
+        """
+        Test if tables loaded from a snapshot equal those computed from the
+        database.
+        """
+        if not self.readingOperatorClass.SNAPSHOT_ATTRIBUTES:
+            return
+        if self.db.getDatabaseFingerprint() is None:
+            # snapshots only supported for database files
+            return
+
+        forms = []
+        forms.extend(self.DIALECTS)
+        if {} not in forms:
+            forms.append({})
+
+        snapshotPath = tempfile.mkdtemp()
+        oldSnapshotPath = self.db.snapshotPath
+        try:
+            for dialect in forms:
+                self.db.snapshotPath = None
+                computed = self.readingOperatorClass(dbConnectInst=self.db,
+                    **dialect)
+
+                self.db.snapshotPath = snapshotPath
+                self.readingOperatorClass(dbConnectInst=self.db,
+                    **dialect).updateSnapshot()
+                loaded = self.readingOperatorClass(dbConnectInst=self.db,
+                    **dialect)
+                self.assert_(loaded._snapshotLoaded,
+                    "Snapshot not loaded" \
+                    + ' (reading %s, dialect %s)' \
+                        % (self.READING_NAME, dialect))
+                self.assert_(not loaded.updateSnapshot())
+
+                for name in self.readingOperatorClass.SNAPSHOT_ATTRIBUTES:
+                    if isinstance(getattr(self.readingOperatorClass, name),
+                        property):
+                        computedValue = getattr(computed, name)
+                        loadedValue = getattr(loaded, name)
+                    else:
+                        computedValue = getattr(computed, name)()
+                        loadedValue = getattr(loaded, name)()
+                    self.assertEquals(computedValue, loadedValue,
+                        "Snapshot value for %s differs" % repr(name) \
+                        + ' (reading %s, dialect %s)' \
+                            % (self.READING_NAME, dialect))
+        finally:
+            self.db.snapshotPath = oldSnapshotPath
+            shutil.rmtree(snapshotPath)
+
     @attr('quiteslow')
     def testReadingCharacters(self):
         """
@@ -918,3 +918,88 @@ else:
         def __ne__(self, other):
             return not self == other
 
+
+
+class LRUDict(object):
+    """
+    A dict of limited size, dropping the least recently used entry when full.
+
+    .. versionadded:: 0.3.3
+    """
+    def __init__(self, maxsize):
+        if maxsize < 1:
+            raise ValueError("Invalid maximum size %r" % maxsize)
+        self.maxsize = maxsize
+        self.clear()
+
+    def clear(self):
+        self.__end = end = []
+        end += [None, None, end, end]   # sentinel node, most recent first
+        self.__map = {}                  # key --> [key, value, prev, next]
+
+    def __len__(self):
+        return len(self.__map)
+
+    def __contains__(self, key):
+        return key in self.__map
+
+    def __getitem__(self, key):
+        link = self.__map[key]
+        # move to front
+        _, _, prev, next = link
+        prev[3] = next
+        next[2] = prev
+        end = self.__end
+        first = end[3]
+        link[2] = end
+        link[3] = first
+        first[2] = end[3] = link
+        return link[1]
+
+    def get(self, key, default=None):
+        if key in self.__map:
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        if key in self.__map:
+            self.__map[key][1] = value
+            self[key]
+            return
+
+        if len(self.__map) >= self.maxsize:
+            # drop least recently used
+            del self[self.__end[2][0]]
+        end = self.__end
+        first = end[3]
+        first[2] = end[3] = self.__map[key] = [key, value, end, first]
+
+    def __delitem__(self, key):
+        _, _, prev, next = self.__map.pop(key)
+        prev[3] = next
+        next[2] = prev
+
+    def pop(self, key, *default):
+        if key not in self.__map and default:
+            return default[0]
+        value = self.__map[key][1]
+        del self[key]
+        return value
+
+    def __iter__(self):
+        """Iterates keys starting with the most recently used."""
+        end = self.__end
+        curr = end[3]
+        while curr is not end:
+            yield curr[0]
+            curr = curr[3]
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(key, self.__map[key][1]) for key in self]
+
+    def __repr__(self):
+        return '%s(%d, %r)' % (self.__class__.__name__, self.maxsize,
+            self.items())
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Gives timing statistics for the share of request compilation in the per-call
+time of character and dictionary lookups.
+
+Lookups in :class:`~cjklib.characterlookup.CharacterLookup` and the
+EDICT-style dictionaries compile their SQL requests once and later only bind
+new values. For the "recompiled" column the cache of compiled requests is
+cleared before every call, so that each lookup builds and compiles its request
+again. This is not the code path of earlier releases, which e.g. built
+different requests, so the numbers only show what compilation costs in the
+current code, not a speedup over earlier versions.
+
+Run with the default database::
+
+    python examples/lookupspeed.py
+
+License: MIT License
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+from optparse import OptionParser
+
+import cjklib
+from cjklib import dictionary
+from cjklib import dbconnector
+from cjklib import exception
+from cjklib.characterlookup import CharacterLookup
+
+CHARACTERS = [u'说', u'國', u'门', u'众', u'日', u'本', u'中', u'文', u'学',
+              u'生']
+
+HEADWORDS = [u'北京', u'東京', u'南京', u'知识', u'中文', u'学生']
+
+def timeCalls(function, arguments, iterations, clearCache):
+    """Returns the mean time of a call in microseconds."""
+    startTime = time.time()
+    for _ in range(iterations):
+        for args in arguments:
+            clearCache()
+            try:
+                function(*args)
+            except exception.NoInformationError:
+                pass
+    return (time.time() - startTime) * 1000000. / (iterations * len(arguments))
+
+def runTests(db, iterations):
+    cjk = CharacterLookup('T', dbConnectInst=db)
+    tests = [
+        ('getReadingForCharacter', cjk.getReadingForCharacter,
+         [(char, 'Pinyin') for char in CHARACTERS], cjk._compiledRequests),
+        ('getCharacterVariants', cjk.getCharacterVariants,
+         [(char, 'S') for char in CHARACTERS], cjk._compiledRequests),
+        ('getStrokeCount', cjk.getStrokeCount,
+         [(char, ) for char in CHARACTERS], cjk._compiledRequests),
+        ]
+
+    for dictClass in dictionary.getAvailableDictionaries(db):
+        dictInstance = dictClass(dbConnectInst=db)
+        if hasattr(dictInstance, '_searchRequests'):
+            tests.append(('%s.getForHeadword' % dictClass.PROVIDES,
+                dictInstance.getForHeadword,
+                [(headword, ) for headword in HEADWORDS],
+                dictInstance._searchRequests))
+
+    print "%-30s %14s %12s" % ('Method', 'recompiled/us', 'reused/us')
+    for name, function, arguments, cache in tests:
+        # warm up, e.g. table reflection
+        timeCalls(function, arguments, 1, lambda: None)
+
+        recompiled = timeCalls(function, arguments, iterations, cache.clear)
+        reused = timeCalls(function, arguments, iterations, lambda: None)
+        print "%-30s %14.1f %12.1f" % (name, recompiled, reused)
+
+def main():
+    parser = OptionParser(usage="%prog [options]",
+        description="Gives timing statistics for the compilation of lookup "
+            "requests.",
+        version="%%prog %s" % str(cjklib.__version__))
+    parser.add_option("-c", "--iterations", action="store", type="int",
+                      dest="iterations", default=100,
+                      help="Iterations of test routine [default: %default]")
+    parser.add_option("--database", action="store", dest="databaseUrl",
+                      help="Database url [default: configured database]")
+    opts, _ = parser.parse_args()
+
+    db = dbconnector.getDBConnector(opts.databaseUrl)
+    runTests(db, opts.iterations)
+
+if __name__ == "__main__":
+    main()
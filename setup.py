@@ -29,6 +29,7 @@ setup(name='cjklib',
             'buildcjkdb = cjklib.build.cli:main',
             'installcjkdict = cjklib.dictionary.install:main',
             'cjknife = cjklib.cjknife:main',
+            'cjknife-client = cjklib.cjknifeclient:main',
         ],
     },
     install_requires="SQLAlchemy >= 0.6, <0.7",